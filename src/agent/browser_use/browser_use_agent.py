@@ -3,9 +3,10 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+from concurrent.futures import Future
+from functools import partial
 
 # from lmnr.sdk.decorators import observe
-from browser_use.agent.gif import create_history_gif
 from browser_use.agent.service import Agent, AgentHookFunc
 from browser_use.agent.views import (
     ActionResult,
@@ -15,10 +16,14 @@ from browser_use.agent.views import (
     ToolCallingMethod,
 )
 from browser_use.browser.views import BrowserStateHistory
+from browser_use.controller.registry.views import ActionModel
 from browser_use.utils import time_execution_async
 from dotenv import load_dotenv
 from browser_use.agent.message_manager.utils import is_model_without_tool_support
 
+from src.agent.browser_use.recorder import HistoryRecorder, RecordedStateHistory
+from src.utils.artifact_jobs import ArtifactJob, get_artifact_queue
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -27,6 +32,11 @@ SKIP_LLM_API_KEY_VERIFICATION = (
 )
 
 
+def _set_recording_frame(state: RecordedStateHistory, frame: Future) -> None:
+    if not frame.cancelled() and frame.exception() is None:
+        state.recording_frame = frame.result()
+
+
 class BrowserUseAgent(Agent):
     def _set_tool_calling_method(self) -> ToolCallingMethod | None:
         tool_calling_method = self.settings.tool_calling_method
@@ -44,6 +54,129 @@ class BrowserUseAgent(Agent):
         else:
             return tool_calling_method
 
+    def _concurrent_batch(self, actions: list[ActionModel], start: int) -> list[ActionModel]:
+        """The side-effect-free actions starting at `start`, if there are at least two in a row; else just that action."""
+        can_run_concurrently = getattr(self.controller, "can_run_concurrently", None)
+        end = start
+        if can_run_concurrently is not None:
+            while end < len(actions) and can_run_concurrently(actions[end]):
+                end += 1
+        return actions[start:end] if end - start > 1 else actions[start:start + 1]
+
+    async def _act(self, action: ActionModel) -> ActionResult:
+        return await self.controller.act(
+            action,
+            self.browser_context,
+            self.settings.page_extraction_llm,
+            self.sensitive_data,
+            self.settings.available_file_paths,
+            context=self.context,
+        )
+
+    @time_execution_async("--multi-act (agent)")
+    async def multi_act(
+            self,
+            actions: list[ActionModel],
+            check_for_new_elements: bool = True,
+    ) -> list[ActionResult]:
+        """
+        Execute multiple actions, like Agent.multi_act, except that consecutive side-effect-free
+        actions (see CustomController.can_run_concurrently) run concurrently. Results keep action order
+        and stop at the first done or error result, as if the actions had run one after another.
+        """
+        results = []
+
+        cached_selector_map = await self.browser_context.get_selector_map()
+        cached_path_hashes = {e.hash.branch_path_hash for e in cached_selector_map.values()}
+
+        await self.browser_context.remove_highlights()
+
+        i = 0
+        while i < len(actions):
+            action = actions[i]
+            if action.get_index() is not None and i != 0:
+                new_state = await self.browser_context.get_state(cache_clickable_elements_hashes=False)
+                new_selector_map = new_state.selector_map
+
+                # Detect index change after previous action
+                orig_target = cached_selector_map.get(action.get_index())  # type: ignore
+                orig_target_hash = orig_target.hash.branch_path_hash if orig_target else None
+                new_target = new_selector_map.get(action.get_index())  # type: ignore
+                new_target_hash = new_target.hash.branch_path_hash if new_target else None
+                if orig_target_hash != new_target_hash:
+                    msg = f'Element index changed after action {i} / {len(actions)}, because page changed.'
+                    logger.info(msg)
+                    results.append(ActionResult(extracted_content=msg, include_in_memory=True))
+                    break
+
+                new_path_hashes = {e.hash.branch_path_hash for e in new_selector_map.values()}
+                if check_for_new_elements and not new_path_hashes.issubset(cached_path_hashes):
+                    # next action requires index but there are new elements on the page
+                    msg = f'Something new appeared after action {i} / {len(actions)}'
+                    logger.info(msg)
+                    results.append(ActionResult(extracted_content=msg, include_in_memory=True))
+                    break
+
+            batch = self._concurrent_batch(actions, i)
+            try:
+                await self._raise_if_stopped_or_paused()
+
+                if len(batch) > 1:
+                    outcomes = await asyncio.gather(*[self._act(a) for a in batch], return_exceptions=True)
+                    logger.debug(f'Executed actions {i + 1}-{i + len(batch)} / {len(actions)} concurrently')
+                else:
+                    outcomes = [await self._act(action)]
+                    logger.debug(f'Executed action {i + 1} / {len(actions)}')
+
+                finished = False
+                for outcome in outcomes:
+                    if isinstance(outcome, BaseException):
+                        raise outcome
+                    results.append(outcome)
+                    if outcome.is_done or outcome.error:
+                        finished = True
+                        break
+                i += len(batch)
+                if finished or i == len(actions):
+                    break
+
+                await asyncio.sleep(self.browser_context.config.wait_between_actions)
+
+            except asyncio.CancelledError:
+                # Gracefully handle task cancellation
+                logger.info(f'Action {i + 1} was cancelled due to Ctrl+C')
+                if not results:
+                    # Add a result for the cancelled action
+                    results.append(ActionResult(error='The action was cancelled due to Ctrl+C', include_in_memory=True))
+                raise InterruptedError('Action cancelled by user')
+
+        return results
+
+    async def _record_new_steps(self) -> None:
+        """Hands the screenshots of steps added since the last call to the recorder and drops them from history."""
+        history = self.state.history.history
+        while self.recorder is not None and self._recorded_steps < len(history):
+            item = history[self._recorded_steps]
+            self._recorded_steps += 1
+            goal = item.model_output.current_state.next_goal if item.model_output else None
+            try:
+                # Only queues the step; this waits just while the recorder's writer is behind by a full queue
+                frame = await asyncio.to_thread(self.recorder.add_step, item.state.screenshot, goal)
+            except Exception as e:
+                logger.error(f'Failed to record step {self._recorded_steps}: {e}', exc_info=True)
+                continue
+            if frame is not None:
+                state = item.state
+                item.state = RecordedStateHistory(
+                    url=state.url,
+                    title=state.title,
+                    tabs=state.tabs,
+                    interacted_element=state.interacted_element,
+                    recording_path=self.recorder.output_path,
+                )
+                # The frame index is known once the writer has compared the step with the previous frame
+                frame.add_done_callback(partial(_set_recording_frame, item.state))
+
     @time_execution_async("--run (agent)")
     async def run(
             self, max_steps: int = 100, on_step_start: AgentHookFunc | None = None,
@@ -51,6 +184,17 @@ class BrowserUseAgent(Agent):
     ) -> AgentHistoryList:
         """Execute the task with maximum number of steps"""
 
+        # Artifacts of this run: the recording, encoded step by step as the run goes, and the Playwright script
+        self.artifact_jobs: list[ArtifactJob] = []
+        self.recorder: HistoryRecorder | None = None
+        self.recording_path: str | None = None
+        if self.settings.generate_gif:
+            output_path: str = 'agent_history.gif'
+            if isinstance(self.settings.generate_gif, str):
+                output_path = self.settings.generate_gif
+            self.recorder = HistoryRecorder(self.task, output_path)
+        self._recorded_steps = len(self.state.history.history)
+
         loop = asyncio.get_event_loop()
 
         # Set up the Ctrl+C signal handler with callbacks specific to this agent
@@ -99,6 +243,7 @@ class BrowserUseAgent(Agent):
 
                 step_info = AgentStepInfo(step_number=step, max_steps=max_steps)
                 await self.step(step_info)
+                await self._record_new_steps()
 
                 if on_step_end is not None:
                     await on_step_end(self)
@@ -143,27 +288,28 @@ class BrowserUseAgent(Agent):
 
             if self.settings.save_playwright_script_path:
                 logger.info(
-                    f'Agent run finished. Attempting to save Playwright script to: {self.settings.save_playwright_script_path}'
+                    f'Agent run finished. Queueing Playwright script for: {self.settings.save_playwright_script_path}'
                 )
                 try:
                     # Extract sensitive data keys if sensitive_data is provided
                     keys = list(self.sensitive_data.keys()) if self.sensitive_data else None
-                    # Pass browser and context config to the saving method
-                    self.state.history.save_as_playwright_script(
+                    # Pass browser and context config to the script job
+                    self.artifact_jobs.append(get_artifact_queue().submit_playwright_script(
+                        self.state.history,
                         self.settings.save_playwright_script_path,
                         sensitive_data_keys=keys,
                         browser_config=self.browser.config,
                         context_config=self.browser_context.config,
-                    )
+                    ))
                 except Exception as script_gen_err:
-                    # Log any error during script generation/saving
-                    logger.error(f'Failed to save Playwright script: {script_gen_err}', exc_info=True)
+                    logger.error(f'Failed to queue Playwright script: {script_gen_err}', exc_info=True)
 
             await self.close()
 
-            if self.settings.generate_gif:
-                output_path: str = 'agent_history.gif'
-                if isinstance(self.settings.generate_gif, str):
-                    output_path = self.settings.generate_gif
-
-                create_history_gif(task=self.task, history=self.state.history, output_path=output_path)
+            if self.recorder is not None:
+                await self._record_new_steps()
+                try:
+                    # Waits for a step still being encoded, e.g. by a thread outliving a cancelled run
+                    self.recording_path = await asyncio.to_thread(self.recorder.close)
+                except Exception as e:
+                    logger.error(f'Failed to finish the recording: {e}', exc_info=True)
@@ -0,0 +1,287 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import platform
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional, Tuple
+
+from browser_use.agent.gif import _add_overlay_to_image, _create_task_frame
+from browser_use.browser.views import BrowserStateHistory
+from PIL import GifImagePlugin, Image, ImageFont
+
+from src.utils.artifact_jobs import ARTIFACT_MAX_CONCURRENT_JOBS, ARTIFACT_SLOT_DIR, host_slot
+
+try:
+    import av
+except ImportError:  # WebM recordings need PyAV; without it they fall back to GIF
+    av = None
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "gif").lower()  # gif or webm
+RECORDING_MAX_WIDTH = int(os.getenv("RECORDING_MAX_WIDTH", "960"))
+RECORDING_FRAME_DURATION = int(os.getenv("RECORDING_FRAME_DURATION", "3000"))  # milliseconds per step
+# Steps waiting for the recorder's writer thread; add_step blocks while this many are queued
+RECORDING_QUEUE_SIZE = int(os.getenv("RECORDING_QUEUE_SIZE", "8"))
+
+# Fonts of the task and goal overlays, as in browser_use's history GIF
+_FONT_NAMES = ["Microsoft YaHei", "SimHei", "Noto Sans CJK SC", "WenQuanYi Micro Hei", "Helvetica", "Arial", "DejaVuSans"]
+_FONT_SIZE = 40
+_TITLE_FONT_SIZE = 56
+_OVERLAY_MARGIN = 40
+
+
+@dataclass
+class RecordedStateHistory(BrowserStateHistory):
+    """A step's browser state whose screenshot is a frame of the run's recording instead of base64 pixels."""
+
+    recording_path: Optional[str] = None
+    recording_frame: Optional[int] = None
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["recording_path"] = self.recording_path
+        data["recording_frame"] = self.recording_frame
+        return data
+
+
+def _load_fonts() -> Tuple[ImageFont.ImageFont, ImageFont.ImageFont]:
+    """Regular and title fonts for the overlays, falling back to PIL's default font."""
+    for font_name in _FONT_NAMES:
+        if platform.system() == "Windows":
+            font_name = os.path.join(os.getenv("WIN_FONT_DIR", "C:\\Windows\\Fonts"), font_name + ".ttf")
+        try:
+            return ImageFont.truetype(font_name, _FONT_SIZE), ImageFont.truetype(font_name, _TITLE_FONT_SIZE)
+        except OSError:
+            continue
+    default_font = ImageFont.load_default()
+    return default_font, default_font
+
+
+class _GifWriter:
+    """Appends frames to an animated GIF on disk; nothing but the open file is kept between frames."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._header_written = False
+
+    def write(self, image: Image.Image, duration: int) -> None:
+        frame = image.quantize(colors=256)
+        if not self._header_written:
+            header, _ = GifImagePlugin.getheader(frame, info={"loop": 0})
+            self._file.writelines(header)
+            self._header_written = True
+        # Each frame carries its own palette, so colours stay accurate as pages change
+        self._file.writelines(GifImagePlugin.getdata(frame, duration=duration, include_color_table=True))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.write(b";")  # GIF trailer
+        self._file.close()
+
+
+class _WebmWriter:
+    """Encodes frames into a variable-frame-rate VP9 WebM file as they arrive."""
+
+    def __init__(self, path: str):
+        self._container = av.open(path, mode="w", format="webm")
+        self._stream = None
+        self._pts = 0  # milliseconds
+        self._last_frame: Optional[Image.Image] = None
+
+    def write(self, image: Image.Image, duration: int) -> None:
+        if self._stream is None:
+            self._stream = self._container.add_stream("libvpx-vp9", rate=1)
+            self._stream.width, self._stream.height = image.size
+            self._stream.pix_fmt = "yuv420p"
+            self._stream.codec_context.time_base = Fraction(1, 1000)
+        self._encode(image, self._pts)
+        self._pts += duration
+        self._last_frame = image
+
+    def _encode(self, image: Optional[Image.Image], pts: int) -> None:
+        frame = None
+        if image is not None:
+            frame = av.VideoFrame.from_image(image)
+            frame.pts = pts
+            frame.time_base = Fraction(1, 1000)
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            # Repeat the last frame at the end of its duration, or players would cut it short
+            self._encode(self._last_frame, self._pts - 1)
+            self._encode(None, 0)  # flush the encoder
+        self._container.close()
+
+
+class HistoryRecorder:
+    """
+    Records an agent run step by step, writing each frame to disk as soon as the next one arrives.
+
+    Screenshots are downscaled to at most `max_width` pixels wide. A step whose downscaled
+    screenshot and goal are identical to the previous frame's extends that frame instead of adding
+    one. Only the frame being extended is held in memory, so memory use does not grow with the
+    number of steps. The recording is a GIF, or a WebM if `fmt` is "webm" and PyAV is installed.
+
+    add_step() only queues the step: a writer thread of the recorder decodes and encodes the
+    frames in order, each under one of the host's artifact slots (see artifact_jobs.host_slot),
+    so the agent does not wait for other runs' encodes unless `queue_size` steps are pending.
+    Steps that arrive after close() are ignored.
+    """
+
+    def __init__(
+            self,
+            task: str,
+            output_path: str,
+            fmt: str = RECORDING_FORMAT,
+            max_width: int = RECORDING_MAX_WIDTH,
+            frame_duration: int = RECORDING_FRAME_DURATION,
+            show_task: bool = True,
+            show_goals: bool = True,
+            slot_dir: str = ARTIFACT_SLOT_DIR,
+            slots: int = ARTIFACT_MAX_CONCURRENT_JOBS,
+            queue_size: int = RECORDING_QUEUE_SIZE,
+    ):
+        if fmt == "webm" and av is None:
+            logger.warning("WebM recordings need PyAV (pip install av); recording a GIF instead")
+            fmt = "gif"
+        self.task = task
+        self.format = fmt
+        self.output_path = f"{os.path.splitext(output_path)[0]}.{fmt}"
+        self.max_width = max(2, max_width)
+        self.frame_duration = frame_duration
+        self.show_task = show_task
+        self.show_goals = show_goals
+        self.slot_dir = slot_dir
+        self.slots = max(1, slots)
+        self.frames = 0  # frames in the recording, including the one not yet written
+        self.merged_steps = 0
+        self._steps = 0
+        self._size: Optional[Tuple[int, int]] = None
+        self._writer = None
+        self._fonts = None
+        self._pending: Optional[Image.Image] = None
+        self._pending_key: Optional[bytes] = None
+        self._pending_duration = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._writer_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _frame_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        scale = min(1.0, self.max_width / size[0])
+        # Even dimensions, as the video encoder's 4:2:0 chroma subsampling requires
+        return max(2, int(size[0] * scale) // 2 * 2), max(2, int(size[1] * scale) // 2 * 2)
+
+    def _open(self, screenshot: str, size: Tuple[int, int]) -> None:
+        self._size = self._frame_size(size)
+        output_dir = os.path.dirname(self.output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._writer = _WebmWriter(self.output_path) if self.format == "webm" else _GifWriter(self.output_path)
+        if self.show_task and self.task:
+            regular_font, title_font = self._get_fonts()
+            task_frame = _create_task_frame(self.task, screenshot, title_font, regular_font)
+            self._push(task_frame.convert("RGB").resize(self._size, Image.Resampling.LANCZOS), None)
+
+    def _get_fonts(self):
+        if self._fonts is None:
+            self._fonts = _load_fonts()
+        return self._fonts
+
+    def add_step(self, screenshot: Optional[str], goal: Optional[str] = None) -> Optional[Future]:
+        """
+        Queues one step from its base64 screenshot and next goal. Returns a future of the index of
+        the recording frame that shows it, or None if the step has no screenshot or the recording is closed.
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            self._steps += 1
+            if not screenshot:
+                return None
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._write_frames, name="history-recorder", daemon=True)
+                self._writer_thread.start()
+            future: Future = Future()
+            self._queue.put((self._steps, screenshot, goal, future))
+            return future
+
+    def _write_frames(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            step, screenshot, goal, future = item
+            try:
+                with host_slot(self.slot_dir, self.slots):
+                    future.set_result(self._add_frame(step, screenshot, goal))
+            except Exception as e:
+                logger.error(f"Failed to record step {step}: {e}", exc_info=True)
+                future.set_exception(e)
+
+    def _add_frame(self, step: int, screenshot: str, goal: Optional[str]) -> int:
+        image = Image.open(io.BytesIO(base64.b64decode(screenshot))).convert("RGB")
+        if self._writer is None:
+            self._open(screenshot, image.size)
+
+        downscaled = image.resize(self._size, Image.Resampling.LANCZOS)
+        # Keyed before the overlay, which numbers every step; the goal is part of what the frame shows
+        key_hash = hashlib.blake2b(downscaled.tobytes(), digest_size=16)
+        if self.show_goals and goal:
+            key_hash.update(goal.encode())
+        key = key_hash.digest()
+        if key == self._pending_key:
+            self._pending_duration += self.frame_duration
+            self.merged_steps += 1
+            return self.frames - 1
+
+        if self.show_goals and goal:
+            # Overlays are laid out for full-size screenshots, so they are drawn before downscaling
+            regular_font, title_font = self._get_fonts()
+            overlaid = _add_overlay_to_image(image, step, goal, regular_font, title_font, _OVERLAY_MARGIN)
+            downscaled = overlaid.convert("RGB").resize(self._size, Image.Resampling.LANCZOS)
+        self._push(downscaled, key)
+        return self.frames - 1
+
+    def _push(self, frame: Image.Image, key: Optional[bytes]) -> None:
+        self._flush()
+        self._pending, self._pending_key, self._pending_duration = frame, key, self.frame_duration
+        self.frames += 1
+
+    def _flush(self) -> None:
+        if self._pending is not None:
+            self._writer.write(self._pending, self._pending_duration)
+            self._pending = None
+
+    def close(self) -> Optional[str]:
+        """
+        Records the queued steps, writes the last frame and finishes the file. Returns its path, or None
+        if no step had a screenshot.
+        """
+        with self._lock:
+            if self._closed:
+                return self.output_path if self.frames else None
+            self._closed = True
+            if self._writer_thread is not None:
+                self._queue.put(None)
+                self._writer_thread.join()
+            if self._writer is None:
+                return None
+            with host_slot(self.slot_dir, self.slots):
+                self._flush()
+                self._writer.close()
+            self._writer = None
+        logger.info(
+            f"Recording saved to {self.output_path}: {self.frames} frames, "
+            f"{self.merged_steps} unchanged step(s) merged into the previous frame"
+        )
+        return self.output_path
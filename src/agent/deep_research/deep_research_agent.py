@@ -1,11 +1,10 @@
 import asyncio
+import copy
 import json
 import logging
 import os
-import threading
 import uuid
-from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict
 
 from browser_use.browser.browser import BrowserConfig
 from langchain_community.tools.file_management import (
@@ -22,19 +21,27 @@ from langchain_core.messages import (
     SystemMessage,
     ToolMessage,
 )
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import StructuredTool, Tool
 
 # Langgraph imports
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from pydantic import BaseModel, Field
 
 from browser_use.browser.context import BrowserContextConfig
 
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
-from src.browser.custom_browser import CustomBrowser
+from src.agent.deep_research.message_history import CHARS_PER_TOKEN, bound_message_history
+from src.agent.deep_research.plan_store import close_plan_store, get_plan_store
+from src.agent.deep_research.result_cache import get_result_cache, model_cache_key
+from src.browser.browser_pool import DEFAULT_POOL_SIZE, BrowserPool, get_browser_pool
+from src.utils.run_scheduler import get_run_scheduler
+from src.utils.task_registry import TaskHandle, get_task_registry
 from src.controller.custom_controller import CustomController
-from src.utils.mcp_client import setup_mcp_client_and_tools
+from src.utils.mcp_client import release_mcp_client, setup_mcp_client_and_tools
 
 logger = logging.getLogger(__name__)
 
@@ -42,9 +49,71 @@ logger = logging.getLogger(__name__)
 REPORT_FILENAME = "report.md"
 PLAN_FILENAME = "research_plan.md"
 SEARCH_INFO_FILENAME = "search_info.json"
+SEARCH_INFO_LOG_FILENAME = "search_info.jsonl"
+CHECKPOINT_FILENAME = "checkpoints.db"
+DEFAULT_CONTEXT_TOKEN_BUDGET = 32000
+SYNTHESIS_MODES = ("auto", "single", "map_reduce")
+# Category summaries generated at the same time during map-reduce synthesis
+SYNTHESIS_MAP_CONCURRENCY = 4
+UNCATEGORIZED_FINDINGS = "Other Findings"
 
-_AGENT_STOP_FLAGS = {}
-_BROWSER_AGENT_INSTANCES = {}
+
+def _build_browser_config(browser_config: Dict[str, Any]) -> BrowserConfig:
+    """Translates the deep research browser settings into a BrowserConfig for the browser pool."""
+    headless = browser_config.get("headless", False)
+    window_w = browser_config.get("window_width", 1280)
+    window_h = browser_config.get("window_height", 1100)
+    browser_user_data_dir = browser_config.get("user_data_dir", None)
+    use_own_browser = browser_config.get("use_own_browser", False)
+    browser_binary_path = browser_config.get("browser_binary_path", None)
+    wss_url = browser_config.get("wss_url", None)
+    cdp_url = browser_config.get("cdp_url", None)
+
+    extra_args = []
+    if use_own_browser:
+        browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
+        if browser_binary_path == "":
+            browser_binary_path = None
+        browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
+        if browser_user_data:
+            extra_args += [f"--user-data-dir={browser_user_data}"]
+    else:
+        browser_binary_path = None
+
+    return BrowserConfig(
+        headless=headless,
+        browser_binary_path=browser_binary_path,
+        extra_browser_args=extra_args,
+        wss_url=wss_url,
+        cdp_url=cdp_url,
+        new_context_config=BrowserContextConfig(
+            window_width=window_w,
+            window_height=window_h,
+        )
+    )
+
+
+def _browser_identity(browser_config: Dict[str, Any], user_id: Optional[str]) -> Optional[str]:
+    """
+    Whose browsing state a research browser carries: None for the pool's fresh browsers, otherwise
+    the user and the profile or remote browser, since logged-in pages can differ from what others see.
+    """
+    profile = browser_config.get("cdp_url") or browser_config.get("wss_url")
+    if browser_config.get("use_own_browser"):
+        profile = profile or browser_config.get("user_data_dir") or os.getenv("BROWSER_USER_DATA") or "default"
+    if not profile:
+        return None
+    return f"{user_id or 'anonymous'}:{profile}"
+
+
+def get_research_browser_pool(browser_config: Dict[str, Any], max_parallel_browsers: int = 1) -> BrowserPool:
+    """Returns the shared browser pool for these settings, sized for `max_parallel_browsers` leases."""
+    return get_browser_pool(
+        _build_browser_config(browser_config),
+        size=max(max_parallel_browsers, browser_config.get("pool_size") or DEFAULT_POOL_SIZE),
+        min_idle=browser_config.get("pool_min_idle"),
+        max_lifetime=browser_config.get("pool_max_lifetime"),
+    )
 
 
 async def run_single_browser_task(
@@ -52,12 +121,16 @@ async def run_single_browser_task(
         task_id: str,
         llm: Any,  # Pass the main LLM
         browser_config: Dict[str, Any],
-        stop_event: threading.Event,
+        task_handle: TaskHandle,
         use_vision: bool = False,
+        browser_pool: Optional[BrowserPool] = None,
+        user_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Runs a single BrowserUseAgent task.
-    Manages browser creation and closing for this specific task.
+    Runs a single BrowserUseAgent task. Stopping the research task cancels it mid-run.
+    Answers from the cross-run result cache when the same query was researched recently with the
+    same model and, for the user's own or a remote browser, the same browsing identity. Otherwise waits for a browser slot from the run scheduler (counted against `user_id`),
+    then leases an isolated browser context from the shared browser pool for this specific task.
     """
     if not BrowserUseAgent:
         return {
@@ -65,132 +138,79 @@ async def run_single_browser_task(
             "error": "BrowserUseAgent components not available.",
         }
 
-    # --- Browser Setup ---
-    # These should ideally come from the main agent's config
-    headless = browser_config.get("headless", False)
     window_w = browser_config.get("window_width", 1280)
     window_h = browser_config.get("window_height", 1100)
-    browser_user_data_dir = browser_config.get("user_data_dir", None)
-    use_own_browser = browser_config.get("use_own_browser", False)
-    browser_binary_path = browser_config.get("browser_binary_path", None)
-    wss_url = browser_config.get("wss_url", None)
-    cdp_url = browser_config.get("cdp_url", None)
-    disable_security = browser_config.get("disable_security", False)
+    if browser_pool is None:
+        browser_pool = get_research_browser_pool(browser_config)
+
+    result_cache = get_result_cache()
+    model_key = model_cache_key(llm, _browser_identity(browser_config, user_id))
+    if result_cache:
+        cached_result = await result_cache.get(task_query, model_key)
+        if cached_result is not None:
+            logger.info(f"Using cached browser result for query: {task_query}")
+            return {"query": task_query, "result": cached_result, "status": "completed", "cached": True}
 
-    bu_browser = None
-    bu_browser_context = None
     try:
         logger.info(f"Starting browser task for query: {task_query}")
-        extra_args = []
-        if use_own_browser:
-            browser_binary_path = os.getenv("BROWSER_PATH", None) or browser_binary_path
-            if browser_binary_path == "":
-                browser_binary_path = None
-            browser_user_data = browser_user_data_dir or os.getenv("BROWSER_USER_DATA", None)
-            if browser_user_data:
-                extra_args += [f"--user-data-dir={browser_user_data}"]
-        else:
-            browser_binary_path = None
-
-        bu_browser = CustomBrowser(
-            config=BrowserConfig(
-                headless=headless,
-                browser_binary_path=browser_binary_path,
-                extra_browser_args=extra_args,
-                wss_url=wss_url,
-                cdp_url=cdp_url,
-                new_context_config=BrowserContextConfig(
-                    window_width=window_w,
-                    window_height=window_h,
-                )
-            )
-        )
-
         context_config = BrowserContextConfig(
             save_downloads_path="./tmp/downloads",
             window_height=window_h,
             window_width=window_w,
             force_new_context=True,
         )
-        bu_browser_context = await bu_browser.new_context(config=context_config)
-
-        # Simple controller example, replace with your actual implementation if needed
-        bu_controller = CustomController()
-
-        # Construct the task prompt for BrowserUseAgent
-        # Instruct it to find specific info and return title/URL
-        bu_task_prompt = f"""
-        Research Task: {task_query}
-        Objective: Find relevant information answering the query.
-        Output Requirements: For each relevant piece of information found, please provide:
-        1. A concise summary of the information.
-        2. The title of the source page or document.
-        3. The URL of the source.
-        Focus on accuracy and relevance. Avoid irrelevant details.
-        PDF cannot directly extract _content, please try to download first, then using read_file, if you can't save or read, please try other methods.
-        """
 
-        bu_agent_instance = BrowserUseAgent(
-            task=bu_task_prompt,
-            llm=llm,  # Use the passed LLM
-            browser=bu_browser,
-            browser_context=bu_browser_context,
-            controller=bu_controller,
-            use_vision=use_vision,
-            source="webui",
-        )
+        def log_queued(position: int):
+            logger.info(f"Browser task for '{task_query}' is waiting for a browser slot (queue position {position}).")
+
+        async with get_run_scheduler().slot(user_id, browsers=1, on_queued=log_queued), \
+                browser_pool.lease(context_config) as bu_browser_context:
+            # Simple controller example, replace with your actual implementation if needed
+            bu_controller = CustomController()
+
+            # Construct the task prompt for BrowserUseAgent
+            # Instruct it to find specific info and return title/URL
+            bu_task_prompt = f"""
+            Research Task: {task_query}
+            Objective: Find relevant information answering the query.
+            Output Requirements: For each relevant piece of information found, please provide:
+            1. A concise summary of the information.
+            2. The title of the source page or document.
+            3. The URL of the source.
+            Focus on accuracy and relevance. Avoid irrelevant details.
+            PDF cannot directly extract _content, please try to download first, then using read_file, if you can't save or read, please try other methods.
+            """
+
+            bu_agent_instance = BrowserUseAgent(
+                task=bu_task_prompt,
+                llm=llm,  # Use the passed LLM
+                browser=bu_browser_context.browser,
+                browser_context=bu_browser_context,
+                controller=bu_controller,
+                use_vision=use_vision,
+                source="webui",
+            )
 
-        # Store instance for potential stop() call
-        task_key = f"{task_id}_{uuid.uuid4()}"
-        _BROWSER_AGENT_INSTANCES[task_key] = bu_agent_instance
-
-        # --- Run with Stop Check ---
-        # BrowserUseAgent needs to internally check a stop signal or have a stop method.
-        # We simulate checking before starting and assume `run` might be interruptible
-        # or have its own stop mechanism we can trigger via bu_agent_instance.stop().
-        if stop_event.is_set():
-            logger.info(f"Browser task for '{task_query}' cancelled before start.")
-            return {"query": task_query, "result": None, "status": "cancelled"}
-
-        # The run needs to be awaitable and ideally accept a stop signal or have a .stop() method
-        # result = await bu_agent_instance.run(max_steps=max_steps) # Add max_steps if applicable
-        # Let's assume a simplified run for now
-        logger.info(f"Running BrowserUseAgent for: {task_query}")
-        result = await bu_agent_instance.run()  # Assuming run is the main method
-        logger.info(f"BrowserUseAgent finished for: {task_query}")
+            if task_handle.stopped:
+                logger.info(f"Browser task for '{task_query}' cancelled before start.")
+                return {"query": task_query, "result": None, "status": "cancelled"}
 
-        final_data = result.final_result()
+            # A stop cancels the asyncio task running this coroutine, which interrupts the agent mid-step
+            logger.info(f"Running BrowserUseAgent for: {task_query}")
+            result = await bu_agent_instance.run()  # Assuming run is the main method
+            logger.info(f"BrowserUseAgent finished for: {task_query}")
 
-        if stop_event.is_set():
-            logger.info(f"Browser task for '{task_query}' stopped during execution.")
-            return {"query": task_query, "result": final_data, "status": "stopped"}
-        else:
-            logger.info(f"Browser result for '{task_query}': {final_data}")
-            return {"query": task_query, "result": final_data, "status": "completed"}
+        final_data = result.final_result()
+        logger.info(f"Browser result for '{task_query}': {final_data}")
+        if result_cache and final_data:
+            await result_cache.put(task_query, model_key, final_data)
+        return {"query": task_query, "result": final_data, "status": "completed"}
 
     except Exception as e:
         logger.error(
             f"Error during browser task for query '{task_query}': {e}", exc_info=True
         )
         return {"query": task_query, "error": str(e), "status": "failed"}
-    finally:
-        if bu_browser_context:
-            try:
-                await bu_browser_context.close()
-                bu_browser_context = None
-                logger.info("Closed browser context.")
-            except Exception as e:
-                logger.error(f"Error closing browser context: {e}")
-        if bu_browser:
-            try:
-                await bu_browser.close()
-                bu_browser = None
-                logger.info("Closed browser.")
-            except Exception as e:
-                logger.error(f"Error closing browser: {e}")
-
-        if task_key in _BROWSER_AGENT_INSTANCES:
-            del _BROWSER_AGENT_INSTANCES[task_key]
 
 
 class BrowserSearchInput(BaseModel):
@@ -204,76 +224,90 @@ async def _run_browser_search_tool(
         task_id: str,  # Injected dependency
         llm: Any,  # Injected dependency
         browser_config: Dict[str, Any],
-        stop_event: threading.Event,
+        task_handle: TaskHandle,
         max_parallel_browsers: int = 1,
+        user_id: Optional[str] = None,
+        on_result: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Internal function to execute parallel browser searches based on LLM-provided queries.
-    Handles concurrency and stop signals.
+    Internal function to execute browser searches based on LLM-provided queries.
+    Every query is run: a pool of `max_parallel_browsers` workers drains a queue of them, and
+    `on_result(result, finished, total)` is called as each one finishes. Results keep query order.
+    Each search runs as a task of `task_handle`, so stopping the research task cancels it.
     """
-
-    # Limit queries just in case LLM ignores the description
-    queries = queries[:max_parallel_browsers]
+    queries = list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
     logger.info(
         f"[Browser Tool {task_id}] Running search for {len(queries)} queries: {queries}"
     )
-
-    results = []
-    semaphore = asyncio.Semaphore(max_parallel_browsers)
-
-    async def task_wrapper(query):
-        async with semaphore:
-            if stop_event.is_set():
+    if not queries:
+        return []
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    work_queue: asyncio.Queue = asyncio.Queue()
+    for index, query in enumerate(queries):
+        work_queue.put_nowait((index, query))
+    browser_pool = get_research_browser_pool(browser_config, max_parallel_browsers)
+    finished = 0
+
+    async def worker():
+        nonlocal finished
+        while True:
+            try:
+                index, query = work_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if task_handle.stopped:
                 logger.info(
                     f"[Browser Tool {task_id}] Skipping task due to stop signal: {query}"
                 )
-                return {"query": query, "result": None, "status": "cancelled"}
-            # Pass necessary injected configs and the stop event
-            return await run_single_browser_task(
-                query,
-                task_id,
-                llm,  # Pass the main LLM (or a dedicated one if needed)
-                browser_config,
-                stop_event,
-                # use_vision could be added here if needed
-            )
+                result = {"query": query, "result": None, "status": "cancelled"}
+            else:
+                try:
+                    search = task_handle.spawn(
+                        run_single_browser_task(
+                            query,
+                            task_id,
+                            llm,  # Pass the main LLM (or a dedicated one if needed)
+                            browser_config,
+                            task_handle,
+                            # use_vision could be added here if needed
+                            browser_pool=browser_pool,
+                            user_id=user_id,
+                        )
+                    )
+                    result = await search
+                except asyncio.CancelledError:
+                    if not task_handle.stopped:
+                        raise  # the tool call itself was cancelled
+                    logger.info(f"[Browser Tool {task_id}] Browser task cancelled by stop: {query}")
+                    result = {"query": query, "result": None, "status": "cancelled"}
+                except Exception as e:
+                    logger.error(
+                        f"[Browser Tool {task_id}] Browser task raised for query '{query}': {e}",
+                        exc_info=True,
+                    )
+                    result = {"query": query, "error": str(e), "status": "failed"}
+            results[index] = result
+            finished += 1
+            if on_result:
+                on_result(result, finished, len(queries))
 
-    tasks = [task_wrapper(query) for query in queries]
-    search_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    processed_results = []
-    for i, res in enumerate(search_results):
-        query = queries[i]  # Get corresponding query
-        if isinstance(res, Exception):
-            logger.error(
-                f"[Browser Tool {task_id}] Gather caught exception for query '{query}': {res}",
-                exc_info=True,
-            )
-            processed_results.append(
-                {"query": query, "error": str(res), "status": "failed"}
-            )
-        elif isinstance(res, dict):
-            processed_results.append(res)
-        else:
-            logger.error(
-                f"[Browser Tool {task_id}] Unexpected result type for query '{query}': {type(res)}"
-            )
-            processed_results.append(
-                {"query": query, "error": "Unexpected result type", "status": "failed"}
-            )
+    await asyncio.gather(*[worker() for _ in range(min(max(1, max_parallel_browsers), len(queries)))])
 
     logger.info(
-        f"[Browser Tool {task_id}] Finished search. Results count: {len(processed_results)}"
+        f"[Browser Tool {task_id}] Finished search. Results count: {len(results)}"
     )
-    return processed_results
+    return results
 
 
 def create_browser_search_tool(
         llm: Any,
         browser_config: Dict[str, Any],
         task_id: str,
-        stop_event: threading.Event,
+        task_handle: TaskHandle,
         max_parallel_browsers: int = 1,
+        user_id: Optional[str] = None,
+        on_result: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
 ) -> StructuredTool:
     """Factory function to create the browser search tool with necessary dependencies."""
     # Use partial to bind the dependencies that aren't part of the LLM call arguments
@@ -284,16 +318,18 @@ def create_browser_search_tool(
         task_id=task_id,
         llm=llm,
         browser_config=browser_config,
-        stop_event=stop_event,
+        task_handle=task_handle,
         max_parallel_browsers=max_parallel_browsers,
+        user_id=user_id,
+        on_result=on_result,
     )
 
     return StructuredTool.from_function(
         coroutine=bound_tool_func,
         name="parallel_browser_search",
         description=f"""Use this tool to actively search the web for information related to a specific research task or question.
-It runs up to {max_parallel_browsers} searches in parallel using a browser agent for better results than simple scraping.
-Provide a list of distinct search queries(up to {max_parallel_browsers}) that are likely to yield relevant information.""",
+It runs every query with a browser agent, up to {max_parallel_browsers} at a time, for better results than simple scraping.
+Provide a list of distinct search queries that are likely to yield relevant information.""",
         args_schema=BrowserSearchInput,
     )
 
@@ -320,9 +356,7 @@ class DeepResearchState(TypedDict):
     topic: str
     research_plan: List[ResearchCategoryItem]  # CHANGED
     search_results: List[Dict[str, Any]]
-    llm: Any
-    tools: List[Tool]
-    output_dir: Path
+    output_dir: str
     browser_config: Dict[str, Any]
     final_report: Optional[str]
     current_category_index: int
@@ -330,124 +364,202 @@ class DeepResearchState(TypedDict):
     stop_requested: bool
     error_message: Optional[str]
     messages: List[BaseMessage]
+    max_concurrent_tasks: int  # How many plan tasks may run at the same time
+    task_scheduling: str  # "category": batches stay within one category, "plan": batches may span categories
+    context_token_budget: int  # Upper bound for the message history sent to the LLM
+    synthesis_mode: str  # "single" prompt, "map_reduce" per-category summaries, or "auto" by findings size
+
+
+def _run_context(config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Per-run objects the nodes need but that cannot be checkpointed: "llm", "tools",
+    "progress_queue", the research "task_id" and its "task_handle". They travel in the config, not in DeepResearchState.
+    """
+    return config["configurable"]
+
+
+def _publish_progress(context: Dict[str, Any], event_type: str, **data: Any):
+    """
+    Puts a progress event on the run's progress queue, if the caller provided one.
+    Every event carries its type and the research task ID; plans are copied so later status
+    changes do not alter events that are still queued.
+    """
+    progress_queue = context.get("progress_queue")
+    if progress_queue is None:
+        return
+    if "plan" in data:
+        data["plan"] = copy.deepcopy(data["plan"])
+    progress_queue.put_nowait({"type": event_type, "task_id": context.get("task_id"), **data})
 
 
 # --- Langgraph Nodes ---
 
 
+def _parse_plan_markdown(plan_file: str) -> List[ResearchCategoryItem]:
+    """Reads a plan from research_plan.md; only needed for runs saved before the plan store existed."""
+    loaded_plan: List[ResearchCategoryItem] = []
+    current_category: Optional[ResearchCategoryItem] = None
+    with open(plan_file, "r", encoding="utf-8") as f:
+        for line_content in f:
+            line = line_content.strip()
+            if line.startswith("## "):  # Category
+                category_name = line[line.find(" "):].strip()  # Get text after "## X. "
+                current_category = ResearchCategoryItem(category_name=category_name, tasks=[])
+                loaded_plan.append(current_category)
+            elif line[:5] in ("- [ ]", "- [x]", "- [-]") and current_category:  # Task
+                status = {"- [x]": "completed", "- [-]": "failed"}.get(line[:5], "pending")
+                current_category["tasks"].append(
+                    ResearchTaskItem(task_description=line[5:].strip(), status=status, queries=None,
+                                     result_summary=None)
+                )
+    return loaded_plan
+
+
+def _needs_research(task: ResearchTaskItem) -> bool:
+    """Whether a task still has to be run: pending tasks, and failed ones, which are retried."""
+    return task["status"] != "completed"
+
+
+def _first_pending_task(plan: List[ResearchCategoryItem]) -> Tuple[int, int]:
+    """Plan position of the first task that still needs research, or just past the last category if none is left."""
+    for cat_idx, category in enumerate(plan):
+        for task_idx, task in enumerate(category["tasks"]):
+            if _needs_research(task):
+                return cat_idx, task_idx
+    return len(plan), 0
+
+
 def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
     state_updates = {}
+    plan_store = get_plan_store(output_dir)
     plan_file = os.path.join(output_dir, PLAN_FILENAME)
-    search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
 
     loaded_plan: List[ResearchCategoryItem] = []
-    next_cat_idx, next_task_idx = 0, 0
-    found_pending = False
+    try:
+        if plan_store.exists():
+            loaded_plan = plan_store.load_plan()
+        elif os.path.exists(plan_file):
+            loaded_plan = _parse_plan_markdown(plan_file)
+            if loaded_plan:
+                plan_store.save_plan(loaded_plan)  # later updates go to the store
+        else:
+            logger.info(f"No saved plan in {output_dir}. Will start fresh.")
 
-    if os.path.exists(plan_file):
-        try:
-            with open(plan_file, "r", encoding="utf-8") as f:
-                current_category: Optional[ResearchCategoryItem] = None
-                lines = f.readlines()
-                cat_counter = 0
-                task_counter_in_cat = 0
-
-                for line_num, line_content in enumerate(lines):
-                    line = line_content.strip()
-                    if line.startswith("## "):  # Category
-                        if current_category:  # Save previous category
-                            loaded_plan.append(current_category)
-                            if not found_pending:  # If previous category was all done, advance cat counter
-                                cat_counter += 1
-                                task_counter_in_cat = 0
-                        category_name = line[line.find(" "):].strip()  # Get text after "## X. "
-                        current_category = ResearchCategoryItem(category_name=category_name, tasks=[])
-                    elif (line.startswith("- [ ]") or line.startswith("- [x]") or line.startswith(
-                            "- [-]")) and current_category:  # Task
-                        status = "pending"
-                        if line.startswith("- [x]"):
-                            status = "completed"
-                        elif line.startswith("- [-]"):
-                            status = "failed"
-
-                        task_desc = line[5:].strip()
-                        current_category["tasks"].append(
-                            ResearchTaskItem(task_description=task_desc, status=status, queries=None,
-                                             result_summary=None)
-                        )
-                        if status == "pending" and not found_pending:
-                            next_cat_idx = cat_counter
-                            next_task_idx = task_counter_in_cat
-                            found_pending = True
-                        if not found_pending:  # only increment if previous tasks were completed/failed
-                            task_counter_in_cat += 1
+        if loaded_plan:
+            next_cat_idx, next_task_idx = _first_pending_task(loaded_plan)
+            state_updates["research_plan"] = loaded_plan
+            state_updates["current_category_index"] = next_cat_idx
+            state_updates["current_task_index_in_category"] = next_task_idx
+            logger.info(
+                f"Loaded hierarchical research plan from {output_dir}. "
+                f"Next task: Category {next_cat_idx}, Task {next_task_idx} in category."
+            )
+        elif plan_store.exists() or os.path.exists(plan_file):
+            logger.warning(f"Saved plan in {output_dir} was empty or malformed.")
+    except Exception as e:
+        logger.error(f"Failed to load research plan from {output_dir}: {e}", exc_info=True)
+        state_updates["error_message"] = f"Failed to load research plan: {e}"
 
-                if current_category:  # Append last category
-                    loaded_plan.append(current_category)
+    try:
+        search_results = _load_search_results(output_dir)
+        if search_results is not None:
+            state_updates["search_results"] = search_results
+    except Exception as e:
+        logger.error(f"Failed to load search results from {output_dir}: {e}")
+        state_updates["error_message"] = (
+                state_updates.get("error_message", "") + f" Failed to load search results: {e}").strip()
 
-            if loaded_plan:
-                state_updates["research_plan"] = loaded_plan
-                if not found_pending and loaded_plan:  # All tasks were completed or failed
-                    next_cat_idx = len(loaded_plan)  # Points beyond the last category
-                    next_task_idx = 0
-                state_updates["current_category_index"] = next_cat_idx
-                state_updates["current_task_index_in_category"] = next_task_idx
-                logger.info(
-                    f"Loaded hierarchical research plan from {plan_file}. "
-                    f"Next task: Category {next_cat_idx}, Task {next_task_idx} in category."
-                )
-            else:
-                logger.warning(f"Plan file {plan_file} was empty or malformed.")
+    return state_updates
 
-        except Exception as e:
-            logger.error(f"Failed to load or parse research plan {plan_file}: {e}", exc_info=True)
-            state_updates["error_message"] = f"Failed to load research plan: {e}"
-    else:
-        logger.info(f"Plan file {plan_file} not found. Will start fresh.")
 
+def _load_search_results(output_dir: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Streams search results back from the append-only results log.
+    Falls back to a compacted search_info.json for task folders written before the log existed.
+    """
+    log_file = os.path.join(output_dir, SEARCH_INFO_LOG_FILENAME)
+    if os.path.exists(log_file):
+        results = []
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a truncated last line; everything before it is intact.
+                    logger.warning(f"Skipping malformed line {line_num} in {log_file}")
+        logger.info(f"Loaded {len(results)} search results from {log_file}")
+        return results
+
+    search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
     if os.path.exists(search_file):
-        try:
-            with open(search_file, "r", encoding="utf-8") as f:
-                state_updates["search_results"] = json.load(f)
-                logger.info(f"Loaded search results from {search_file}")
-        except Exception as e:
-            logger.error(f"Failed to load search results {search_file}: {e}")
-            state_updates["error_message"] = (
-                    state_updates.get("error_message", "") + f" Failed to load search results: {e}").strip()
+        with open(search_file, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        logger.info(f"Loaded search results from {search_file}")
+        return results
+    return None
 
-    return state_updates
+
+def render_plan_markdown(plan: List[ResearchCategoryItem]) -> str:
+    lines = ["# Research Plan\n\n"]
+    for cat_idx, category in enumerate(plan):
+        lines.append(f"## {cat_idx + 1}. {category['category_name']}\n\n")
+        for task_idx, task in enumerate(category['tasks']):
+            marker = "- [x]" if task["status"] == "completed" else "- [ ]" if task[
+                                                                                  "status"] == "pending" else "- [-]"  # [-] for failed
+            lines.append(f"  {marker} {task['task_description']}\n")
+        lines.append("\n")
+    return "".join(lines)
 
 
 def _save_plan_to_md(plan: List[ResearchCategoryItem], output_dir: str):
+    """Renders the human-readable view of the plan; the plan store holds the actual state."""
     plan_file = os.path.join(output_dir, PLAN_FILENAME)
     try:
         with open(plan_file, "w", encoding="utf-8") as f:
-            f.write(f"# Research Plan\n\n")
-            for cat_idx, category in enumerate(plan):
-                f.write(f"## {cat_idx + 1}. {category['category_name']}\n\n")
-                for task_idx, task in enumerate(category['tasks']):
-                    marker = "- [x]" if task["status"] == "completed" else "- [ ]" if task[
-                                                                                          "status"] == "pending" else "- [-]"  # [-] for failed
-                    f.write(f"  {marker} {task['task_description']}\n")
-                f.write("\n")
+            f.write(render_plan_markdown(plan))
         logger.info(f"Hierarchical research plan saved to {plan_file}")
     except Exception as e:
         logger.error(f"Failed to save research plan to {plan_file}: {e}")
 
 
+def _append_search_results_to_log(new_results: List[Dict[str, Any]], output_dir: str):
+    """Appends only the new search results to the JSON Lines results log."""
+    if not new_results:
+        return
+    log_file = os.path.join(output_dir, SEARCH_INFO_LOG_FILENAME)
+    try:
+        lines = "".join(json.dumps(result, ensure_ascii=False, default=str) + "\n" for result in new_results)
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(lines)
+        logger.info(f"Appended {len(new_results)} search results to {log_file}")
+    except Exception as e:
+        logger.error(f"Failed to append search results to {log_file}: {e}")
+
+
+def _reset_search_results_log(output_dir: str):
+    """Truncates the results log when a new plan starts from scratch."""
+    log_file = os.path.join(output_dir, SEARCH_INFO_LOG_FILENAME)
+    try:
+        open(log_file, "w", encoding="utf-8").close()
+    except Exception as e:
+        logger.error(f"Failed to reset search results log {log_file}: {e}")
+
+
 def _save_search_results_to_json(results: List[Dict[str, Any]], output_dir: str):
-    """Appends or overwrites search results to a JSON file."""
+    """Writes the compacted search_info.json. Only done once per run, at synthesis time."""
     search_file = os.path.join(output_dir, SEARCH_INFO_FILENAME)
     try:
-        # Simple overwrite for now, could be append
         with open(search_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
         logger.info(f"Search results saved to {search_file}")
     except Exception as e:
         logger.error(f"Failed to save search results to {search_file}: {e}")
 
 
-def _save_report_to_md(report: str, output_dir: Path):
+def _save_report_to_md(report: str, output_dir: str):
     """Saves the final report to a markdown file."""
     report_file = os.path.join(output_dir, REPORT_FILENAME)
     try:
@@ -458,13 +570,14 @@ def _save_report_to_md(report: str, output_dir: Path):
         logger.error(f"Failed to save final report to {report_file}: {e}")
 
 
-async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
+async def planning_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
     logger.info("--- Entering Planning Node ---")
     if state.get("stop_requested"):
         logger.info("Stop requested, skipping planning.")
         return {"stop_requested": True}
 
-    llm = state["llm"]
+    context = _run_context(config)
+    llm = context["llm"]
     topic = state["topic"]
     existing_plan = state.get("research_plan")
     output_dir = state["output_dir"]
@@ -472,7 +585,7 @@ async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
     if existing_plan and (
             state.get("current_category_index", 0) > 0 or state.get("current_task_index_in_category", 0) > 0):
         logger.info("Resuming with existing plan.")
-        _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially
+        _publish_progress(context, "plan_created", plan=existing_plan, resumed=True)
         # current_category_index and current_task_index_in_category should be set by _load_previous_state
         return {"research_plan": existing_plan}
 
@@ -589,7 +702,10 @@ Ensure the output is a valid JSON array.
             return {"error_message": "Failed to generate research plan structure."}
 
         logger.info(f"Generated research plan with {len(new_plan)} categories.")
+        await asyncio.to_thread(get_plan_store(output_dir).save_plan, new_plan)
         _save_plan_to_md(new_plan, output_dir)  # Save the hierarchical plan
+        _reset_search_results_log(output_dir)  # A fresh plan starts with no results
+        _publish_progress(context, "plan_created", plan=new_plan, resumed=False)
 
         return {
             "research_plan": new_plan,
@@ -606,60 +722,66 @@ Ensure the output is a valid JSON array.
         return {"error_message": f"LLM Error during planning: {e}"}
 
 
-async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
-    logger.info("--- Entering Research Execution Node ---")
-    if state.get("stop_requested"):
-        logger.info("Stop requested, skipping research execution.")
-        return {
-            "stop_requested": True,
-            "current_category_index": state["current_category_index"],
-            "current_task_index_in_category": state["current_task_index_in_category"],
-        }
-
+def _next_task_batch(
+        plan: List[ResearchCategoryItem],
+        cat_idx: int,
+        task_idx: int,
+        max_tasks: int,
+        scheduling: str,
+) -> List[Tuple[int, int]]:
+    """
+    Collects up to `max_tasks` not-yet-completed tasks in plan order, starting at (cat_idx, task_idx).
+    With "category" scheduling a batch never crosses a category boundary; "plan" may span categories.
+    """
+    batch = []
+    while cat_idx < len(plan) and len(batch) < max(1, max_tasks):
+        tasks = plan[cat_idx]["tasks"]
+        if task_idx >= len(tasks):
+            if batch and scheduling != "plan":
+                break
+            cat_idx, task_idx = cat_idx + 1, 0
+            continue
+        if _needs_research(tasks[task_idx]):
+            batch.append((cat_idx, task_idx))
+        task_idx += 1
+    return batch
+
+
+def _index_after(plan: List[ResearchCategoryItem], cat_idx: int, task_idx: int) -> Tuple[int, int]:
+    """Returns the plan position right after the given task."""
+    if task_idx + 1 >= len(plan[cat_idx]["tasks"]):
+        return cat_idx + 1, 0
+    return cat_idx, task_idx + 1
+
+
+async def _execute_research_task(
+        state: DeepResearchState,
+        context: Dict[str, Any],
+        cat_idx: int,
+        task_idx: int,
+        base_messages: List[BaseMessage],
+) -> Dict[str, Any]:
+    """
+    Runs one research task: asks the LLM for tool calls and executes them.
+    Updates the task's status in the plan and returns its new results and messages without
+    touching shared state, so several tasks can run concurrently and be merged afterwards.
+    """
     plan = state["research_plan"]
-    cat_idx = state["current_category_index"]
-    task_idx = state["current_task_index_in_category"]
-    llm = state["llm"]
-    tools = state["tools"]
-    output_dir = str(state["output_dir"])
-    task_id = state["task_id"]  # For _AGENT_STOP_FLAGS
-
-    # This check should ideally be handled by `should_continue`
-    if not plan or cat_idx >= len(plan):
-        logger.info("Research plan complete or categories exhausted.")
-        return {}  # should route to synthesis
-
+    llm = context["llm"]
+    tools = context["tools"]
+    task_handle: TaskHandle = context["task_handle"]
     current_category = plan[cat_idx]
-    if task_idx >= len(current_category["tasks"]):
-        logger.info(f"All tasks in category '{current_category['category_name']}' completed. Moving to next category.")
-        # This logic is now effectively handled by should_continue and the index updates below
-        # The next iteration will be caught by should_continue or this node with updated indices
-        return {
-            "current_category_index": cat_idx + 1,
-            "current_task_index_in_category": 0,
-            "messages": state["messages"]  # Pass messages along
-        }
-
     current_task = current_category["tasks"][task_idx]
 
-    if current_task["status"] == "completed":
-        logger.info(
-            f"Task '{current_task['task_description']}' in category '{current_category['category_name']}' already completed. Skipping.")
-        # Logic to find next task
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
-        return {
-            "current_category_index": next_cat_idx,
-            "current_task_index_in_category": next_task_idx,
-            "messages": state["messages"]  # Pass messages along
-        }
+    outcome = {"stopped": False, "new_results": [], "messages": [], "error_message": None}
 
     logger.info(
         f"Executing research task: '{current_task['task_description']}' (Category: '{current_category['category_name']}')"
     )
+    _publish_progress(
+        context, "task_started", category_index=cat_idx, task_index=task_idx,
+        category_name=current_category["category_name"], task_description=current_task["task_description"],
+    )
 
     llm_with_tools = llm.bind_tools(tools)
 
@@ -674,13 +796,12 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
     current_task_message_history = [
         HumanMessage(content=task_prompt_content)
     ]
-    if not state["messages"]:  # First actual execution message
-        invocation_messages = [
-                                  SystemMessage(
-                                      content="You are a research assistant executing one task of a research plan. Focus on the current task only."),
-                              ] + current_task_message_history
-    else:
-        invocation_messages = state["messages"] + current_task_message_history
+    invocation_messages = bound_message_history(
+        base_messages + current_task_message_history,
+        state.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET),
+        SEARCH_INFO_LOG_FILENAME,
+    )
+    outcome["messages"] = current_task_message_history
 
     try:
         logger.info(f"Invoking LLM with tools for task: {current_task['task_description']}")
@@ -689,18 +810,15 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
 
         tool_results = []
         executed_tool_names = []
-        current_search_results = state.get("search_results", [])  # Get existing search results
+        new_results = outcome["new_results"]
 
         if not isinstance(ai_response, AIMessage) or not ai_response.tool_calls:
+            # The prompt allows the LLM to decide no further search is needed, so record its answer and move on.
             logger.warning(
                 f"LLM did not call any tool for task '{current_task['task_description']}'. Response: {ai_response.content[:100]}..."
             )
-            current_task["status"] = "pending"  # Or "completed_no_tool" if LLM explains it's done
+            current_task["status"] = "completed"
             current_task["result_summary"] = f"LLM did not use a tool. Response: {ai_response.content}"
-            current_task["current_category_index"] = cat_idx
-            current_task["current_task_index_in_category"] = task_idx
-            return current_task
-            # We still save the plan and advance.
         else:
             # Process tool calls
             for tool_call in ai_response.tool_calls:
@@ -719,24 +837,29 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                     continue
 
                 try:
-                    stop_event = _AGENT_STOP_FLAGS.get(task_id)
-                    if stop_event and stop_event.is_set():
+                    if task_handle.stopped:
                         logger.info(f"Stop requested before executing tool: {tool_name}")
                         current_task["status"] = "pending"  # Or a new "stopped" status
-                        _save_plan_to_md(plan, output_dir)
-                        return {"stop_requested": True, "research_plan": plan, "current_category_index": cat_idx,
-                                "current_task_index_in_category": task_idx}
+                        outcome["stopped"] = True
+                        return outcome
 
                     logger.info(f"Executing tool: {tool_name}")
                     tool_output = await selected_tool.ainvoke(tool_args)
+                    if task_handle.stopped:
+                        # Searches were cancelled part-way; the task is redone on resume (finished ones are cached)
+                        logger.info(f"Stop requested while executing tool: {tool_name}")
+                        current_task["status"] = "pending"
+                        outcome["stopped"] = True
+                        return outcome
                     logger.info(f"Tool '{tool_name}' executed successfully.")
 
                     if tool_name == "parallel_browser_search":
-                        current_search_results.extend(tool_output)  # tool_output is List[Dict]
+                        current_task["queries"] = (current_task.get("queries") or []) + tool_args.get("queries", [])
+                        new_results.extend(tool_output)  # tool_output is List[Dict]
                     else:  # For other tools, we might need specific handling or just log
                         logger.info(f"Result from tool '{tool_name}': {str(tool_output)[:200]}...")
                         # Storing non-browser results might need a different structure or key in search_results
-                        current_search_results.append(
+                        new_results.append(
                             {"tool_name": tool_name, "args": tool_args, "output": str(tool_output),
                              "status": "completed"})
 
@@ -746,14 +869,15 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                     logger.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
                     tool_results.append(
                         ToolMessage(content=f"Error executing tool {tool_name}: {e}", tool_call_id=tool_call_id))
-                    current_search_results.append(
+                    new_results.append(
                         {"tool_name": tool_name, "args": tool_args, "status": "failed", "error": str(e)})
 
+            # Tag findings with their plan category so synthesis can summarise them per category
+            for result in new_results:
+                result["category"] = current_category["category_name"]
+
             # After processing all tool calls for this task
             step_failed_tool_execution = any("Error:" in str(tr.content) for tr in tool_results)
-            # Consider a task successful if a browser search was attempted and didn't immediately error out during call
-            # The browser search itself returns status for each query.
-            browser_tool_attempted_successfully = "parallel_browser_search" in executed_tool_names and not step_failed_tool_execution
 
             if step_failed_tool_execution:
                 current_task["status"] = "failed"
@@ -767,59 +891,235 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                 current_task["status"] = "failed"  # Or a more specific status
                 current_task["result_summary"] = "LLM prepared for tool call but provided no tools."
 
-        # Save progress
-        _save_plan_to_md(plan, output_dir)
-        _save_search_results_to_json(current_search_results, output_dir)
+        outcome["messages"] = current_task_message_history + [ai_response] + tool_results
+        return outcome
 
-        # Determine next indices
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
+    except Exception as e:
+        logger.error(f"Unhandled error during research execution for task '{current_task['task_description']}': {e}",
+                     exc_info=True)
+        current_task["status"] = "failed"
+        outcome["error_message"] = f"Core Execution Error on task '{current_task['task_description']}': {e}"
+        return outcome
 
-        updated_messages = state["messages"] + current_task_message_history + [ai_response] + tool_results
 
+async def research_execution_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
+    logger.info("--- Entering Research Execution Node ---")
+    if state.get("stop_requested"):
+        logger.info("Stop requested, skipping research execution.")
         return {
-            "research_plan": plan,
-            "search_results": current_search_results,
-            "current_category_index": next_cat_idx,
-            "current_task_index_in_category": next_task_idx,
-            "messages": updated_messages,
+            "stop_requested": True,
+            "current_category_index": state["current_category_index"],
+            "current_task_index_in_category": state["current_task_index_in_category"],
         }
 
-    except Exception as e:
-        logger.error(f"Unhandled error during research execution for task '{current_task['task_description']}': {e}",
-                     exc_info=True)
-        current_task["status"] = "failed"
-        _save_plan_to_md(plan, output_dir)
-        # Determine next indices even on error to attempt to move on
-        next_task_idx = task_idx + 1
-        next_cat_idx = cat_idx
-        if next_task_idx >= len(current_category["tasks"]):
-            next_cat_idx += 1
-            next_task_idx = 0
+    plan = state["research_plan"]
+    cat_idx = state["current_category_index"]
+    task_idx = state["current_task_index_in_category"]
+    output_dir = state["output_dir"]
+    context = _run_context(config)
+    max_concurrent_tasks = state.get("max_concurrent_tasks", 1)
+    scheduling = state.get("task_scheduling", "category")
+
+    # This check should ideally be handled by `should_continue`
+    if not plan or cat_idx >= len(plan):
+        logger.info("Research plan complete or categories exhausted.")
+        return {}  # should route to synthesis
+
+    batch = _next_task_batch(plan, cat_idx, task_idx, max_concurrent_tasks, scheduling)
+    if not batch:
+        logger.info("No pending tasks left in the plan. Moving to synthesis.")
         return {
-            "research_plan": plan,
-            "current_category_index": next_cat_idx,
-            "current_task_index_in_category": next_task_idx,
-            "error_message": f"Core Execution Error on task '{current_task['task_description']}': {e}",
-            "messages": state["messages"] + current_task_message_history  # Preserve messages up to error
+            "current_category_index": len(plan),
+            "current_task_index_in_category": 0,
         }
 
+    base_messages = state["messages"]
+    if not base_messages:  # First actual execution message
+        base_messages = [
+            SystemMessage(
+                content="You are a research assistant executing one task of a research plan. Focus on the current task only."),
+        ]
+
+    if len(batch) > 1:
+        logger.info(f"Dispatching {len(batch)} research tasks concurrently: {batch}")
+    outcomes = await asyncio.gather(
+        *[_execute_research_task(state, context, b_cat_idx, b_task_idx, base_messages) for b_cat_idx, b_task_idx in batch]
+    )
+
+    # Merge in plan order so results and history do not depend on which task finished first
+    current_search_results = state.get("search_results", [])  # Get existing search results
+    results_count_before = len(current_search_results)
+    updated_messages = list(base_messages)
+    next_cat_idx, next_task_idx = _index_after(plan, *batch[-1])
+    error_message = None
+    stop_requested = False
+    for (b_cat_idx, b_task_idx), outcome in zip(batch, outcomes):
+        current_search_results.extend(outcome["new_results"])
+        task = plan[b_cat_idx]["tasks"][b_task_idx]
+        _publish_progress(
+            context, "task_finished", category_index=b_cat_idx, task_index=b_task_idx,
+            task_description=task["task_description"], status=task["status"], plan=plan,
+        )
+        if outcome["stopped"]:
+            # Resume from the first task that did not finish
+            if not stop_requested:
+                stop_requested = True
+                next_cat_idx, next_task_idx = b_cat_idx, b_task_idx
+            continue
+        updated_messages.extend(outcome["messages"])
+        if outcome["error_message"] and not error_message:
+            error_message = outcome["error_message"]
+
+    # Keep the stored history bounded too; full tool outputs stay in the results log
+    updated_messages = bound_message_history(
+        updated_messages,
+        state.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET),
+        SEARCH_INFO_LOG_FILENAME,
+    )
+
+    # Save progress: only the tasks of this batch changed, so only their rows are written
+    await asyncio.to_thread(
+        get_plan_store(output_dir).update_tasks,
+        [(b_cat_idx, b_task_idx, plan[b_cat_idx]["tasks"][b_task_idx]) for b_cat_idx, b_task_idx in batch],
+    )
+    _append_search_results_to_log(current_search_results[results_count_before:], output_dir)
+    new_results = current_search_results[results_count_before:]
+    if new_results:
+        _publish_progress(
+            context, "result_added", count=len(new_results), total=len(current_search_results),
+            queries=[result["query"] for result in new_results if "query" in result],
+        )
+
+    update = {
+        "research_plan": plan,
+        "search_results": current_search_results,
+        "current_category_index": next_cat_idx,
+        "current_task_index_in_category": next_task_idx,
+        "messages": updated_messages,
+    }
+    if stop_requested:
+        update["stop_requested"] = True
+    if error_message:
+        update["error_message"] = error_message
+    return update
+
+
+def _format_finding(result_entry: Dict[str, Any]) -> str:
+    """Formats one search result for the synthesis prompt; returns "" for entries without content."""
+    query = result_entry.get("query")  # From parallel_browser_search
+    tool_name = result_entry.get("tool_name")  # From other tools
+    status = result_entry.get("status", "unknown")
+
+    if query is not None and status == "completed" and result_entry.get("result"):
+        # The result is the summary BrowserUseAgent returned as its final result
+        return f'### Finding from Web Search Query: "{query}"\n- **Summary:**\n{result_entry["result"]}\n---\n'
+    if tool_name and status == "completed" and result_entry.get("output"):
+        return (f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
+                f'- **Output:**\n{result_entry["output"]}\n---\n')
+    if status == "failed":
+        q_or_t = f'Query: "{query}"' if query is not None else f'Tool: "{tool_name}"'
+        return f"### Failed {q_or_t}\n- **Error:** {result_entry.get('error')}\n---\n"
+    return ""
+
+
+def _chunk_findings(findings: List[str], max_tokens: int) -> List[str]:
+    """Packs formatted findings into chunks of roughly `max_tokens` tokens each."""
+    chunks, current, current_tokens = [], [], 0
+    for finding in findings:
+        tokens = len(finding) // CHARS_PER_TOKEN
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(finding)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+async def _summarize_category(llm: Any, topic: str, category_name: str, findings_chunk: str) -> str:
+    """Map step: condenses the findings of one category into notes for the final report."""
+    messages = [
+        SystemMessage(
+            content="You condense research findings into notes for one section of a research report. "
+                    "Keep every relevant fact, figure, date, name and source URL. Remove repetition. "
+                    "Point out contradictions between findings. Answer with Markdown bullet points only."
+        ),
+        HumanMessage(
+            content=f"**Research Topic:** {topic}\n**Section:** {category_name}\n\n"
+                    f"**Findings:**\n```\n{findings_chunk}\n```"
+        ),
+    ]
+    response = await llm.ainvoke(messages)
+    return response.content
+
+
+async def _map_findings_by_category(
+        llm: Any, topic: str, findings_by_category: Dict[str, List[str]], chunk_tokens: int
+) -> str:
+    """Summarises every category's findings concurrently and returns the summaries as one document."""
+    semaphore = asyncio.Semaphore(SYNTHESIS_MAP_CONCURRENCY)
 
-async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
-    """Synthesizes the final report from the collected search results."""
+    async def summarize(category_name: str, findings_chunk: str) -> str:
+        async with semaphore:
+            return await _summarize_category(llm, topic, category_name, findings_chunk)
+
+    jobs = [
+        (category_name, summarize(category_name, chunk))
+        for category_name, findings in findings_by_category.items()
+        for chunk in _chunk_findings(findings, chunk_tokens)
+    ]
+    logger.info(f"Summarising findings of {len(findings_by_category)} categories in {len(jobs)} chunks.")
+    summaries = await asyncio.gather(*[job for _, job in jobs])
+
+    sections: Dict[str, List[str]] = {}
+    for (category_name, _), summary in zip(jobs, summaries):
+        sections.setdefault(category_name, []).append(summary)
+    return "".join(
+        f"### {category_name}\n" + "\n".join(category_summaries) + "\n---\n"
+        for category_name, category_summaries in sections.items()
+    )
+
+
+async def _stream_report(context: Dict[str, Any], output_dir: str, messages: List[BaseMessage]) -> str:
+    """Streams the report into report.md and to the progress queue as it is generated."""
+    report_file = os.path.join(output_dir, REPORT_FILENAME)
+    parts = []
+    with open(report_file, "w", encoding="utf-8") as f:
+        async for chunk in context["llm"].astream(messages):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            parts.append(text)
+            f.write(text)
+            f.flush()
+            _publish_progress(context, "report_chunk", text=text)
+    logger.info(f"Final report streamed to {report_file}")
+    return "".join(parts)
+
+
+async def synthesis_node(state: DeepResearchState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Synthesizes the final report from the collected search results.
+
+    Small finding sets go into a single prompt. Large ones (or synthesis_mode "map_reduce") are
+    first summarised per plan category, concurrently, and the report is written from the summaries.
+    Either way the report is streamed to report.md and to the progress queue as report_chunk events.
+    """
     logger.info("--- Entering Synthesis Node ---")
     if state.get("stop_requested"):
         logger.info("Stop requested, skipping synthesis.")
         return {"stop_requested": True}
 
-    llm = state["llm"]
     topic = state["topic"]
     search_results = state.get("search_results", [])
     output_dir = state["output_dir"]
     plan = state["research_plan"]  # Include plan for context
+    context = _run_context(config)
+    _publish_progress(context, "synthesis_started", result_count=len(search_results))
+
+    # Produce the compacted search_info.json once, for tools that read the whole list
+    _save_search_results_to_json(search_results, output_dir)
 
     if not search_results:
         logger.warning("No search results found to synthesize report.")
@@ -831,49 +1131,45 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         f"Synthesizing report from {len(search_results)} collected search result entries."
     )
 
-    # Prepare context for the LLM
-    # Format search results nicely, maybe group by query or original plan step
-    formatted_results = ""
-    references = {}
-    ref_count = 1
-    for i, result_entry in enumerate(search_results):
-        query = result_entry.get("query", "Unknown Query")  # From parallel_browser_search
-        tool_name = result_entry.get("tool_name")  # From other tools
-        status = result_entry.get("status", "unknown")
-        result_data = result_entry.get("result")  # From BrowserUseAgent's final_result
-        tool_output_str = result_entry.get("output")  # From other tools
-
-        if tool_name == "parallel_browser_search" and status == "completed" and result_data:
-            # result_data is the summary from BrowserUseAgent
-            formatted_results += f'### Finding from Web Search Query: "{query}"\n'
-            formatted_results += f"- **Summary:**\n{result_data}\n"  # result_data is already a summary string here
-            # If result_data contained title/URL, you'd format them here.
-            # The current BrowserUseAgent returns a string summary directly as 'final_data' in run_single_browser_task
-            formatted_results += "---\n"
-        elif tool_name != "parallel_browser_search" and status == "completed" and tool_output_str:
-            formatted_results += f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
-            formatted_results += f"- **Output:**\n{tool_output_str}\n"
-            formatted_results += "---\n"
-        elif status == "failed":
-            error = result_entry.get("error")
-            q_or_t = f"Query: \"{query}\"" if query != "Unknown Query" else f"Tool: \"{tool_name}\""
-            formatted_results += f'### Failed {q_or_t}\n'
-            formatted_results += f"- **Error:** {error}\n"
-            formatted_results += "---\n"
+    # Group the formatted findings by the plan category that produced them
+    findings_by_category: Dict[str, List[str]] = {}
+    for result_entry in search_results:
+        finding = _format_finding(result_entry)
+        if finding:
+            category_name = result_entry.get("category") or UNCATEGORIZED_FINDINGS
+            findings_by_category.setdefault(category_name, []).append(finding)
+    findings_tokens = sum(len(f) for findings in findings_by_category.values() for f in findings) // CHARS_PER_TOKEN
+    # Leave room in the prompt for the plan, the instructions and the answer
+    chunk_tokens = max(1000, state.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET) // 2)
+
+    synthesis_mode = state.get("synthesis_mode", "auto")
+    use_map_reduce = synthesis_mode == "map_reduce" or (synthesis_mode == "auto" and findings_tokens > chunk_tokens)
 
     # Prepare the research plan context
-    plan_summary = "\nResearch Plan Followed:\n"
+    plan_lines = ["\nResearch Plan Followed:\n"]
     for cat_idx, category in enumerate(plan):
-        plan_summary += f"\n#### Category {cat_idx + 1}: {category['category_name']}\n"
-        for task_idx, task in enumerate(category['tasks']):
+        plan_lines.append(f"\n#### Category {cat_idx + 1}: {category['category_name']}\n")
+        for task in category["tasks"]:
             marker = "[x]" if task["status"] == "completed" else "[ ]" if task["status"] == "pending" else "[-]"
-            plan_summary += f"  - {marker} {task['task_description']}\n"
+            plan_lines.append(f"  - {marker} {task['task_description']}\n")
+    plan_summary = "".join(plan_lines)
 
-    synthesis_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are a professional researcher tasked with writing a comprehensive and well-structured report based on collected findings.
+    try:
+        if use_map_reduce:
+            logger.info(f"Using map-reduce synthesis for ~{findings_tokens} tokens of findings.")
+            findings_heading = "Summarised Findings by Category"
+            formatted_results = await _map_findings_by_category(
+                context["llm"], topic, findings_by_category, chunk_tokens
+            )
+        else:
+            findings_heading = "Collected Findings"
+            formatted_results = "".join(
+                finding for findings in findings_by_category.values() for finding in findings
+            )
+
+        messages = [
+            SystemMessage(
+                content="""You are a professional researcher tasked with writing a comprehensive and well-structured report based on collected findings.
         The report should address the research topic thoroughly, synthesizing the information gathered from various sources.
         Structure the report logically:
         1.  Briefly introduce the topic and the report's scope (mentioning the research plan followed, including categories and tasks, is good).
@@ -882,49 +1178,26 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
 
         Ensure the tone is objective and professional.
         If findings are contradictory or incomplete, acknowledge this.
-        """,  # Removed citation part for simplicity for now, as browser agent returns summaries.
+        """
             ),
-            (
-                "human",
-                f"""
+            HumanMessage(
+                content=f"""
             **Research Topic:** {topic}
 
             {plan_summary}
 
-            **Collected Findings:**
+            **{findings_heading}:**
             ```
             {formatted_results}
             ```
 
             Please generate the final research report in Markdown format based **only** on the information above.
-            """,
+            """
             ),
         ]
-    )
-
-    try:
-        response = await llm.ainvoke(
-            synthesis_prompt.format_prompt(
-                topic=topic,
-                plan_summary=plan_summary,
-                formatted_results=formatted_results,
-            ).to_messages()
-        )
-        final_report_md = response.content
-
-        # Append the reference list automatically to the end of the generated markdown
-        if references:
-            report_references_section = "\n\n## References\n\n"
-            # Sort refs by ID for consistent output
-            sorted_refs = sorted(references.values(), key=lambda x: x["id"])
-            for ref in sorted_refs:
-                report_references_section += (
-                    f"[{ref['id']}] {ref['title']} - {ref['url']}\n"
-                )
-            final_report_md += report_references_section
+        final_report_md = await _stream_report(context, output_dir, messages)
 
         logger.info("Successfully synthesized the final report.")
-        _save_report_to_md(final_report_md, output_dir)
         return {"final_report": final_report_md}
 
     except Exception as e:
@@ -976,6 +1249,65 @@ def should_continue(state: DeepResearchState) -> str:
     return "synthesize_report"
 
 
+def _compile_graph() -> CompiledStateGraph:
+    """Compiles the Langgraph state machine."""
+    workflow = StateGraph(DeepResearchState)
+
+    # Add nodes
+    workflow.add_node("plan_research", planning_node)
+    workflow.add_node("execute_research", research_execution_node)
+    workflow.add_node("synthesize_report", synthesis_node)
+    workflow.add_node(
+        "end_run", lambda state: logger.info("--- Reached End Run Node ---") or {}
+    )  # Simple end node
+
+    # Define edges
+    workflow.set_entry_point("plan_research")
+
+    workflow.add_edge(
+        "plan_research", "execute_research"
+    )  # Always execute after planning
+
+    # Conditional edge after execution
+    workflow.add_conditional_edges(
+        "execute_research",
+        should_continue,
+        {
+            "execute_research": "execute_research",  # Loop back if more steps
+            "synthesize_report": "synthesize_report",  # Move to synthesis if done
+            "end_run": "end_run",  # End if stop requested or error
+        },
+    )
+
+    workflow.add_edge("synthesize_report", "end_run")  # End after synthesis
+
+    app = workflow.compile()
+    return app
+
+
+_RESEARCH_GRAPH: Optional[CompiledStateGraph] = None
+
+
+def get_research_graph() -> CompiledStateGraph:
+    """
+    Returns the process-wide compiled research graph shared by every DeepResearchAgent.
+    It holds nothing run-specific: the LLM, tools and progress queue come from the run config,
+    and each run attaches its own checkpointer to a copy (see _with_checkpointer).
+    """
+    global _RESEARCH_GRAPH
+    if _RESEARCH_GRAPH is None:
+        _RESEARCH_GRAPH = _compile_graph()
+    return _RESEARCH_GRAPH
+
+
+def _with_checkpointer(graph: CompiledStateGraph, checkpointer: BaseCheckpointSaver) -> CompiledStateGraph:
+    """
+    Shallow copy of the compiled graph that saves the state after every node under the run's
+    thread_id, so an interrupted run can continue where it stopped. Much cheaper than recompiling.
+    """
+    return graph.copy(update={"checkpointer": checkpointer})
+
+
 # --- DeepSearchAgent Class ---
 
 
@@ -1000,15 +1332,25 @@ class DeepResearchAgent:
         self.mcp_server_config = mcp_server_config
         self.mcp_client = None
         self.stopped = False
-        self.graph = self._compile_graph()
+        self.graph = get_research_graph()
         self.current_task_id: Optional[str] = None
-        self.stop_event: Optional[threading.Event] = None
+        self.task_handle: Optional[TaskHandle] = None
         self.runner: Optional[asyncio.Task] = None  # To hold the asyncio task for run
+        self.browser_pool: Optional[BrowserPool] = None
 
     async def _setup_tools(
-            self, task_id: str, stop_event: threading.Event, max_parallel_browsers: int = 1
+            self, task_id: str, task_handle: TaskHandle, max_parallel_browsers: int = 1,
+            user_id: Optional[str] = None, progress_queue: Optional[asyncio.Queue] = None,
     ) -> List[Tool]:
         """Sets up the basic tools (File I/O) and optional MCP tools."""
+        progress_target = {"task_id": task_id, "progress_queue": progress_queue}
+
+        def on_search_result(result: Dict[str, Any], finished: int, total: int):
+            _publish_progress(
+                progress_target, "search_finished", query=result.get("query"),
+                status=result.get("status"), finished=finished, total=total,
+            )
+
         tools = [
             WriteFileTool(),
             ReadFileTool(),
@@ -1018,10 +1360,16 @@ class DeepResearchAgent:
             llm=self.llm,
             browser_config=self.browser_config,
             task_id=task_id,
-            stop_event=stop_event,
+            task_handle=task_handle,
             max_parallel_browsers=max_parallel_browsers,
+            user_id=user_id,
+            on_result=on_search_result,
         )
         tools += [browser_use_tool]
+        # Pre-launch browsers while the plan is generated so the first search does not wait on Chromium
+        # The handle owns the warm-up task, so a stopped run stops launching browsers too
+        self.browser_pool = get_research_browser_pool(self.browser_config, max_parallel_browsers)
+        task_handle.spawn(self.browser_pool.warm_up())
         # Add MCP tools if config is provided
         if self.mcp_server_config:
             try:
@@ -1044,43 +1392,64 @@ class DeepResearchAgent:
 
     async def close_mcp_client(self):
         if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+            await release_mcp_client(self.mcp_client)
             self.mcp_client = None
 
-    def _compile_graph(self) -> StateGraph:
-        """Compiles the Langgraph state machine."""
-        workflow = StateGraph(DeepResearchState)
-
-        # Add nodes
-        workflow.add_node("plan_research", planning_node)
-        workflow.add_node("execute_research", research_execution_node)
-        workflow.add_node("synthesize_report", synthesis_node)
-        workflow.add_node(
-            "end_run", lambda state: logger.info("--- Reached End Run Node ---") or {}
-        )  # Simple end node
-
-        # Define edges
-        workflow.set_entry_point("plan_research")
-
-        workflow.add_edge(
-            "plan_research", "execute_research"
-        )  # Always execute after planning
-
-        # Conditional edge after execution
-        workflow.add_conditional_edges(
-            "execute_research",
-            should_continue,
-            {
-                "execute_research": "execute_research",  # Loop back if more steps
-                "synthesize_report": "synthesize_report",  # Move to synthesis if done
-                "end_run": "end_run",  # End if stop requested or error
-            },
-        )
+    async def _resume_input(
+            self,
+            graph: CompiledStateGraph,
+            run_config: RunnableConfig,
+            output_dir: str,
+            initial_state: DeepResearchState,
+            run_settings: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Prepares the graph input that resumes the run of run_config's thread.
 
-        workflow.add_edge("synthesize_report", "end_run")  # End after synthesis
+        A run with a checkpointed plan continues from its last checkpoint with its full state,
+        message history included: this returns None after pointing the checkpoint at the first
+        pending task and applying this run's settings. Runs without checkpoints (saved before
+        checkpointing existed) are rebuilt from the plan store and the results log instead.
+        """
+        context = _run_context(run_config)
+        task_id = context["task_id"]
+        logger.info(f"Attempting to resume task {task_id}...")
+        snapshot = await graph.aget_state(run_config)
+        plan = snapshot.values.get("research_plan")
+        if plan:
+            cat_idx, task_idx = _first_pending_task(plan)
+            # Recorded as the planning node's output, so the graph continues with research execution
+            await graph.aupdate_state(
+                run_config,
+                {
+                    **run_settings,
+                    "current_category_index": cat_idx,
+                    "current_task_index_in_category": task_idx,
+                    "stop_requested": False,
+                    "error_message": None,
+                },
+                as_node="plan_research",
+            )
+            logger.info(
+                f"Resuming from checkpoint with {len(plan)} plan categories, "
+                f"{len(snapshot.values.get('search_results', []))} existing results and "
+                f"{len(snapshot.values.get('messages', []))} messages. Next task: Cat {cat_idx}, Task {task_idx}"
+            )
+            _publish_progress(context, "plan_created", plan=plan, resumed=True)
+            return None
 
-        app = workflow.compile()
-        return app
+        loaded_state = await asyncio.to_thread(_load_previous_state, task_id, output_dir)
+        if loaded_state.get("research_plan"):
+            logger.info(
+                f"Resuming with {len(loaded_state['research_plan'])} plan categories "
+                f"and {len(loaded_state.get('search_results', []))} existing results. "
+                f"Next task: Cat {loaded_state['current_category_index']}, Task {loaded_state['current_task_index_in_category']}"
+            )
+        else:
+            logger.warning(
+                f"Resume requested for {task_id}, but no previous plan found. Starting fresh."
+            )
+        return {**initial_state, **loaded_state}
 
     async def run(
             self,
@@ -1088,13 +1457,30 @@ class DeepResearchAgent:
             task_id: Optional[str] = None,
             save_dir: str = "./tmp/deep_research",
             max_parallel_browsers: int = 1,
+            max_concurrent_tasks: int = 1,
+            task_scheduling: str = "category",
+            context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+            progress_queue: Optional[asyncio.Queue] = None,
+            user_id: Optional[str] = None,
+            synthesis_mode: str = "auto",
     ) -> Dict[str, Any]:
         """
         Starts the deep research process (Async Generator Version).
 
         Args:
             topic: The research topic.
-            task_id: Optional existing task ID to resume. If None, a new ID is generated.
+            task_id: Optional existing task ID to resume from its last checkpoint. If None, a new ID is generated.
+            max_concurrent_tasks: How many plan tasks may be researched at the same time.
+            task_scheduling: "category" runs concurrent tasks within one category at a time,
+                             "plan" lets a batch of concurrent tasks span categories.
+            context_token_budget: Approximate token limit for the message history sent to the LLM.
+            progress_queue: Optional queue that receives progress events (dicts with a "type" key:
+                            run_started, plan_created, task_started, search_finished, task_finished,
+                            result_added, synthesis_started, report_chunk, run_finished).
+            user_id: User whose quota the browser searches are counted against in the run scheduler.
+            synthesis_mode: "single" writes the report from all findings in one prompt, "map_reduce"
+                            summarises each category's findings first, "auto" picks map_reduce when
+                            the findings exceed half of context_token_budget.
 
         Yields:
              Intermediate state updates or messages during execution.
@@ -1124,58 +1510,62 @@ class DeepResearchAgent:
         )
         logger.info(f"[AsyncGen] Output directory: {output_dir}")
 
-        self.stop_event = threading.Event()
-        _AGENT_STOP_FLAGS[self.current_task_id] = self.stop_event
+        self.task_handle = get_task_registry().open(self.current_task_id)
         agent_tools = await self._setup_tools(
-            self.current_task_id, self.stop_event, max_parallel_browsers
+            self.current_task_id, self.task_handle, max_parallel_browsers, user_id, progress_queue
         )
+        run_config: RunnableConfig = {
+            "configurable": {
+                "thread_id": self.current_task_id,  # Checkpoints of this run are stored under its task ID
+                "task_id": self.current_task_id,
+                "task_handle": self.task_handle,
+                "llm": self.llm,
+                "tools": agent_tools,
+                "progress_queue": progress_queue,
+            }
+        }
+        context = _run_context(run_config)
+        # Settings of this invocation; they also apply when a checkpointed run is resumed
+        run_settings = {
+            "topic": topic,
+            "output_dir": output_dir,
+            "browser_config": self.browser_config,
+            "max_concurrent_tasks": max(1, max_concurrent_tasks),
+            "task_scheduling": task_scheduling,
+            "context_token_budget": context_token_budget,
+            "synthesis_mode": synthesis_mode if synthesis_mode in SYNTHESIS_MODES else "auto",
+        }
         initial_state: DeepResearchState = {
             "task_id": self.current_task_id,
-            "topic": topic,
             "research_plan": [],
             "search_results": [],
             "messages": [],
-            "llm": self.llm,
-            "tools": agent_tools,
-            "output_dir": Path(output_dir),
-            "browser_config": self.browser_config,
             "final_report": None,
             "current_category_index": 0,
             "current_task_index_in_category": 0,
             "stop_requested": False,
             "error_message": None,
+            **run_settings,
         }
-
-        if task_id:
-            logger.info(f"Attempting to resume task {task_id}...")
-            loaded_state = _load_previous_state(task_id, output_dir)
-            initial_state.update(loaded_state)
-            if loaded_state.get("research_plan"):
-                logger.info(
-                    f"Resuming with {len(loaded_state['research_plan'])} plan categories "
-                    f"and {len(loaded_state.get('search_results', []))} existing results. "
-                    f"Next task: Cat {initial_state['current_category_index']}, Task {initial_state['current_task_index_in_category']}"
-                )
-                initial_state["topic"] = (
-                    topic  # Allow overriding topic even when resuming? Or use stored topic? Let's use new one.
-                )
-            else:
-                logger.warning(
-                    f"Resume requested for {task_id}, but no previous plan found. Starting fresh."
-                )
+        _publish_progress(context, "run_started", output_dir=output_dir)
 
         # --- Execute Graph using ainvoke ---
         final_state = None
         status = "unknown"
         message = None
         try:
-            logger.info(f"Invoking graph execution for task {self.current_task_id}...")
-            self.runner = asyncio.create_task(self.graph.ainvoke(initial_state))
-            final_state = await self.runner
+            async with AsyncSqliteSaver.from_conn_string(os.path.join(output_dir, CHECKPOINT_FILENAME)) as checkpointer:
+                graph = _with_checkpointer(self.graph, checkpointer)
+                graph_input = initial_state
+                if task_id:
+                    graph_input = await self._resume_input(graph, run_config, output_dir, initial_state, run_settings)
+                logger.info(f"Invoking graph execution for task {self.current_task_id}...")
+                self.runner = asyncio.create_task(graph.ainvoke(graph_input, run_config))
+                final_state = await self.runner
             logger.info(f"Graph execution finished for task {self.current_task_id}.")
 
             # Determine status based on final state
-            if self.stop_event and self.stop_event.is_set():
+            if self.task_handle.stopped:
                 status = "stopped"
                 message = "Research process was stopped by request."
                 logger.info(message)
@@ -1197,7 +1587,7 @@ class DeepResearchAgent:
             status = "cancelled"
             message = f"Agent run task cancelled for {self.current_task_id}."
             logger.info(message)
-            # final_state will remain None or the state before cancellation if checkpointing was used
+            # The last checkpoint is kept, so the run can be resumed with its task ID
         except Exception as e:
             status = "error"
             message = f"Unhandled error during graph execution for {self.current_task_id}: {e}"
@@ -1207,11 +1597,21 @@ class DeepResearchAgent:
             logger.info(f"Cleaning up resources for task {self.current_task_id}")
             task_id_to_clean = self.current_task_id
 
-            self.stop_event = None
+            get_task_registry().close(self.task_handle)
+            self.task_handle = None
             self.current_task_id = None
             self.runner = None  # Mark runner as finished
-            if self.mcp_client:
-                await self.mcp_client.__aexit__(None, None, None)
+            await self.close_mcp_client()
+            # Task updates only touch the plan store; refresh the markdown view once per run
+            try:
+                plan_store = get_plan_store(output_dir)
+                if await asyncio.to_thread(plan_store.exists):
+                    _save_plan_to_md(await asyncio.to_thread(plan_store.load_plan), output_dir)
+            except Exception as e:
+                logger.error(f"Failed to render the research plan for {task_id_to_clean}: {e}")
+            finally:
+                close_plan_store(output_dir)
+            _publish_progress(context, "run_finished", status=status, message=message)
 
             # Return a result dictionary including the status and the final state if available
             return {
@@ -1223,39 +1623,21 @@ class DeepResearchAgent:
                 else {},  # Return the final state dict
             }
 
-    async def _stop_lingering_browsers(self, task_id):
-        """Attempts to stop any BrowserUseAgent instances associated with the task_id."""
-        keys_to_stop = [
-            key for key in _BROWSER_AGENT_INSTANCES if key.startswith(f"{task_id}_")
-        ]
-        if not keys_to_stop:
-            return
-
-        logger.warning(
-            f"Found {len(keys_to_stop)} potentially lingering browser agents for task {task_id}. Attempting stop..."
-        )
-        for key in keys_to_stop:
-            agent_instance = _BROWSER_AGENT_INSTANCES.get(key)
-            try:
-                if agent_instance:
-                    # Assuming BU agent has an async stop method
-                    await agent_instance.stop()
-                    logger.info(f"Called stop() on browser agent instance {key}")
-            except Exception as e:
-                logger.error(
-                    f"Error calling stop() on browser agent instance {key}: {e}"
-                )
-
     async def stop(self):
-        """Signals the currently running agent task to stop."""
-        if not self.current_task_id or not self.stop_event:
+        """
+        Stops the currently running agent task: in-flight browser searches are cancelled and the
+        graph ends after the current node, leaving a checkpoint to resume from.
+        """
+        if not self.current_task_id or not self.task_handle:
             logger.info("No agent task is currently running.")
             return
 
         logger.info(f"Stop requested for task ID: {self.current_task_id}")
-        self.stop_event.set()  # Signal the stop event
         self.stopped = True
-        await self._stop_lingering_browsers(self.current_task_id)
+        await self.task_handle.cancel()
+        # Don't leave warm browsers (visible windows when not headless) running after a stop
+        if self.browser_pool:
+            await self.browser_pool.close_idle()
 
     def close(self):
         self.stopped = False
@@ -0,0 +1,111 @@
+import json
+import logging
+from typing import Any, List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate that works for every provider without loading a tokenizer
+CHARS_PER_TOKEN = 4
+COMPACTED_PREFIX = "[Compacted tool output"
+
+
+def estimate_message_tokens(message: BaseMessage) -> int:
+    """Estimates how many prompt tokens a message costs."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tokens = len(content) // CHARS_PER_TOKEN + 4  # small per-message overhead for role markers
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        tokens += len(json.dumps(tool_calls, default=str)) // CHARS_PER_TOKEN
+    return tokens
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+def summarize_tool_output(content: Any, results_ref: str, max_chars: int = 300) -> str:
+    """
+    Replaces a tool output with a compact summary. Browser search outputs are reduced to their
+    queries and statuses, which are the keys to look the full entries up in the results store.
+    """
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        data = None
+
+    if isinstance(data, list) and data and all(isinstance(entry, dict) and "query" in entry for entry in data):
+        queries = ", ".join(f'"{entry["query"]}" ({entry.get("status", "unknown")})' for entry in data)
+        return f"{COMPACTED_PREFIX}: {len(data)} browser search result(s) for {queries}. Full results are in {results_ref}.]"
+
+    text = content if len(content) <= max_chars else content[:max_chars] + "..."
+    return f"{COMPACTED_PREFIX}: {text} Full output is in {results_ref}.]"
+
+
+def _split_exchanges(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into exchanges that each start with a HumanMessage (one research task each)."""
+    exchanges: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not exchanges:
+            exchanges.append([message])
+        else:
+            exchanges[-1].append(message)
+    return exchanges
+
+
+def bound_message_history(
+        messages: List[BaseMessage],
+        token_budget: int,
+        results_ref: str,
+        protect_last: int = 1,
+) -> List[BaseMessage]:
+    """
+    Fits a message history into `token_budget` tokens.
+
+    Leading system messages and the last `protect_last` exchanges (the current task) are always kept.
+    Older tool outputs are replaced with compact summaries first, oldest first; if the history is
+    still too large, the oldest exchanges are dropped whole so tool calls keep their tool results.
+    """
+    if not messages or not token_budget or token_budget <= 0:
+        return messages
+
+    total = estimate_tokens(messages)
+    if total <= token_budget:
+        return messages
+
+    system_count = 0
+    while system_count < len(messages) and isinstance(messages[system_count], SystemMessage):
+        system_count += 1
+    system_messages = list(messages[:system_count])
+    exchanges = _split_exchanges(list(messages[system_count:]))
+    compactable = max(0, len(exchanges) - protect_last)
+
+    # Pass 1: compact tool outputs of older exchanges, oldest first
+    for exchange in exchanges[:compactable]:
+        for i, message in enumerate(exchange):
+            if total <= token_budget:
+                break
+            if isinstance(message, ToolMessage) and not str(message.content).startswith(COMPACTED_PREFIX):
+                compacted = ToolMessage(
+                    content=summarize_tool_output(message.content, results_ref),
+                    tool_call_id=message.tool_call_id,
+                    name=message.name,
+                )
+                total += estimate_message_tokens(compacted) - estimate_message_tokens(message)
+                exchange[i] = compacted
+
+    # Pass 2: drop the oldest exchanges entirely
+    dropped = 0
+    while total > token_budget and dropped < compactable:
+        total -= estimate_tokens(exchanges[dropped])
+        dropped += 1
+
+    if dropped:
+        logger.info(f"Dropped {dropped} old research exchanges to fit the {token_budget} token budget.")
+    bounded = system_messages
+    for exchange in exchanges[dropped:]:
+        bounded.extend(exchange)
+    return bounded
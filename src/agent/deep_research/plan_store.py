@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLAN_STORE_FILENAME = "research_plan.db"
+
+
+class PlanStore:
+    """
+    Machine-readable research plan of one run, stored next to its other outputs.
+
+    One row per task keeps every field (status, queries, result summary), so a finished task is
+    a single in-place UPDATE and loading the plan needs no parsing. research_plan.md is only a
+    rendered view of this store. Methods are blocking; nodes call them via asyncio.to_thread.
+    """
+
+    def __init__(self, output_dir: str):
+        self.db_path = os.path.join(output_dir, PLAN_STORE_FILENAME)
+        os.makedirs(output_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS categories (category_index INTEGER PRIMARY KEY, category_name TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "category_index INTEGER NOT NULL, task_index INTEGER NOT NULL, task_description TEXT NOT NULL, "
+            "status TEXT NOT NULL, queries TEXT, result_summary TEXT, "
+            "PRIMARY KEY (category_index, task_index))"
+        )
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Whether a plan has been saved."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM categories LIMIT 1").fetchone() is not None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def save_plan(self, plan: List[Dict[str, Any]]) -> None:
+        """Replaces the stored plan."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM categories")
+            conn.executemany(
+                "INSERT INTO categories (category_index, category_name) VALUES (?, ?)",
+                [(cat_idx, category["category_name"]) for cat_idx, category in enumerate(plan)],
+            )
+            conn.executemany(
+                "INSERT INTO tasks (category_index, task_index, task_description, status, queries, result_summary) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (cat_idx, task_idx, task["task_description"], task["status"],
+                     json.dumps(task.get("queries")), task.get("result_summary"))
+                    for cat_idx, category in enumerate(plan)
+                    for task_idx, task in enumerate(category["tasks"])
+                ],
+            )
+        logger.info(f"Research plan saved to {self.db_path}")
+
+    def update_tasks(self, updates: Iterable[Tuple[int, int, Dict[str, Any]]]) -> None:
+        """Writes the status, queries and summary of the given (category index, task index, task) entries."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE tasks SET status = ?, queries = ?, result_summary = ? "
+                "WHERE category_index = ? AND task_index = ?",
+                [
+                    (task["status"], json.dumps(task.get("queries")), task.get("result_summary"), cat_idx, task_idx)
+                    for cat_idx, task_idx, task in updates
+                ],
+            )
+
+    def load_plan(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            plan = [
+                {"category_name": name, "tasks": []}
+                for _, name in self._conn.execute(
+                    "SELECT category_index, category_name FROM categories ORDER BY category_index")
+            ]
+            for cat_idx, description, status, queries, result_summary in self._conn.execute(
+                    "SELECT category_index, task_description, status, queries, result_summary FROM tasks "
+                    "ORDER BY category_index, task_index"
+            ):
+                plan[cat_idx]["tasks"].append({
+                    "task_description": description,
+                    "status": status,
+                    "queries": json.loads(queries) if queries else None,
+                    "result_summary": result_summary,
+                })
+        return plan
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_PLAN_STORES: Dict[str, PlanStore] = {}
+_PLAN_STORES_LOCK = threading.Lock()
+
+
+def get_plan_store(output_dir: str) -> PlanStore:
+    """Returns the plan store of the run saved in output_dir, opening it on first use."""
+    key = os.path.abspath(output_dir)
+    with _PLAN_STORES_LOCK:
+        store = _PLAN_STORES.get(key)
+        if store is None:
+            store = _PLAN_STORES[key] = PlanStore(output_dir)
+        return store
+
+
+def close_plan_store(output_dir: str) -> None:
+    with _PLAN_STORES_LOCK:
+        store = _PLAN_STORES.pop(os.path.abspath(output_dir), None)
+    if store:
+        store.close()
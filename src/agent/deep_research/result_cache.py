@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+RESEARCH_CACHE_PATH = os.getenv("RESEARCH_CACHE_PATH", "./tmp/research_cache.db")
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", str(24 * 3600)))  # 0 disables the cache
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "5000"))
+# Jaccard similarity of query words at which a cached query counts as the same question; 0 disables it
+RESEARCH_CACHE_SIMILARITY = float(os.getenv("RESEARCH_CACHE_SIMILARITY", "0"))
+# Near-duplicate lookups compare against at most this many of the most recent entries for the model
+NEAR_DUPLICATE_CANDIDATES = 500
+
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or the to what when where which who why with".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases the query and strips punctuation and extra whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def query_terms(normalized_query: str) -> FrozenSet[str]:
+    return frozenset(word for word in normalized_query.split() if word not in _STOP_WORDS)
+
+
+def jaccard_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def model_cache_key(llm: Any, identity: Optional[str] = None) -> str:
+    """
+    Identifies the model that drove the browser agent; results from different models are kept apart.
+    `identity` names whose browser profile the results were found with, when that can change them
+    (logged-in sites, personal history); such results are only shared with the same identity.
+    """
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or ""
+    key = f"{type(llm).__name__}:{model_name}"
+    return f"{key}|{identity}" if identity else key
+
+
+class ResearchResultCache:
+    """
+    Persistent cache of browser research results shared by all runs and users of the host.
+
+    Entries are keyed by the normalised query and the model (and browsing identity, see
+    `model_cache_key`), expire after `ttl` seconds and are
+    evicted least-recently-used beyond `max_entries`. With `similarity` > 0, a query whose words
+    overlap a cached query's by at least that Jaccard similarity is also served from the cache.
+    """
+
+    def __init__(
+            self,
+            db_path: str = RESEARCH_CACHE_PATH,
+            ttl: float = RESEARCH_CACHE_TTL,
+            max_entries: int = RESEARCH_CACHE_MAX_ENTRIES,
+            similarity: float = RESEARCH_CACHE_SIMILARITY,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.similarity = similarity
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, query TEXT NOT NULL, result TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_model_created ON results (model, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(normalized_query: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\n{normalized_query}".encode()).hexdigest()
+
+    def _get(self, query: str, model: str) -> Optional[Any]:
+        normalized = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, result FROM results WHERE key = ? AND created_at > ?",
+                (self._key(normalized, model), now - self.ttl),
+            ).fetchone()
+            if row is None and self.similarity > 0:
+                row = self._find_near_duplicate(normalized, model, now)
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, row[0]))
+        return json.loads(row[1])
+
+    def _find_near_duplicate(self, normalized: str, model: str, now: float):
+        terms = query_terms(normalized)
+        best, best_score = None, self.similarity
+        for key, cached_query, result in self._conn.execute(
+                "SELECT key, query, result FROM results WHERE model = ? AND created_at > ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (model, now - self.ttl, NEAR_DUPLICATE_CANDIDATES),
+        ):
+            score = jaccard_similarity(terms, query_terms(cached_query))
+            if score >= best_score:
+                best, best_score = (key, result), score
+        if best:
+            logger.debug(f"Near-duplicate cache hit for '{normalized}' (similarity {best_score:.2f})")
+        return best
+
+    def _put(self, query: str, model: str, result: Any) -> None:
+        normalized = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, model, query, result, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(normalized, model), model, normalized, json.dumps(result, default=str), now, now),
+            )
+            self._conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    async def get(self, query: str, model: str) -> Optional[Any]:
+        """Returns the cached result for the query and model, or None."""
+        try:
+            return await asyncio.to_thread(self._get, query, model)
+        except sqlite3.Error as e:
+            logger.warning(f"Research result cache lookup failed: {e}")
+            return None
+
+    async def put(self, query: str, model: str, result: Any) -> None:
+        try:
+            await asyncio.to_thread(self._put, query, model, result)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store research result in cache: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_RESULT_CACHE: Optional[ResearchResultCache] = None
+
+
+def get_result_cache() -> Optional[ResearchResultCache]:
+    """Returns the process-wide result cache, or None if it is disabled (RESEARCH_CACHE_TTL=0)."""
+    global _RESULT_CACHE
+    if RESEARCH_CACHE_TTL <= 0:
+        return None
+    if _RESULT_CACHE is None:
+        _RESULT_CACHE = ResearchResultCache()
+    return _RESULT_CACHE
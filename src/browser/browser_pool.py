@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.context import BrowserContextConfig
+
+from .custom_browser import CustomBrowser
+from .custom_context import CustomBrowserContext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+DEFAULT_POOL_MIN_IDLE = int(os.getenv("BROWSER_POOL_MIN_IDLE", "1"))
+DEFAULT_POOL_MAX_LIFETIME = float(os.getenv("BROWSER_POOL_MAX_LIFETIME", "1800"))
+
+
+def uses_persistent_profile(browser_config: BrowserConfig) -> bool:
+    """Whether browsers launched with this config open a user's own profile (--user-data-dir)."""
+    return any(arg.startswith("--user-data-dir") for arg in browser_config.extra_browser_args or [])
+
+
+class _PooledBrowser:
+    """A launched browser together with the bookkeeping the pool needs."""
+
+    def __init__(self, browser: CustomBrowser):
+        self.browser = browser
+        self.created_at = time.monotonic()
+
+    def is_expired(self, max_lifetime: float) -> bool:
+        return max_lifetime > 0 and time.monotonic() - self.created_at > max_lifetime
+
+    def is_alive(self) -> bool:
+        playwright_browser = self.browser.playwright_browser
+        return playwright_browser is not None and playwright_browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` pre-launched browsers warm and leases isolated contexts from them.
+
+    Each lease gets a fresh CustomBrowserContext on an idle browser, so cookies and pages never
+    leak between leases while the Chromium launch cost is only paid once per browser.
+
+    A browser on a persistent user profile locks that profile while it runs, so such pools hold a
+    single browser, never pre-launch one and close it as soon as its lease is returned.
+    """
+
+    def __init__(
+            self,
+            browser_config: BrowserConfig,
+            size: int = DEFAULT_POOL_SIZE,
+            min_idle: int = DEFAULT_POOL_MIN_IDLE,
+            max_lifetime: float = DEFAULT_POOL_MAX_LIFETIME,
+    ):
+        self.browser_config = browser_config
+        self.persistent_profile = uses_persistent_profile(browser_config)
+        if self.persistent_profile:
+            size, min_idle = 1, 0
+        self.size = max(1, size)
+        self.min_idle = min(max(0, min_idle), self.size)
+        self.max_lifetime = max_lifetime
+        self._idle: List[_PooledBrowser] = []
+        self._total = 0  # launched or currently launching
+        self._condition = asyncio.Condition()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def resize(self, size: int) -> None:
+        """Grows the pool so that at least `size` browsers can be leased at once."""
+        if size > self.size and not self.persistent_profile:
+            logger.info(f"Growing browser pool from {self.size} to {size} browsers.")
+            self.size = size
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = CustomBrowser(config=self.browser_config)
+        try:
+            await browser.get_playwright_browser()
+        except BaseException:  # also on cancellation, or a half-launched Chromium would be left behind
+            await browser.close()
+            raise
+        logger.info("Launched pooled browser.")
+        return _PooledBrowser(browser)
+
+    @staticmethod
+    async def _retire(pooled: _PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+            logger.info("Retired pooled browser.")
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {e}")
+
+    async def _acquire(self) -> _PooledBrowser:
+        to_retire = []
+        try:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed.")
+                    while self._idle:
+                        pooled = self._idle.pop()
+                        if pooled.is_expired(self.max_lifetime) or not pooled.is_alive():
+                            self._total -= 1
+                            to_retire.append(pooled)
+                            continue
+                        return pooled
+                    if self._total < self.size:
+                        self._total += 1
+                        break
+                    await self._condition.wait()
+        finally:
+            for pooled in to_retire:
+                await self._retire(pooled)
+
+        try:
+            return await self._launch()
+        except BaseException:
+            async with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+
+    async def _release(self, pooled: _PooledBrowser) -> None:
+        retire = False
+        async with self._condition:
+            if (self._closed or self.persistent_profile or pooled.is_expired(self.max_lifetime)
+                    or not pooled.is_alive()):
+                self._total -= 1
+                retire = True
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+        if retire:
+            await self._retire(pooled)
+        self._schedule_refill()
+
+    async def _refill(self) -> None:
+        """Launches browsers in the background until `min_idle` of them are waiting."""
+        while True:
+            async with self._condition:
+                if self._closed or len(self._idle) >= self.min_idle or self._total >= self.size:
+                    return
+                self._total += 1
+            try:
+                pooled = await self._launch()
+            except asyncio.CancelledError:
+                async with self._condition:
+                    self._total -= 1
+                    self._condition.notify()
+                raise
+            except Exception as e:
+                logger.error(f"Failed to pre-launch pooled browser: {e}")
+                async with self._condition:
+                    self._total -= 1
+                    self._condition.notify()
+                return
+            async with self._condition:
+                if self._closed:
+                    self._total -= 1
+                else:
+                    self._idle.append(pooled)
+                    self._condition.notify()
+                    pooled = None
+            if pooled:
+                await self._retire(pooled)
+
+    def _schedule_refill(self) -> None:
+        if self.min_idle and not self._closed and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def warm_up(self) -> None:
+        """Pre-launches `min_idle` browsers so the first lease does not pay the launch cost."""
+        await self._refill()
+
+    @asynccontextmanager
+    async def lease(self, context_config: Optional[BrowserContextConfig] = None) -> AsyncIterator[
+        CustomBrowserContext]:
+        """Leases a new, isolated context on a pooled browser. The context is closed on return."""
+        pooled = await self._acquire()
+        browser_context = None
+        try:
+            browser_context = await pooled.browser.new_context(config=context_config)
+            yield browser_context
+        finally:
+            if browser_context:
+                try:
+                    await browser_context.close()
+                except Exception as e:
+                    logger.error(f"Error closing leased browser context: {e}")
+            await self._release(pooled)
+
+    async def close_idle(self) -> None:
+        """
+        Closes the idle browsers and stops pre-launching, but keeps the pool open: leases still
+        work and launch browsers on demand, and the pool warms up again once a lease is returned.
+        """
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            await self._retire(pooled)
+
+    async def close(self) -> None:
+        """Closes idle browsers. Leased browsers are closed as soon as they are returned."""
+        async with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+        for pooled in idle:
+            await self._retire(pooled)
+
+
+_BROWSER_POOLS: Dict[str, BrowserPool] = {}
+
+
+def get_browser_pool(
+        browser_config: BrowserConfig,
+        size: Optional[int] = None,
+        min_idle: Optional[int] = None,
+        max_lifetime: Optional[float] = None,
+) -> BrowserPool:
+    """
+    Returns the process-wide pool for this browser configuration, creating it on first use.
+    Pools are shared by every caller that launches browsers with an identical configuration.
+    """
+    pool_key = json.dumps(browser_config.model_dump(), sort_keys=True, default=str)
+    pool = _BROWSER_POOLS.get(pool_key)
+    if pool is None or pool._closed:
+        pool = BrowserPool(
+            browser_config,
+            size=size if size is not None else DEFAULT_POOL_SIZE,
+            min_idle=min_idle if min_idle is not None else DEFAULT_POOL_MIN_IDLE,
+            max_lifetime=max_lifetime if max_lifetime is not None else DEFAULT_POOL_MAX_LIFETIME,
+        )
+        _BROWSER_POOLS[pool_key] = pool
+    elif size is not None:
+        pool.resize(size)
+    return pool
+
+
+async def close_browser_pools() -> None:
+    """Closes every browser pool created in this process."""
+    pools = list(_BROWSER_POOLS.values())
+    _BROWSER_POOLS.clear()
+    for pool in pools:
+        await pool.close()
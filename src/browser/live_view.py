@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from browser_use.browser.context import BrowserContext
+from playwright.async_api import CDPSession, Page
+
+logger = logging.getLogger(__name__)
+
+LIVE_VIEW_MAX_WIDTH = int(os.getenv("LIVE_VIEW_MAX_WIDTH", "1024"))
+LIVE_VIEW_MAX_HEIGHT = int(os.getenv("LIVE_VIEW_MAX_HEIGHT", "768"))
+LIVE_VIEW_MAX_FPS = float(os.getenv("LIVE_VIEW_MAX_FPS", "10"))
+LIVE_VIEW_MIN_FPS = 1.0
+LIVE_VIEW_QUALITY = 60
+
+
+class LiveView:
+    """
+    Streams the agent's current page through CDP screencast frames.
+
+    Chrome pushes a frame only when the page repaints, and only after the previous frame was
+    acknowledged, so acknowledging late is how the frame rate is throttled. The interval adapts
+    to the consumer: it backs off while frames go unread and recovers while they are picked up.
+    Identical frames are dropped, and frames are capped at `max_width` x `max_height`.
+    """
+
+    def __init__(
+            self,
+            max_width: int = LIVE_VIEW_MAX_WIDTH,
+            max_height: int = LIVE_VIEW_MAX_HEIGHT,
+            max_fps: float = LIVE_VIEW_MAX_FPS,
+            min_fps: float = LIVE_VIEW_MIN_FPS,
+            quality: int = LIVE_VIEW_QUALITY,
+    ):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.min_interval = 1.0 / max(max_fps, min_fps)
+        self.max_interval = 1.0 / min_fps
+        self.quality = quality
+        self._interval = self.min_interval
+        self._page: Optional[Page] = None
+        self._cdp: Optional[CDPSession] = None
+        self._latest_frame: Optional[str] = None
+        self._latest_hash: Optional[str] = None
+        self._frame_consumed = True
+        self._new_frame = asyncio.Event()
+        self._ack_tasks = set()
+
+    @property
+    def active(self) -> bool:
+        return self._cdp is not None
+
+    async def follow(self, browser_context: BrowserContext) -> None:
+        """Starts streaming the agent's current page, switching over when the agent changes tabs."""
+        if browser_context.session is None:
+            return  # browser not started yet; nothing to show
+        try:
+            page = await browser_context.get_agent_current_page()
+        except Exception as e:
+            logger.debug(f"Live view could not resolve the current page: {e}")
+            return
+        if page is self._page and self._cdp is not None:
+            return
+        await self.stop()
+        try:
+            self._cdp = await page.context.new_cdp_session(page)
+            self._cdp.on("Page.screencastFrame", self._on_frame)
+            await self._cdp.send(
+                "Page.startScreencast",
+                {
+                    "format": "jpeg",
+                    "quality": self.quality,
+                    "maxWidth": self.max_width,
+                    "maxHeight": self.max_height,
+                },
+            )
+            self._page = page
+            logger.debug(f"Live view attached to {page.url}")
+        except Exception as e:
+            logger.debug(f"Failed to start live view screencast: {e}")
+            await self.stop()
+
+    def _on_frame(self, params: Dict[str, Any]) -> None:
+        data = params.get("data")
+        # Back off while the previous frame is still unread, recover while frames are consumed
+        if self._frame_consumed:
+            self._interval = max(self.min_interval, self._interval * 0.75)
+        else:
+            self._interval = min(self.max_interval, self._interval * 2)
+
+        if data:
+            frame_hash = hashlib.sha1(data.encode()).hexdigest()
+            if frame_hash != self._latest_hash:
+                self._latest_hash = frame_hash
+                self._latest_frame = data
+                self._frame_consumed = False
+                self._new_frame.set()
+
+        ack_task = asyncio.create_task(self._ack(self._cdp, params.get("sessionId"), self._interval))
+        self._ack_tasks.add(ack_task)
+        ack_task.add_done_callback(self._ack_tasks.discard)
+
+    @staticmethod
+    async def _ack(cdp: Optional[CDPSession], session_id: Any, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if cdp is None or session_id is None:
+            return
+        try:
+            await cdp.send("Page.screencastFrameAck", {"sessionId": session_id})
+        except Exception:
+            pass  # page closed or screencast stopped meanwhile
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """
+        Waits up to `timeout` seconds for a frame that has not been returned yet.
+        Returns the base64 JPEG, or None if nothing new arrived.
+        """
+        if not self._new_frame.is_set():
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        self._new_frame.clear()
+        self._frame_consumed = True
+        return self._latest_frame
+
+    async def stop(self) -> None:
+        """Stops the screencast; `follow` starts it again."""
+        cdp, self._cdp, self._page = self._cdp, None, None
+        for ack_task in list(self._ack_tasks):
+            ack_task.cancel()
+        if cdp is not None:
+            try:
+                await cdp.send("Page.stopScreencast")
+                await cdp.detach()
+            except Exception:
+                pass  # the page may already be gone
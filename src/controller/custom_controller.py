@@ -1,7 +1,8 @@
 import pdb
 
 import pyperclip
-from typing import Optional, Type, Callable, Dict, Any, Union, Awaitable, TypeVar
+from typing import Optional, Type, Callable, Dict, Any, Union, Awaitable, TypeVar, Tuple
+from langchain_core.tools import BaseTool
 from pydantic import BaseModel
 from browser_use.agent.views import ActionResult
 from browser_use.browser.context import BrowserContext
@@ -27,7 +28,7 @@ import os
 from langchain_core.language_models.chat_models import BaseChatModel
 from browser_use.agent.views import ActionModel, ActionResult
 
-from src.utils.mcp_client import create_tool_param_model, setup_mcp_client_and_tools
+from src.utils.mcp_client import create_tool_param_model, release_mcp_client, setup_mcp_client_and_tools
 
 from browser_use.utils import time_execution_sync
 
@@ -35,6 +36,20 @@ logger = logging.getLogger(__name__)
 
 Context = TypeVar('Context')
 
+# handler(params, browser_context, page_extraction_llm, sensitive_data, available_file_paths, context)
+ActionHandler = Callable[..., Awaitable[Any]]
+
+# Built-in actions that only read the page, so an agent step may run them concurrently
+SIDE_EFFECT_FREE_ACTIONS = frozenset({"extract_content"})
+# MCP tools that declare readOnlyHint always run concurrently. This also treats every other MCP tool as
+# free of side effects; only enable it if no tool's effects depend on the order of calls within a step
+CONCURRENT_MCP_ACTIONS = os.getenv("CONCURRENT_MCP_ACTIONS", "false").lower()[:1] in ("t", "y", "1")
+
+
+def _is_read_only_tool(tool: BaseTool) -> bool:
+    """Whether an MCP tool declares the readOnlyHint annotation (copied into its metadata by the MCP client pool)."""
+    return bool((tool.metadata or {}).get("readOnlyHint"))
+
 
 class CustomController(Controller):
     def __init__(self, exclude_actions: list[str] = [],
@@ -47,6 +62,10 @@ class CustomController(Controller):
         self.ask_assistant_callback = ask_assistant_callback
         self.mcp_client = None
         self.mcp_server_config = None
+        # action name -> (the RegisteredAction the handler was built for, handler)
+        self._dispatch_table: Dict[str, Tuple[RegisteredAction, ActionHandler]] = {}
+        self._side_effect_free_actions: set[str] = set()
+        self._build_dispatch_table()
 
     def _register_custom_actions(self):
         """Register all custom browser actions"""
@@ -106,6 +125,68 @@ class CustomController(Controller):
                 logger.info(msg)
                 return ActionResult(error=msg)
 
+    def _build_dispatch_table(self):
+        """Maps every registered action to its handler up front, so act() only looks up the fields the LLM set."""
+        for action_name, registered_action in self.registry.registry.actions.items():
+            self._add_action_handler(action_name, registered_action)
+
+    def _add_action_handler(self, action_name: str, registered_action: RegisteredAction) -> ActionHandler:
+        handler = self._make_action_handler(action_name, registered_action)
+        self._dispatch_table[action_name] = (registered_action, handler)
+        function = registered_action.function
+        is_mcp_tool = isinstance(function, BaseTool)
+        if action_name in SIDE_EFFECT_FREE_ACTIONS or (
+                is_mcp_tool and (CONCURRENT_MCP_ACTIONS or _is_read_only_tool(function))):
+            self._side_effect_free_actions.add(action_name)
+        else:
+            self._side_effect_free_actions.discard(action_name)
+        return handler
+
+    def can_run_concurrently(self, action: ActionModel) -> bool:
+        """
+        True if the action neither changes the page nor targets an element index (page extraction,
+        read-only MCP tools), so the agent may run it at the same time as its other side-effect-free actions.
+        """
+        if action.get_index() is not None:
+            return False
+        action_names = [name for name in action.model_fields_set if getattr(action, name) is not None]
+        return len(action_names) == 1 and action_names[0] in self._side_effect_free_actions
+
+    def _make_action_handler(self, action_name: str, registered_action: RegisteredAction) -> ActionHandler:
+        """Builds the handler of one action: MCP tools are invoked directly, the rest go through the registry."""
+        if isinstance(registered_action.function, BaseTool):
+            mcp_tool = registered_action.function
+
+            async def invoke_mcp_tool(params: BaseModel, *args) -> Any:
+                logger.debug(f"Invoke MCP tool: {action_name}")
+                return await mcp_tool.ainvoke(params.model_dump(exclude_unset=True))
+
+            return invoke_mcp_tool
+
+        async def execute_action(params: BaseModel, browser_context, page_extraction_llm, sensitive_data,
+                                 available_file_paths, context) -> Any:
+            return await self.registry.execute_action(
+                action_name,
+                params.model_dump(exclude_unset=True),
+                browser=browser_context,
+                page_extraction_llm=page_extraction_llm,
+                sensitive_data=sensitive_data,
+                available_file_paths=available_file_paths,
+                context=context,
+            )
+
+        return execute_action
+
+    def _get_action_handler(self, action_name: str) -> ActionHandler:
+        registered_action = self.registry.registry.actions.get(action_name)
+        if registered_action is None:
+            raise ValueError(f'Action {action_name} not found')
+        entry = self._dispatch_table.get(action_name)
+        if entry is None or entry[0] is not registered_action:
+            # Registered, or registered again, after the table was built, e.g. through registry.action()
+            return self._add_action_handler(action_name, registered_action)
+        return entry[1]
+
     @time_execution_sync('--act')
     async def act(
             self,
@@ -120,38 +201,27 @@ class CustomController(Controller):
     ) -> ActionResult:
         """Execute an action"""
 
-        try:
-            for action_name, params in action.model_dump(exclude_unset=True).items():
-                if params is not None:
-                    if action_name.startswith("mcp"):
-                        # this is a mcp tool
-                        logger.debug(f"Invoke MCP tool: {action_name}")
-                        mcp_tool = self.registry.registry.actions.get(action_name).function
-                        result = await mcp_tool.ainvoke(params)
-                    else:
-                        result = await self.registry.execute_action(
-                            action_name,
-                            params,
-                            browser=browser_context,
-                            page_extraction_llm=page_extraction_llm,
-                            sensitive_data=sensitive_data,
-                            available_file_paths=available_file_paths,
-                            context=context,
-                        )
-
-                    if isinstance(result, str):
-                        return ActionResult(extracted_content=result)
-                    elif isinstance(result, ActionResult):
-                        return result
-                    elif result is None:
-                        return ActionResult()
-                    else:
-                        raise ValueError(f'Invalid action result type: {type(result)} of {result}')
-            return ActionResult()
-        except Exception as e:
-            raise e
+        # Only the fields the LLM set are looked at, not every action of the model
+        for action_name in action.model_fields_set:
+            params = getattr(action, action_name)
+            if params is None:
+                continue
+            handler = self._get_action_handler(action_name)
+            result = await handler(params, browser_context, page_extraction_llm, sensitive_data,
+                                   available_file_paths, context)
+
+            if isinstance(result, str):
+                return ActionResult(extracted_content=result)
+            elif isinstance(result, ActionResult):
+                return result
+            elif result is None:
+                return ActionResult()
+            else:
+                raise ValueError(f'Invalid action result type: {type(result)} of {result}')
+        return ActionResult()
 
     async def setup_mcp_client(self, mcp_server_config: Optional[Dict[str, Any]] = None):
+        await self.close_mcp_client()
         self.mcp_server_config = mcp_server_config
         if self.mcp_server_config:
             self.mcp_client = await setup_mcp_client_and_tools(self.mcp_server_config)
@@ -171,6 +241,7 @@ class CustomController(Controller):
                         function=tool,
                         param_model=create_tool_param_model(tool),
                     )
+                    self._add_action_handler(tool_name, self.registry.registry.actions[tool_name])
                     logger.info(f"Add mcp tool: {tool_name}")
                 logger.debug(
                     f"Registered {len(self.mcp_client.server_name_to_tools[server_name])} mcp tools for {server_name}")
@@ -178,5 +249,7 @@ class CustomController(Controller):
             logger.warning(f"MCP client not started.")
 
     async def close_mcp_client(self):
+        """Hands the shared MCP client back to the pool, which keeps its servers running for other sessions."""
         if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+            await release_mcp_client(self.mcp_client)
+            self.mcp_client = None
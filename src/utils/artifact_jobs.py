@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: encodes are then only limited per process, by the pool size
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Artifact encodes running at once on this host, across all UI worker processes
+ARTIFACT_MAX_CONCURRENT_JOBS = int(os.getenv("ARTIFACT_MAX_CONCURRENT_JOBS", "2"))
+ARTIFACT_SLOT_DIR = os.getenv("ARTIFACT_SLOT_DIR", "./tmp/artifact_slots")
+# How often a job waiting for a free host slot retries
+SLOT_POLL_INTERVAL = 0.2
+
+
+@contextmanager
+def host_slot(slot_dir: str = ARTIFACT_SLOT_DIR, slots: int = ARTIFACT_MAX_CONCURRENT_JOBS) -> Iterator[None]:
+    """
+    Holds one of the host's encode slots: lock files shared by every process that uses `slot_dir`.
+    Blocks until a slot is free, so call it from a worker process or thread, never the event loop.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(slot_dir, exist_ok=True)
+    while True:
+        for i in range(slots):
+            lock_file = open(os.path.join(slot_dir, f"slot-{i}.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+        time.sleep(SLOT_POLL_INTERVAL)
+
+
+def _run_job(slot_dir: str, slots: int, fn: Callable[..., None], args: Tuple, output_path: str) -> Optional[str]:
+    """Worker process entry point. Returns the artifact path, or None if the job wrote nothing."""
+    with host_slot(slot_dir, slots):
+        fn(*args)
+    return output_path if os.path.exists(output_path) else None
+
+
+def _write_playwright_script(
+        history: List[Dict[str, Any]],
+        output_path: str,
+        sensitive_data_keys: Optional[List[str]],
+        browser_config: Any,
+        context_config: Any,
+) -> None:
+    from browser_use.agent.playwright_script_generator import PlaywrightScriptGenerator
+
+    script = PlaywrightScriptGenerator(
+        history, sensitive_data_keys, browser_config, context_config
+    ).generate_script_content()
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(script)
+
+
+class ArtifactJob:
+    """An artifact of a run, such as its Playwright script, possibly still being generated in the background."""
+
+    def __init__(self, kind: str, output_path: str, future: Future):
+        self.kind = kind
+        self.output_path = output_path
+        self.future = future
+        self.submitted_at = time.time()
+        future.add_done_callback(self._log_outcome)
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self) -> Optional[str]:
+        """The artifact path once the job has finished and written it, otherwise None."""
+        if not self.future.done() or self.future.cancelled() or self.future.exception():
+            return None
+        return self.future.result()
+
+    async def wait(self) -> Optional[str]:
+        """Waits for the job and returns the artifact path, or None if it failed or wrote nothing."""
+        try:
+            await asyncio.wrap_future(self.future)
+        except Exception:
+            pass
+        return self.result()
+
+    def _log_outcome(self, future: Future) -> None:
+        if future.cancelled():
+            logger.info(f"{self.kind} job for {self.output_path} was cancelled")
+        elif future.exception():
+            logger.error(f"Failed to generate {self.kind} at {self.output_path}: {future.exception()}")
+        elif future.result() is None:
+            logger.warning(f"{self.kind} job for {self.output_path} finished without writing it")
+        else:
+            logger.info(f"{self.kind} ready at {self.output_path} after {time.time() - self.submitted_at:.1f}s")
+
+
+class ArtifactQueue:
+    """
+    Generates run artifacts in a pool of worker processes, off the event loop.
+
+    Submitting returns an ArtifactJob right away; the CPU-heavy work (rendering the whole run
+    history into an artifact) happens in the pool. Besides the pool size, each job takes one
+    of `max_jobs` host-wide slots before it starts, so several UI workers on one host together
+    never run more than `max_jobs` encodes at once.
+    """
+
+    def __init__(self, max_jobs: int = ARTIFACT_MAX_CONCURRENT_JOBS, slot_dir: str = ARTIFACT_SLOT_DIR):
+        self.max_jobs = max(1, max_jobs)
+        self.slot_dir = slot_dir
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs browsers and an event loop is unsafe, so workers are spawned
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_jobs, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, kind: str, output_path: str, fn: Callable[..., None], *args: Any) -> ArtifactJob:
+        """Queues `fn(*args)` (a picklable module-level function) that writes `output_path`."""
+        try:
+            future = self._get_executor().submit(_run_job, self.slot_dir, self.max_jobs, fn, args, output_path)
+        except BrokenProcessPool:
+            logger.warning("Artifact worker pool is broken; starting a new one")
+            self._executor = None
+            future = self._get_executor().submit(_run_job, self.slot_dir, self.max_jobs, fn, args, output_path)
+        return ArtifactJob(kind, output_path, future)
+
+    def submit_playwright_script(
+            self,
+            history: Any,
+            output_path: str,
+            sensitive_data_keys: Optional[List[str]] = None,
+            browser_config: Any = None,
+            context_config: Any = None,
+    ) -> ArtifactJob:
+        """Queues the Playwright script replaying an AgentHistoryList."""
+        serialized_history = history.model_dump()["history"]
+        for item in serialized_history:
+            # The script generator never looks at screenshots; leave them out of the job payload
+            if item.get("state"):
+                item["state"]["screenshot"] = None
+        return self.submit(
+            "playwright_script", output_path, _write_playwright_script,
+            serialized_history, output_path, sensitive_data_keys, browser_config, context_config,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_ARTIFACT_QUEUE: Optional[ArtifactQueue] = None
+
+
+def get_artifact_queue() -> ArtifactQueue:
+    """Returns the process-wide artifact queue."""
+    global _ARTIFACT_QUEUE
+    if _ARTIFACT_QUEUE is None:
+        _ARTIFACT_QUEUE = ArtifactQueue()
+    return _ARTIFACT_QUEUE
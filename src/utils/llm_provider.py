@@ -1,4 +1,10 @@
-from openai import OpenAI
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 import pdb
 from langchain_openai import ChatOpenAI
 from langchain_core.globals import get_llm_cache
@@ -8,9 +14,11 @@ from langchain_core.language_models.base import (
     LanguageModelInput,
 )
 import os
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.load import dumpd, dumps
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     SystemMessage,
     AnyMessage,
     BaseMessage,
@@ -34,11 +42,12 @@ from langchain_core.tools import BaseTool
 from typing import (
     TYPE_CHECKING,
     Any,
+    AsyncIterator,
     Callable,
     Literal,
     Optional,
     Union,
-    cast, List,
+    cast, List, Tuple,
 )
 from langchain_anthropic import ChatAnthropic
 from langchain_mistralai import ChatMistralAI
@@ -51,6 +60,19 @@ from pydantic import SecretStr
 
 from src.utils import config
 
+logger = logging.getLogger(__name__)
+
+
+_SHARED_ASYNC_HTTP_CLIENT: Optional[DefaultAsyncHttpxClient] = None
+
+
+def _get_shared_async_http_client() -> DefaultAsyncHttpxClient:
+    """Returns one pooled HTTP client so all async OpenAI-compatible clients reuse keep-alive connections."""
+    global _SHARED_ASYNC_HTTP_CLIENT
+    if _SHARED_ASYNC_HTTP_CLIENT is None or _SHARED_ASYNC_HTTP_CLIENT.is_closed:
+        _SHARED_ASYNC_HTTP_CLIENT = DefaultAsyncHttpxClient()
+    return _SHARED_ASYNC_HTTP_CLIENT
+
 
 class DeepSeekR1ChatOpenAI(ChatOpenAI):
 
@@ -60,6 +82,46 @@ class DeepSeekR1ChatOpenAI(ChatOpenAI):
             base_url=kwargs.get("base_url"),
             api_key=kwargs.get("api_key")
         )
+        self.async_client = AsyncOpenAI(
+            base_url=kwargs.get("base_url"),
+            api_key=kwargs.get("api_key"),
+            http_client=_get_shared_async_http_client(),
+        )
+
+    def _to_message_history(self, input: LanguageModelInput) -> List[dict]:
+        message_history = []
+        for input_ in self._convert_input(input).to_messages():
+            if isinstance(input_, SystemMessage):
+                message_history.append({"role": "system", "content": input_.content})
+            elif isinstance(input_, AIMessage):
+                message_history.append({"role": "assistant", "content": input_.content})
+            else:
+                message_history.append({"role": "user", "content": input_.content})
+        return message_history
+
+    async def astream(
+            self,
+            input: LanguageModelInput,
+            config: Optional[RunnableConfig] = None,
+            *,
+            stop: Optional[list[str]] = None,
+            **kwargs: Any,
+    ) -> AsyncIterator[AIMessageChunk]:
+        """Streams the answer; reasoning tokens arrive in `additional_kwargs["reasoning_content"]`."""
+        stream = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=self._to_message_history(input),
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            reasoning_content = getattr(delta, "reasoning_content", None) or ""
+            content = delta.content or ""
+            if not reasoning_content and not content:
+                continue
+            yield AIMessageChunk(content=content, additional_kwargs={"reasoning_content": reasoning_content})
 
     async def ainvoke(
             self,
@@ -69,18 +131,17 @@ class DeepSeekR1ChatOpenAI(ChatOpenAI):
             stop: Optional[list[str]] = None,
             **kwargs: Any,
     ) -> AIMessage:
-        message_history = []
-        for input_ in input:
-            if isinstance(input_, SystemMessage):
-                message_history.append({"role": "system", "content": input_.content})
-            elif isinstance(input_, AIMessage):
-                message_history.append({"role": "assistant", "content": input_.content})
-            else:
-                message_history.append({"role": "user", "content": input_.content})
+        if self.streaming:
+            reasoning_parts = []
+            content_parts = []
+            async for chunk in self.astream(input, config, stop=stop, **kwargs):
+                reasoning_parts.append(chunk.additional_kwargs.get("reasoning_content", ""))
+                content_parts.append(chunk.content)
+            return AIMessage(content="".join(content_parts), reasoning_content="".join(reasoning_parts))
 
-        response = self.client.chat.completions.create(
+        response = await self.async_client.chat.completions.create(
             model=self.model_name,
-            messages=message_history
+            messages=self._to_message_history(input)
         )
 
         reasoning_content = response.choices[0].message.reasoning_content
@@ -95,18 +156,9 @@ class DeepSeekR1ChatOpenAI(ChatOpenAI):
             stop: Optional[list[str]] = None,
             **kwargs: Any,
     ) -> AIMessage:
-        message_history = []
-        for input_ in input:
-            if isinstance(input_, SystemMessage):
-                message_history.append({"role": "system", "content": input_.content})
-            elif isinstance(input_, AIMessage):
-                message_history.append({"role": "assistant", "content": input_.content})
-            else:
-                message_history.append({"role": "user", "content": input_.content})
-
         response = self.client.chat.completions.create(
             model=self.model_name,
-            messages=message_history
+            messages=self._to_message_history(input)
         )
 
         reasoning_content = response.choices[0].message.reasoning_content
@@ -114,8 +166,59 @@ class DeepSeekR1ChatOpenAI(ChatOpenAI):
         return AIMessage(content=content, reasoning_content=reasoning_content)
 
 
+class _ThinkTagSplitter:
+    """
+    Splits streamed text into answer and reasoning as `<think>...</think>` blocks go by.
+    Tags may be cut across chunks, so text that could be the start of one is held back until it is decided.
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[str, bool]]:
+        """Returns (text, is_reasoning) pieces that are complete so far."""
+        self._buffer += text
+        pieces = []
+        while self._buffer:
+            tag = "</think>" if self.in_think else "<think>"
+            index = self._buffer.find(tag)
+            if index >= 0:
+                pieces.append((self._buffer[:index], self.in_think))
+                self._buffer = self._buffer[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+            held = next((n for n in range(min(len(tag) - 1, len(self._buffer)), 0, -1)
+                         if tag.startswith(self._buffer[-n:])), 0)
+            pieces.append((self._buffer[:len(self._buffer) - held], self.in_think))
+            self._buffer = self._buffer[len(self._buffer) - held:]
+            break
+        return [(text, is_reasoning) for text, is_reasoning in pieces if text]
+
+    def flush(self) -> List[Tuple[str, bool]]:
+        text, self._buffer = self._buffer, ""
+        return [(text, self.in_think)] if text else []
+
+
 class DeepSeekR1ChatOllama(ChatOllama):
 
+    async def astream(
+            self,
+            input: LanguageModelInput,
+            config: Optional[RunnableConfig] = None,
+            *,
+            stop: Optional[list[str]] = None,
+            **kwargs: Any,
+    ) -> AsyncIterator[AIMessageChunk]:
+        """Streams the answer without the <think> block, which goes to `additional_kwargs["reasoning_content"]`."""
+        splitter = _ThinkTagSplitter()
+        async for chunk in super().astream(input, config, stop=stop, **kwargs):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            for piece, is_reasoning in splitter.feed(text):
+                yield _r1_chunk(piece, is_reasoning)
+        for piece, is_reasoning in splitter.flush():
+            yield _r1_chunk(piece, is_reasoning)
+
     async def ainvoke(
             self,
             input: LanguageModelInput,
@@ -149,9 +252,79 @@ class DeepSeekR1ChatOllama(ChatOllama):
         return AIMessage(content=content, reasoning_content=reasoning_content)
 
 
+def _r1_chunk(text: str, is_reasoning: bool) -> AIMessageChunk:
+    if is_reasoning:
+        return AIMessageChunk(content="", additional_kwargs={"reasoning_content": text})
+    return AIMessageChunk(content=text, additional_kwargs={"reasoning_content": ""})
+
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "16"))
+
+# Process-wide LRU of chat model clients, so sessions with identical settings share warm connection pools
+_LLM_CACHE: "OrderedDict[str, Tuple[str, BaseChatModel]]" = OrderedDict()
+_LLM_CACHE_LOCK = threading.Lock()
+
+
+def _llm_cache_key(provider: str, **kwargs) -> str:
+    api_key = kwargs.get("api_key") or os.getenv(f"{provider.upper()}_API_KEY", "")
+    key_data = {
+        "provider": provider,
+        "model_name": kwargs.get("model_name"),
+        "base_url": kwargs.get("base_url"),
+        "temperature": kwargs.get("temperature"),
+        "num_ctx": kwargs.get("num_ctx"),
+        # Only a hash of the credentials is kept in memory as part of the key
+        "api_key": hashlib.sha256(api_key.encode()).hexdigest() if api_key else "",
+        "extra": {k: v for k, v in kwargs.items()
+                  if k not in ("model_name", "base_url", "temperature", "num_ctx", "api_key")},
+    }
+    return json.dumps(key_data, sort_keys=True, default=str)
+
+
+def invalidate_llm_cache(provider: Optional[str] = None) -> int:
+    """
+    Drops cached chat models, either all of them or only those of `provider`.
+    Returns the number of evicted entries.
+    """
+    with _LLM_CACHE_LOCK:
+        keys = [key for key, (cached_provider, _) in _LLM_CACHE.items()
+                if provider is None or cached_provider == provider]
+        for key in keys:
+            del _LLM_CACHE[key]
+    if keys:
+        logger.info(f"Invalidated {len(keys)} cached LLM client(s) for provider={provider or 'all'}.")
+    return len(keys)
+
+
 def get_llm_model(provider: str, **kwargs):
     """
-    Get LLM model
+    Get LLM model, reusing a cached client when one with the same configuration exists
+    :param provider: LLM provider
+    :param kwargs:
+    :return:
+    """
+    cache_key = _llm_cache_key(provider, **kwargs)
+    with _LLM_CACHE_LOCK:
+        cached = _LLM_CACHE.get(cache_key)
+        if cached is not None:
+            _LLM_CACHE.move_to_end(cache_key)
+            return cached[1]
+
+    llm = _create_llm_model(provider, **kwargs)
+    if LLM_CACHE_SIZE <= 0:
+        return llm
+    with _LLM_CACHE_LOCK:
+        # Another caller may have created the same model meanwhile; keep the first one
+        cached = _LLM_CACHE.setdefault(cache_key, (provider, llm))
+        _LLM_CACHE.move_to_end(cache_key)
+        while len(_LLM_CACHE) > LLM_CACHE_SIZE:
+            _LLM_CACHE.popitem(last=False)
+    return cached[1]
+
+
+def _create_llm_model(provider: str, **kwargs):
+    """
+    Create a new LLM model
     :param provider: LLM provider
     :param kwargs:
     :return:
@@ -229,6 +402,7 @@ def get_llm_model(provider: str, **kwargs):
                 temperature=kwargs.get("temperature", 0.0),
                 base_url=base_url,
                 api_key=api_key,
+                streaming=True,
             )
         else:
             return ChatOpenAI(
@@ -1,9 +1,15 @@
+import asyncio
+import hashlib
 import inspect
+import json
 import logging
+import os
+import time
 import uuid
-from datetime import date, datetime, time
+from datetime import date, datetime
+from datetime import time as dt_time
 from enum import Enum
-from typing import Any, Dict, List, Optional, Set, Type, Union, get_type_hints
+from typing import Any, Dict, List, Optional, Set, Tuple, Type, Union, get_type_hints
 
 from browser_use.controller.registry.views import ActionModel
 from langchain.tools import BaseTool
@@ -14,36 +20,260 @@ from pydantic.v1 import BaseModel, Field
 logger = logging.getLogger(__name__)
 
 
-async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optional[MultiServerMCPClient]:
+# Seconds an unused MCP client stays open for the next session; 0 closes it when its last user releases it
+MCP_CLIENT_IDLE_TIMEOUT = float(os.getenv("MCP_CLIENT_IDLE_TIMEOUT", "300"))
+# Seconds between pings of every pooled MCP server; 0 disables health checks
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+MCP_PING_TIMEOUT = 10.0
+
+
+def mcp_config_key(connections: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(connections, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _mcp_tool_annotations(mcp_tool: Any) -> Dict[str, Any]:
+    """A listed MCP tool's annotations (readOnlyHint, ...); mcp releases without the field keep them as an extra."""
+    annotations = getattr(mcp_tool, "annotations", None)
+    if annotations is None:
+        return {}
+    if hasattr(annotations, "model_dump"):
+        annotations = annotations.model_dump(exclude_none=True)
+    return dict(annotations) if isinstance(annotations, dict) else {}
+
+
+def annotate_mcp_tools(tools: List[BaseTool], mcp_tools: List[Any]) -> None:
+    """
+    Copies the annotations of the listed MCP tools into the metadata of their LangChain tools, which
+    langchain_mcp_adapters leaves empty.
     """
-    Initializes the MultiServerMCPClient, connects to servers, fetches tools,
-    filters them, and returns a flat list of usable tools and the client instance.
+    annotations_by_name = {mcp_tool.name: _mcp_tool_annotations(mcp_tool) for mcp_tool in mcp_tools}
+    for tool in tools:
+        annotations = annotations_by_name.get(tool.name)
+        if annotations:
+            tool.metadata = {**(tool.metadata or {}), **annotations}
+
+
+async def _annotate_client_tools(client: MultiServerMCPClient) -> None:
+    for server_name, session in client.sessions.items():
+        try:
+            listed = await session.list_tools()
+        except Exception as e:
+            logger.warning(f"Failed to read the tool annotations of MCP server {server_name}: {e}")
+            continue
+        annotate_mcp_tools(client.server_name_to_tools.get(server_name, []), listed.tools)
+
 
-    Returns:
-        A tuple containing:
-        - list[BaseTool]: The filtered list of usable LangChain tools.
-        - MultiServerMCPClient | None: The initialized and started client instance, or None on failure.
+class _PooledMCPClient:
     """
+    One started MultiServerMCPClient. A dedicated task enters and exits the client, because its
+    stdio/SSE sessions must be closed by the task that opened them, not by whichever UI handler
+    releases it last.
+    """
+
+    def __init__(self, key: str, connections: Dict[str, Any]):
+        self.key = key
+        self.connections = connections
+        self.client: Optional[MultiServerMCPClient] = None
+        self.refcount = 0
+        self.healthy = True
+        self.idle_since: Optional[float] = None
+        self.last_check = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._owner = asyncio.create_task(self._own())
+
+    async def _own(self):
+        try:
+            async with MultiServerMCPClient(self.connections) as client:
+                await _annotate_client_tools(client)
+                self.client = client
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            if self.client is None:
+                logger.error(f"Failed to setup MCP client or fetch tools: {e}", exc_info=True)
+            else:
+                logger.warning(f"MCP client for servers {list(self.connections)} closed with an error: {e}")
+        finally:
+            self.healthy = False
+            self._ready.set()
+
+    async def started(self) -> Optional[MultiServerMCPClient]:
+        await self._ready.wait()
+        return self.client if self.healthy else None
+
+    async def ping(self) -> bool:
+        self.last_check = time.monotonic()
+        if self.client is None or not self.healthy:
+            return False
+        try:
+            await asyncio.gather(*[
+                asyncio.wait_for(session.send_ping(), timeout=MCP_PING_TIMEOUT)
+                for session in self.client.sessions.values()
+            ])
+            return True
+        except Exception as e:
+            logger.warning(f"MCP servers {list(self.connections)} failed their health check: {e}")
+            return False
+
+    async def close(self):
+        self._closing.set()
+        await self._owner
+
+
+class MCPClientPool:
+    """
+    Started MCP clients shared by every controller and research agent in the process, one per
+    server config.
+
+    acquire()/release() keep a reference count, so a new session reuses running servers instead of
+    spawning them again. A client nobody uses is closed after `idle_timeout` seconds. Servers are
+    pinged every `health_check_interval` seconds; a client that stops answering is not handed out
+    again, and the next acquire starts a fresh one.
+    """
+
+    def __init__(
+            self,
+            idle_timeout: float = MCP_CLIENT_IDLE_TIMEOUT,
+            health_check_interval: float = MCP_HEALTH_CHECK_INTERVAL,
+    ):
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._current: Dict[str, _PooledMCPClient] = {}  # config key -> client handed out to new users
+        self._by_client: Dict[int, _PooledMCPClient] = {}  # every started client, replaced ones included
+        self._maintenance: Optional[asyncio.Task] = None
+
+    async def acquire(self, mcp_server_config: Dict[str, Any]) -> Optional[MultiServerMCPClient]:
+        """Returns a started client for the config, or None if it cannot be started."""
+        connections = mcp_server_config.get("mcpServers", mcp_server_config)
+        key = mcp_config_key(connections)
+        entry = self._current.get(key)
+        if entry is not None and not entry.healthy:
+            self._retire(entry)
+            entry = None
+        if entry is None:
+            logger.info("Initializing MultiServerMCPClient...")
+            entry = _PooledMCPClient(key, connections)
+            self._current[key] = entry
+        entry.refcount += 1
+        entry.idle_since = None
+        client = await entry.started()
+        if client is None:
+            entry.refcount -= 1
+            await self._discard(entry)
+            return None
+        self._by_client[id(client)] = entry
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = asyncio.create_task(self._maintain())
+        return client
+
+    async def release(self, client: MultiServerMCPClient) -> None:
+        entry = self._by_client.get(id(client))
+        if entry is None:
+            logger.warning("Released an MCP client that is not in the pool.")
+            return
+        entry.refcount = max(0, entry.refcount - 1)
+        if entry.refcount:
+            return
+        entry.idle_since = time.monotonic()
+        if self.idle_timeout <= 0 or self._current.get(entry.key) is not entry:
+            await self._close(entry)
+
+    def _retire(self, entry: _PooledMCPClient) -> None:
+        """Stops handing the client out; current users keep it until they release it."""
+        if self._current.get(entry.key) is entry:
+            del self._current[entry.key]
+
+    async def _discard(self, entry: _PooledMCPClient) -> None:
+        self._retire(entry)
+        if not entry.refcount:
+            await self._close(entry)
+
+    async def _close(self, entry: _PooledMCPClient) -> None:
+        self._retire(entry)
+        if entry.client is not None:
+            self._by_client.pop(id(entry.client), None)
+        await entry.close()
+        logger.info(f"Closed MCP client for servers {list(entry.connections)}")
+
+    async def _maintain(self):
+        """Closes idle clients and health-checks the rest until the pool is empty."""
+        intervals = [interval for interval in (self.idle_timeout, self.health_check_interval) if interval > 0]
+        tick = max(1.0, min(intervals)) if intervals else 1.0
+        while self._by_client:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            for entry in list(dict.fromkeys(self._by_client.values())):
+                if not entry.refcount and (not entry.healthy or now - entry.idle_since >= self.idle_timeout):
+                    await self._close(entry)
+                elif self.health_check_interval > 0 and now - entry.last_check >= self.health_check_interval:
+                    entry.healthy = await entry.ping()
+                    if not entry.healthy:
+                        self._retire(entry)
+
+    def stats(self) -> Dict[str, int]:
+        entries = set(self._by_client.values())
+        return {
+            "clients": len(entries),
+            "in_use": sum(1 for entry in entries if entry.refcount),
+            "references": sum(entry.refcount for entry in entries),
+        }
+
+
+_MCP_CLIENT_POOL: Optional[MCPClientPool] = None
+
+
+def get_mcp_client_pool() -> MCPClientPool:
+    """Returns the process-wide MCP client pool."""
+    global _MCP_CLIENT_POOL
+    if _MCP_CLIENT_POOL is None:
+        _MCP_CLIENT_POOL = MCPClientPool()
+    return _MCP_CLIENT_POOL
 
-    logger.info("Initializing MultiServerMCPClient...")
 
+async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optional[MultiServerMCPClient]:
+    """
+    Returns a started MultiServerMCPClient for the config from the process-wide pool, or None on failure.
+    The client is shared with other sessions using the same config: hand it back with
+    release_mcp_client() instead of exiting it.
+    """
     if not mcp_server_config:
         logger.error("No MCP server configuration provided.")
         return None
 
-    try:
-        if "mcpServers" in mcp_server_config:
-            mcp_server_config = mcp_server_config["mcpServers"]
-        client = MultiServerMCPClient(mcp_server_config)
-        await client.__aenter__()
-        return client
+    return await get_mcp_client_pool().acquire(mcp_server_config)
+
+
+async def release_mcp_client(client: MultiServerMCPClient) -> None:
+    await get_mcp_client_pool().release(client)
 
-    except Exception as e:
-        logger.error(f"Failed to setup MCP client or fetch tools: {e}", exc_info=True)
-        return None
+
+# Generated param models by (tool name, schema hash); every controller registering the tool reuses them
+_TOOL_PARAM_MODELS: Dict[Tuple[str, str], Type[BaseModel]] = {}
+
+
+def _tool_schema_hash(tool: BaseTool) -> str:
+    json_schema = tool.args_schema
+    if json_schema is None:
+        schema_text = str(inspect.signature(tool._run))
+    elif isinstance(json_schema, dict):
+        schema_text = json.dumps(json_schema, sort_keys=True, default=str)
+    else:
+        schema_text = repr(json_schema)
+    return hashlib.sha256(schema_text.encode()).hexdigest()
 
 
 def create_tool_param_model(tool: BaseTool) -> Type[BaseModel]:
+    """Returns the Pydantic param model for a LangChain tool's schema, building it on first use."""
+    key = (tool.name, _tool_schema_hash(tool))
+    param_model = _TOOL_PARAM_MODELS.get(key)
+    if param_model is None:
+        param_model = _build_tool_param_model(tool)
+        _TOOL_PARAM_MODELS[key] = param_model
+    return param_model
+
+
+def _build_tool_param_model(tool: BaseTool) -> Type[BaseModel]:
     """Creates a Pydantic model from a LangChain tool's schema"""
 
     # Get tool schema information
@@ -155,7 +385,7 @@ def resolve_type(prop_details: Dict[str, Any], prefix: str = "") -> Any:
         format_mapping = {
             'date-time': datetime,
             'date': date,
-            'time': time,
+            'time': dt_time,
             'email': str,
             'uri': str,
             'url': str,
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+RUN_SCHEDULER_MAX_RUNS = int(os.getenv("RUN_SCHEDULER_MAX_RUNS", "4"))
+RUN_SCHEDULER_MAX_BROWSERS = int(os.getenv("RUN_SCHEDULER_MAX_BROWSERS", "8"))
+RUN_SCHEDULER_USER_MAX_RUNS = int(os.getenv("RUN_SCHEDULER_USER_MAX_RUNS", "2"))
+RUN_SCHEDULER_USER_MAX_BROWSERS = int(os.getenv("RUN_SCHEDULER_USER_MAX_BROWSERS", "4"))
+RUN_SCHEDULER_MAX_MEMORY_PERCENT = float(os.getenv("RUN_SCHEDULER_MAX_MEMORY_PERCENT", "85"))
+RUN_SCHEDULER_MAX_CPU_PERCENT = float(os.getenv("RUN_SCHEDULER_MAX_CPU_PERCENT", "90"))
+# Queued tickets re-check the memory/CPU budget this often, since nothing is released to wake them
+RUN_SCHEDULER_POLL_INTERVAL = 1.0
+ANONYMOUS_USER = "anonymous"
+
+
+class RunTicket:
+    """A request for agent runs and/or browser leases, queued until the scheduler admits it."""
+
+    def __init__(self, scheduler: "RunScheduler", user_id: str, runs: int, browsers: int):
+        self.scheduler = scheduler
+        self.user_id = user_id
+        self.runs = runs
+        self.browsers = browsers
+        self.admitted = False
+        self.released = False
+        self._admitted_event = asyncio.Event()
+
+    @property
+    def position(self) -> int:
+        """1-based place in the queue; 0 once admitted or released."""
+        return self.scheduler.queue_position(self)
+
+    async def wait(self, poll_interval: float = RUN_SCHEDULER_POLL_INTERVAL) -> AsyncIterator[int]:
+        """
+        Waits until the ticket is admitted, yielding the queue position every time it changes.
+        Yields nothing if the ticket was admitted straight away. Ends early if the ticket is released.
+        """
+        last_position = None
+        while not self.admitted and not self.released:
+            position = self.position
+            if position != last_position:
+                last_position = position
+                yield position
+            try:
+                await asyncio.wait_for(self._admitted_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                self.scheduler.dispatch()
+
+    def release(self) -> None:
+        """Returns the admitted resources, or leaves the queue. Safe to call more than once."""
+        if self.released:
+            return
+        self.released = True
+        self.scheduler._release(self)
+        self._admitted_event.set()  # wakes a pending wait()
+
+
+class RunScheduler:
+    """
+    Admission control for agent runs and browser leases shared by every UI session in the process.
+
+    A ticket is admitted only while it fits the global caps, its user's quota and the host
+    memory/CPU budget. Each user has a FIFO queue. Queues are served fair-share: the user holding
+    the fewest resources goes first, ties are broken round-robin, so one user queueing many runs
+    cannot starve everyone else. The budget only holds back a ticket while resources of its kind
+    are already in use, so an idle host always makes progress.
+    """
+
+    def __init__(
+            self,
+            max_runs: int = RUN_SCHEDULER_MAX_RUNS,
+            max_browsers: int = RUN_SCHEDULER_MAX_BROWSERS,
+            user_max_runs: int = RUN_SCHEDULER_USER_MAX_RUNS,
+            user_max_browsers: int = RUN_SCHEDULER_USER_MAX_BROWSERS,
+            max_memory_percent: float = RUN_SCHEDULER_MAX_MEMORY_PERCENT,
+            max_cpu_percent: float = RUN_SCHEDULER_MAX_CPU_PERCENT,
+    ):
+        self.max_runs = max(1, max_runs)
+        self.max_browsers = max(1, max_browsers)
+        self.user_max_runs = max(1, user_max_runs)
+        self.user_max_browsers = max(1, user_max_browsers)
+        self.max_memory_percent = max_memory_percent
+        self.max_cpu_percent = max_cpu_percent
+        self._queues: Dict[str, Deque[RunTicket]] = {}
+        self._runs_in_use = 0
+        self._browsers_in_use = 0
+        self._user_usage: Dict[str, Dict[str, int]] = {}
+        self._last_served: Dict[str, int] = {}  # user -> admission counter value, for round-robin ties
+        self._admissions = 0
+        psutil.cpu_percent(interval=None)  # primes the CPU counter; later calls measure since the previous one
+
+    def request(self, user_id: Optional[str], runs: int = 0, browsers: int = 0) -> RunTicket:
+        """Queues a ticket and admits it immediately if it fits."""
+        ticket = RunTicket(self, user_id or ANONYMOUS_USER, runs, browsers)
+        self._queues.setdefault(ticket.user_id, deque()).append(ticket)
+        self.dispatch()
+        return ticket
+
+    @asynccontextmanager
+    async def slot(
+            self,
+            user_id: Optional[str],
+            runs: int = 0,
+            browsers: int = 0,
+            on_queued: Optional[Callable[[int], None]] = None,
+    ) -> AsyncIterator[RunTicket]:
+        """Holds an admitted ticket for the duration of the block. `on_queued` receives queue positions."""
+        ticket = self.request(user_id, runs=runs, browsers=browsers)
+        try:
+            async for position in ticket.wait():
+                if on_queued:
+                    on_queued(position)
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _priority(self, user_id: str) -> Tuple[int, int]:
+        """Fair-share key: resources the user holds, then how recently they were last served."""
+        usage = self._user_usage.get(user_id)
+        held = usage["runs"] + usage["browsers"] if usage else 0
+        return held, self._last_served.get(user_id, 0)
+
+    def _fair_order(self) -> List[str]:
+        return sorted(self._queues, key=self._priority)
+
+    def queue_position(self, ticket: RunTicket) -> int:
+        if ticket.admitted or ticket.released or ticket not in self._queues.get(ticket.user_id, ()):
+            return 0
+        # Replays the fair-share order, assuming each admitted ticket is still held when the next one is picked
+        priority = {user_id: self._priority(user_id) for user_id in self._queues}
+        heads = {user_id: 0 for user_id in self._queues}
+        admissions = self._admissions
+        position = 1
+        while True:
+            user_id = min((u for u in heads if heads[u] < len(self._queues[u])), key=priority.__getitem__)
+            next_ticket = self._queues[user_id][heads[user_id]]
+            if next_ticket is ticket:
+                return position
+            heads[user_id] += 1
+            admissions += 1
+            priority[user_id] = (priority[user_id][0] + next_ticket.runs + next_ticket.browsers, admissions)
+            position += 1
+
+    def _over_budget(self) -> bool:
+        memory_percent = psutil.virtual_memory().percent
+        cpu_percent = psutil.cpu_percent(interval=None)
+        if memory_percent >= self.max_memory_percent or cpu_percent >= self.max_cpu_percent:
+            logger.debug(f"Run scheduler over budget: memory {memory_percent}%, CPU {cpu_percent}%")
+            return True
+        return False
+
+    def _fits(self, ticket: RunTicket, over_budget: bool) -> bool:
+        usage = self._user_usage.get(ticket.user_id, {"runs": 0, "browsers": 0})
+        if ticket.runs and (self._runs_in_use + ticket.runs > self.max_runs
+                            or usage["runs"] + ticket.runs > self.user_max_runs):
+            return False
+        if ticket.browsers and (self._browsers_in_use + ticket.browsers > self.max_browsers
+                                or usage["browsers"] + ticket.browsers > self.user_max_browsers):
+            return False
+        if over_budget:
+            busy = (ticket.runs and self._runs_in_use) or (ticket.browsers and self._browsers_in_use)
+            if busy:
+                return False
+        return True
+
+    def dispatch(self) -> None:
+        """Admits queued tickets, one at a time in fair-share order, until nothing else fits."""
+        if not self._queues:
+            return
+        over_budget = self._over_budget()
+        admitted = True
+        while admitted and self._queues:
+            admitted = False
+            for user_id in self._fair_order():
+                queue = self._queues[user_id]
+                ticket = queue[0]
+                if not self._fits(ticket, over_budget):
+                    continue
+                queue.popleft()
+                if not queue:
+                    del self._queues[user_id]
+                self._admit(ticket)
+                admitted = True
+                break
+
+    def _admit(self, ticket: RunTicket) -> None:
+        usage = self._user_usage.setdefault(ticket.user_id, {"runs": 0, "browsers": 0})
+        usage["runs"] += ticket.runs
+        usage["browsers"] += ticket.browsers
+        self._runs_in_use += ticket.runs
+        self._browsers_in_use += ticket.browsers
+        self._admissions += 1
+        self._last_served[ticket.user_id] = self._admissions
+        ticket.admitted = True
+        ticket._admitted_event.set()
+        logger.debug(f"Admitted {ticket.runs} run(s) and {ticket.browsers} browser(s) for user '{ticket.user_id}'")
+
+    def _release(self, ticket: RunTicket) -> None:
+        if ticket.admitted:
+            usage = self._user_usage[ticket.user_id]
+            usage["runs"] -= ticket.runs
+            usage["browsers"] -= ticket.browsers
+            if not usage["runs"] and not usage["browsers"]:
+                del self._user_usage[ticket.user_id]
+            self._runs_in_use -= ticket.runs
+            self._browsers_in_use -= ticket.browsers
+        else:
+            queue = self._queues.get(ticket.user_id)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.user_id]
+        self.dispatch()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs_in_use": self._runs_in_use,
+            "browsers_in_use": self._browsers_in_use,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+        }
+
+
+_RUN_SCHEDULER: Optional[RunScheduler] = None
+
+
+def get_run_scheduler() -> RunScheduler:
+    """Returns the process-wide run scheduler."""
+    global _RUN_SCHEDULER
+    if _RUN_SCHEDULER is None:
+        _RUN_SCHEDULER = RunScheduler()
+    return _RUN_SCHEDULER
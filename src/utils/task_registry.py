@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Coroutine, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# How long a stop waits for cancelled tasks to unwind (close browser contexts, release slots)
+TASK_CANCEL_TIMEOUT = 10.0
+
+
+class TaskHandle:
+    """The asyncio tasks working on behalf of one task ID, and whether that task was asked to stop."""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.stopped = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        """Runs the coroutine as a task of this handle; it is cancelled when the handle is stopped or closed."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.stopped:
+            task.cancel()
+        return task
+
+    @property
+    def active_tasks(self) -> int:
+        return len(self._tasks)
+
+    async def cancel(self, timeout: float = TASK_CANCEL_TIMEOUT) -> None:
+        """Marks the task stopped and cancels its running tasks, waiting up to `timeout` seconds for them to end."""
+        self.stopped = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return
+        logger.info(f"Cancelled {len(tasks)} running task(s) of {self.task_id}")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} task(s) of {self.task_id} did not finish within {timeout}s of cancellation")
+
+
+class TaskRegistry:
+    """
+    Handles of the tasks currently running in this process, by task ID.
+
+    A handle only exists while its run is active: close() removes it and cancels whatever it still
+    runs, so nothing accumulates across runs, and stopping a task is a single lookup.
+    """
+
+    def __init__(self):
+        self._handles: Dict[str, TaskHandle] = {}
+
+    def open(self, task_id: str) -> TaskHandle:
+        if task_id in self._handles:
+            logger.warning(f"Task {task_id} is already running; the new run takes over its stop handle.")
+        handle = TaskHandle(task_id)
+        self._handles[task_id] = handle
+        return handle
+
+    def close(self, handle: TaskHandle) -> None:
+        """Unregisters the handle, unless a newer run of the same task ID replaced it, and cancels its leftovers."""
+        if self._handles.get(handle.task_id) is handle:
+            del self._handles[handle.task_id]
+        for task in list(handle._tasks):
+            task.cancel()
+
+    def get(self, task_id: str) -> Optional[TaskHandle]:
+        return self._handles.get(task_id)
+
+    async def cancel(self, task_id: str) -> bool:
+        """Stops the task's running work. Returns False if no run of that task ID is active."""
+        handle = self._handles.get(task_id)
+        if handle is None:
+            return False
+        await handle.cancel()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+
+_TASK_REGISTRY: Optional[TaskRegistry] = None
+
+
+def get_task_registry() -> TaskRegistry:
+    """Returns the process-wide task registry."""
+    global _TASK_REGISTRY
+    if _TASK_REGISTRY is None:
+        _TASK_REGISTRY = TaskRegistry()
+    return _TASK_REGISTRY
@@ -0,0 +1,351 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+USER_STORE_BACKEND = os.getenv("USER_STORE_BACKEND", "sqlite")
+USER_STORE_PATH = os.getenv("USER_STORE_PATH", "user_database.db")
+LEGACY_USER_DB_PATH = "user_database.json"
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_CACHE_SIZE = 10000
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+LOGIN_ATTEMPT_WINDOW = int(os.getenv("LOGIN_ATTEMPT_WINDOW", "300"))
+LOGIN_LIMITER_MAX_KEYS = 10000
+_HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """Returns a salted PBKDF2 hash encoded as `pbkdf2_sha256$iterations$salt$hash`. CPU heavy by design."""
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations).hex()
+    return f"{_HASH_ALGORITHM}${iterations}${salt}${digest}"
+
+
+def is_legacy_hash(password_hash: str) -> bool:
+    """Unsalted SHA-256 hex digests written by the old JSON user database."""
+    return not password_hash.startswith(f"{_HASH_ALGORITHM}$")
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    if is_legacy_hash(password_hash):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), password_hash)
+    try:
+        _, iterations, salt, digest = password_hash.split("$")
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations)).hex()
+    except ValueError:
+        logger.error("Malformed password hash in user store.")
+        return False
+    return hmac.compare_digest(candidate, digest)
+
+
+def _hash_session_token(token: str) -> str:
+    # Tokens are random, so a fast hash is enough; only hashes are stored
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class UserStore(ABC):
+    """
+    Storage for user credentials and login sessions.
+
+    Backends implement the small synchronous primitives below; the async public API runs them,
+    and the deliberately slow password hashing, in worker threads so the event loop never blocks.
+    Sessions are cached in memory, so restoring a session costs no hashing and usually no I/O.
+    """
+
+    def __init__(self):
+        self._session_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    @abstractmethod
+    def _get_password_hash(self, username: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _insert_user(self, username: str, password_hash: str) -> bool:
+        """Atomically adds a user. Returns False if the username is already taken."""
+        ...
+
+    @abstractmethod
+    def _update_password_hash(self, username: str, password_hash: str) -> None:
+        ...
+
+    @abstractmethod
+    def _insert_session(self, token_hash: str, username: str, expires_at: float) -> None:
+        ...
+
+    @abstractmethod
+    def _get_session(self, token_hash: str) -> Optional[Tuple[str, float]]:
+        ...
+
+    @abstractmethod
+    def _delete_session(self, token_hash: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def _cache_session(self, token_hash: str, username: str, expires_at: float) -> None:
+        self._session_cache[token_hash] = (username, expires_at)
+        self._session_cache.move_to_end(token_hash)
+        while len(self._session_cache) > SESSION_CACHE_SIZE:
+            self._session_cache.popitem(last=False)
+
+    async def create_session(self, username: str) -> str:
+        """Creates a login session and returns its token."""
+        token = secrets.token_urlsafe(32)
+        token_hash = _hash_session_token(token)
+        expires_at = time.time() + SESSION_TTL_SECONDS
+        await asyncio.to_thread(self._insert_session, token_hash, username, expires_at)
+        self._cache_session(token_hash, username, expires_at)
+        return token
+
+    async def resolve_session(self, token: Optional[str]) -> Optional[str]:
+        """Returns the username of a valid session token, or None."""
+        if not token:
+            return None
+        token_hash = _hash_session_token(token)
+        session = self._session_cache.get(token_hash)
+        if session is None:
+            session = await asyncio.to_thread(self._get_session, token_hash)
+            if session is None:
+                return None
+            self._cache_session(token_hash, *session)
+        username, expires_at = session
+        if expires_at < time.time():
+            await self.delete_session(token)
+            return None
+        return username
+
+    async def delete_session(self, token: str) -> None:
+        token_hash = _hash_session_token(token)
+        self._session_cache.pop(token_hash, None)
+        await asyncio.to_thread(self._delete_session, token_hash)
+
+    async def create_user(self, username: str, password: str) -> bool:
+        """Registers a user. Returns False if the username already exists."""
+        password_hash = await asyncio.to_thread(hash_password, password)
+        return await asyncio.to_thread(self._insert_user, username, password_hash)
+
+    async def authenticate(self, username: str, password: str) -> bool:
+        """Checks the credentials. Legacy unsalted hashes are upgraded on a successful login."""
+        password_hash = await asyncio.to_thread(self._get_password_hash, username)
+        if password_hash is None:
+            return False
+        if not await asyncio.to_thread(verify_password, password, password_hash):
+            return False
+        if is_legacy_hash(password_hash):
+            upgraded_hash = await asyncio.to_thread(hash_password, password)
+            await asyncio.to_thread(self._update_password_hash, username, upgraded_hash)
+            logger.info(f"Upgraded legacy password hash for user '{username}'.")
+        return True
+
+
+class SQLiteUserStore(UserStore):
+    """Embedded SQLite backend: primary-key lookups and inserts that cannot lose concurrent writes."""
+
+    def __init__(self, db_path: str = USER_STORE_PATH):
+        super().__init__()
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "token_hash TEXT PRIMARY KEY, username TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # One-shot migrations that already ran against this database
+        self._conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL NOT NULL)")
+        self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+        self._lock = threading.Lock()
+
+    def _get_password_hash(self, username: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT password_hash FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _insert_user(self, username: str, password_hash: str) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                    (username, password_hash, time.time()),
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def _update_password_hash(self, username: str, password_hash: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username)
+            )
+
+    def _insert_session(self, token_hash: str, username: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (token_hash, username, expires_at) VALUES (?, ?, ?)",
+                (token_hash, username, expires_at),
+            )
+
+    def _get_session(self, token_hash: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT username, expires_at FROM sessions WHERE token_hash = ?", (token_hash,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _delete_session(self, token_hash: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+
+    def has_migration(self, name: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone() is not None
+
+    def import_users(self, users: Dict[str, str], migration: Optional[str] = None) -> int:
+        """
+        Bulk-inserts username -> password hash pairs, keeping existing users. Returns the number added.
+        `migration`, if given, is recorded as applied in the same transaction.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                    [(username, password_hash, time.time()) for username, password_hash in users.items()],
+                )
+                imported = self._conn.total_changes - before
+                if migration:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO migrations (name, applied_at) VALUES (?, ?)", (migration, time.time())
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return imported
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LoginRateLimiter:
+    """
+    Sliding-window limit on failed logins per key (username, or username and client address).
+    Checked before any hashing, so a flood of guesses for one account costs almost nothing.
+
+    State lives in memory, so the limit is per process: with `--workers N` a key gets up to
+    N * `max_attempts` failures per window. At most `max_keys` keys are tracked; keys whose
+    failures have all expired are swept once per window, and the least recently failed key is
+    evicted when the cap is reached.
+    """
+
+    def __init__(
+            self,
+            max_attempts: int = LOGIN_MAX_ATTEMPTS,
+            window: float = LOGIN_ATTEMPT_WINDOW,
+            max_keys: int = LOGIN_LIMITER_MAX_KEYS,
+    ):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        # Ordered by latest failure, oldest first
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+
+    def _prune(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and now - failures[0] > self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def _sweep(self, now: float) -> None:
+        """Drops keys whose latest failure is older than the window; they are at the front."""
+        while self._failures:
+            key, failures = next(iter(self._failures.items()))
+            if now - failures[-1] <= self.window:
+                break
+            del self._failures[key]
+        self._last_sweep = now
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may try again; 0 if it is not limited."""
+        now = time.monotonic()
+        failures = self._prune(key, now)
+        if len(failures) < self.max_attempts:
+            return 0
+        return self.window - (now - failures[0])
+
+    def record_failure(self, key: str) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep > self.window:
+            self._sweep(now)
+        # Only the latest `max_attempts` failures decide whether a key is limited
+        self._failures.setdefault(key, deque(maxlen=max(1, self.max_attempts))).append(now)
+        self._failures.move_to_end(key)
+        while len(self._failures) > self.max_keys:
+            self._failures.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        self._failures.pop(key, None)
+
+
+USER_STORE_BACKENDS: Dict[str, Type[UserStore]] = {
+    "sqlite": SQLiteUserStore,
+}
+
+
+def migrate_json_users(store: UserStore, json_path: str = LEGACY_USER_DB_PATH) -> int:
+    """
+    One-shot import of the legacy `user_database.json` into `store`.
+    The store records the import, so it never runs twice and the file itself is left untouched. Its
+    unsalted hashes are kept as they are and upgraded the next time each user logs in.
+    """
+    if not os.path.exists(json_path) or not hasattr(store, "import_users"):
+        return 0
+    migration = f"json_users:{os.path.abspath(json_path)}"
+    if store.has_migration(migration):
+        return 0
+    try:
+        with open(json_path, "r") as f:
+            users = json.load(f)
+    except json.JSONDecodeError as e:
+        logger.error(f"Cannot migrate users from {json_path}: {e}")
+        return 0
+    imported = store.import_users(users, migration=migration)
+    logger.info(f"Migrated {imported} users from {json_path} into the user store.")
+    return imported
+
+
+def create_user_store(backend: str = USER_STORE_BACKEND, **kwargs) -> UserStore:
+    """Creates the configured user store and migrates the legacy JSON user database into it."""
+    if backend not in USER_STORE_BACKENDS:
+        raise ValueError(f"Unsupported user store backend: {backend}")
+    store = USER_STORE_BACKENDS[backend](**kwargs)
+    migrate_json_users(store)
+    return store
@@ -6,6 +6,7 @@ from gradio.components import Component
 from typing import Any, Dict, Optional
 from src.webui.webui_manager import WebuiManager
 from src.utils import config
+from src.utils import llm_provider as llm_provider_module
 import logging
 
 logger = logging.getLogger(__name__)
@@ -294,6 +295,21 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
         outputs=[planner_llm_model_name]
     )
 
+    # cached LLM clients of a provider are stale once its endpoint or credentials change
+    def invalidate_provider_cache(provider):
+        llm_provider_module.invalidate_llm_cache(provider)
+
+    for provider_comp, endpoint_comps in (
+            (llm_provider, (llm_base_url, llm_api_key)),
+            (planner_llm_provider, (planner_llm_base_url, planner_llm_api_key)),
+    ):
+        for endpoint_comp in endpoint_comps:
+            endpoint_comp.blur(
+                invalidate_provider_cache,
+                inputs=[provider_comp],
+                outputs=None
+            )
+
     async def update_wrapper(mcp_file):
         """Wrapper for update_mcp_server."""
         update_dict = await update_mcp_server(mcp_file, webui_manager)
@@ -1,4 +1,5 @@
 import asyncio
+import base64
 import json
 import logging
 import os
@@ -20,8 +21,10 @@ from langchain_core.language_models.chat_models import BaseChatModel
 
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
 from src.browser.custom_browser import CustomBrowser
+from src.browser.live_view import LiveView
 from src.controller.custom_controller import CustomController
 from src.utils import llm_provider
+from src.utils.run_scheduler import RunTicket, get_run_scheduler
 from src.webui.webui_manager import WebuiManager
 
 logger = logging.getLogger(__name__)
@@ -29,6 +32,25 @@ logger = logging.getLogger(__name__)
 
 # --- Helper Functions --- (Defined at module level)
 
+_STATIC_DIRS = set()
+
+
+def _serve_as_static(directory: str) -> None:
+    """Lets Gradio serve files from `directory` by URL without hashing and copying them into its cache."""
+    directory = os.path.abspath(directory)
+    if directory not in _STATIC_DIRS:
+        gr.set_static_paths(paths=[directory])
+        _STATIC_DIRS.add(directory)
+
+
+def _save_step_screenshot(screenshot_b64: str, screenshot_dir: str, step_num: int) -> str:
+    """Writes a base64 step screenshot to disk and returns its path."""
+    os.makedirs(screenshot_dir, exist_ok=True)
+    screenshot_path = os.path.join(screenshot_dir, f"step_{step_num}.jpg")
+    with open(screenshot_path, "wb") as f:
+        f.write(base64.b64decode(screenshot_b64))
+    return screenshot_path
+
 
 async def _initialize_llm(
         provider: Optional[str],
@@ -148,33 +170,34 @@ async def _handle_new_step(
     logger.info(f"Step {step_num} completed.")
 
     # --- Screenshot Handling ---
-    screenshot_html = ""
+    # Screenshots are stored as files and sent as file messages, so the chat carries URLs instead of
+    # inline base64 images
+    screenshot_message = None
     # Ensure state.screenshot exists and is not empty before proceeding
     # Use getattr for safer access
     screenshot_data = getattr(state, "screenshot", None)
-    if screenshot_data:
+    screenshot_dir = getattr(webui_manager, "bu_screenshot_dir", None)
+    if screenshot_data and screenshot_dir:
         try:
             # Basic validation: check if it looks like base64
             if (
                     isinstance(screenshot_data, str) and len(screenshot_data) > 100
             ):  # Arbitrary length check
-                # *** UPDATED STYLE: Removed centering, adjusted width ***
-                img_tag = f'<img src="data:image/jpeg;base64,{screenshot_data}" alt="Step {step_num} Screenshot" style="max-width: 800px; max-height: 600px; object-fit:contain;" />'
-                screenshot_html = (
-                        img_tag + "<br/>"
-                )  # Use <br/> for line break after inline-block image
+                screenshot_path = _save_step_screenshot(screenshot_data, screenshot_dir, step_num)
+                screenshot_message = {
+                    "role": "assistant",
+                    "content": {"path": screenshot_path, "alt_text": f"Step {step_num} Screenshot"},
+                }
             else:
                 logger.warning(
                     f"Screenshot for step {step_num} seems invalid (type: {type(screenshot_data)}, len: {len(screenshot_data) if isinstance(screenshot_data, str) else 'N/A'})."
                 )
-                screenshot_html = "**[Invalid screenshot data]**<br/>"
 
         except Exception as e:
             logger.error(
-                f"Error processing or formatting screenshot for step {step_num}: {e}",
+                f"Error saving screenshot for step {step_num}: {e}",
                 exc_info=True,
             )
-            screenshot_html = "**[Error displaying screenshot]**<br/>"
     else:
         logger.debug(f"No screenshot available for step {step_num}.")
 
@@ -183,8 +206,8 @@ async def _handle_new_step(
 
     # --- Combine and Append to Chat ---
     step_header = f"--- **Step {step_num}** ---"
-    # Combine header, image (with line break), and JSON block
-    final_content = step_header + "<br/>" + screenshot_html + formatted_output
+    # Combine header and JSON block; the screenshot follows as its own file message
+    final_content = step_header + "<br/>" + formatted_output
 
     chat_message = {
         "role": "assistant",
@@ -193,6 +216,8 @@ async def _handle_new_step(
 
     # Append to the correct chat history list
     webui_manager.bu_chat_history.append(chat_message)
+    if screenshot_message:
+        webui_manager.bu_chat_history.append(screenshot_message)
 
     await asyncio.sleep(0.05)
 
@@ -294,6 +319,8 @@ async def run_agent_task(
         "browser_use_agent.agent_history_file"
     )
     gif_comp = webui_manager.get_component_by_id("browser_use_agent.recording_gif")
+    video_comp = webui_manager.get_component_by_id("browser_use_agent.recording_video")
+    script_file_comp = webui_manager.get_component_by_id("browser_use_agent.playwright_script_file")
     browser_view_comp = webui_manager.get_component_by_id(
         "browser_use_agent.browser_view"
     )
@@ -326,7 +353,9 @@ async def run_agent_task(
         clear_button_comp: gr.Button(interactive=False),
         chatbot_comp: gr.update(value=webui_manager.bu_chat_history),
         history_file_comp: gr.update(value=None),
-        gif_comp: gr.update(value=None),
+        gif_comp: gr.update(value=None, visible=True),
+        video_comp: gr.update(value=None, visible=False),
+        script_file_comp: gr.update(value=None),
         vnc_view_comp: gr.update(visible=not headless),
         browser_view_comp: gr.update(visible=headless),
     }
@@ -527,6 +556,17 @@ async def run_agent_task(
             webui_manager.bu_agent_task_id,
             f"{webui_manager.bu_agent_task_id}.gif",
         )
+        script_path = os.path.join(
+            save_agent_history_path,
+            webui_manager.bu_agent_task_id,
+            f"{webui_manager.bu_agent_task_id}_playwright.py",
+        )
+        webui_manager.bu_screenshot_dir = os.path.join(
+            save_agent_history_path,
+            webui_manager.bu_agent_task_id,
+            "screenshots",
+        )
+        _serve_as_static(save_agent_history_path)
 
         # Pass the webui_manager to callbacks when wrapping them
         async def step_callback_wrapper(
@@ -563,10 +603,12 @@ async def run_agent_task(
             )
             webui_manager.bu_agent.state.agent_id = webui_manager.bu_agent_task_id
             webui_manager.bu_agent.settings.generate_gif = gif_path
+            webui_manager.bu_agent.settings.save_playwright_script_path = script_path
         else:
             webui_manager.bu_agent.state.agent_id = webui_manager.bu_agent_task_id
             webui_manager.bu_agent.add_new_task(task)
             webui_manager.bu_agent.settings.generate_gif = gif_path
+            webui_manager.bu_agent.settings.save_playwright_script_path = script_path
             webui_manager.bu_agent.browser = webui_manager.bu_browser
             webui_manager.bu_agent.browser_context = webui_manager.bu_browser_context
             webui_manager.bu_agent.controller = webui_manager.bu_controller
@@ -576,19 +618,29 @@ async def run_agent_task(
         agent_task = asyncio.create_task(agent_run_coro)
         webui_manager.bu_current_task = agent_task  # Store the task
 
+        # Gradio postprocesses and diffs every value it is sent, so the chat only goes out with updates that
+        # follow new messages; attached to every live-view frame, it would cost more the longer the chat gets.
         last_chat_len = len(webui_manager.bu_chat_history)
+
+        def with_new_messages(update: Dict[Component, Any]) -> Dict[Component, Any]:
+            nonlocal last_chat_len
+            if len(webui_manager.bu_chat_history) != last_chat_len:
+                last_chat_len = len(webui_manager.bu_chat_history)
+                update[chatbot_comp] = gr.update(value=webui_manager.bu_chat_history)
+            return update
+
         while not agent_task.done():
             is_paused = webui_manager.bu_agent.state.paused
             is_stopped = webui_manager.bu_agent.state.stopped
 
             # Check for pause state
             if is_paused:
-                yield {
+                yield with_new_messages({
                     pause_resume_button_comp: gr.update(
                         value="▶️ Resume", interactive=True
                     ),
                     stop_button_comp: gr.update(interactive=True),
-                }
+                })
                 # Wait until pause is released or task is stopped/done
                 while is_paused and not agent_task.done():
                     # Re-check agent state in loop
@@ -604,14 +656,14 @@ async def run_agent_task(
                     break
 
                 # If resumed, yield UI update
-                yield {
+                yield with_new_messages({
                     pause_resume_button_comp: gr.update(
                         value="⏸️ Pause", interactive=True
                     ),
                     run_button_comp: gr.update(
                         value="⏳ Running...", interactive=False
                     ),
-                }
+                })
 
             # Check if agent stopped itself or stop button was pressed (which sets agent.state.stopped)
             if is_stopped:
@@ -644,16 +696,14 @@ async def run_agent_task(
                     ),
                     pause_resume_button_comp: gr.update(interactive=False),
                     stop_button_comp: gr.update(interactive=False),
-                    chatbot_comp: gr.update(value=webui_manager.bu_chat_history),
                 }
-                last_chat_len = len(webui_manager.bu_chat_history)
-                yield update_dict
+                yield with_new_messages(update_dict)
                 # Wait until response is submitted or task finishes
                 await webui_manager.bu_response_event.wait()
 
                 # Restore UI after response submitted or if task ended unexpectedly
                 if not agent_task.done():
-                    yield {
+                    yield with_new_messages({
                         user_input_comp: gr.update(
                             placeholder="Agent is running...", interactive=False
                         ),
@@ -662,40 +712,36 @@ async def run_agent_task(
                         ),
                         pause_resume_button_comp: gr.update(interactive=True),
                         stop_button_comp: gr.update(interactive=True),
-                    }
+                    })
                 else:
                     break  # Task finished while waiting for response
 
             # Update Chatbot if new messages arrived via callbacks
-            if len(webui_manager.bu_chat_history) > last_chat_len:
-                update_dict[chatbot_comp] = gr.update(
-                    value=webui_manager.bu_chat_history
-                )
-                last_chat_len = len(webui_manager.bu_chat_history)
-
-            # Update Browser View (Screenshot for headless)
-            if headless and webui_manager.bu_browser_context:
-                try:
-                    screenshot_b64 = (
-                        await webui_manager.bu_browser_context.take_screenshot()
-                    )
-                    if screenshot_b64:
-                        html_content = f'<div style="display:flex; justify-content:center; align-items:center; height:100%;"><img src="data:image/jpeg;base64,{screenshot_b64}" style="max-width: 100%; max-height: 100%; object-fit:contain; border:1px solid #ccc;"></div>'
-                        update_dict[browser_view_comp] = gr.update(value=html_content)
-                    else:
-                        html_content = f"<div style='display:flex; justify-content:center; align-items:center; height:100%;'><h1>Waiting for browser session...</h1></div>"
-                        update_dict[browser_view_comp] = gr.update(value=html_content)
-                except Exception as e:
-                    logger.debug(f"Failed to capture screenshot: {e}")
-                    update_dict[browser_view_comp] = gr.update(
-                        value="<div style='display:flex; justify-content:center; align-items:center; height:100%;'>Error loading view...</div>"
-                    )
+            with_new_messages(update_dict)
+
+            # Update Browser View (screencast frames for headless, only while the view is shown)
+            if headless and webui_manager.bu_browser_context and not getattr(webui_manager, "bu_browser_hidden", False):
+                if not webui_manager.bu_live_view:
+                    webui_manager.bu_live_view = LiveView()
+                await webui_manager.bu_live_view.follow(webui_manager.bu_browser_context)
+                if not webui_manager.bu_live_view.active:
+                    html_content = f"<div style='display:flex; justify-content:center; align-items:center; height:100%;'><h1>Waiting for browser session...</h1></div>"
+                    update_dict[browser_view_comp] = gr.update(value=html_content)
+            elif webui_manager.bu_live_view and webui_manager.bu_live_view.active:
+                await webui_manager.bu_live_view.stop()
 
             # Yield accumulated updates
             if update_dict:
-                yield update_dict
-
-            await asyncio.sleep(0.1)  # Polling interval
+                yield with_new_messages(update_dict)
+
+            if webui_manager.bu_live_view and webui_manager.bu_live_view.active:
+                # Wakes up as soon as a new frame is pushed, otherwise acts as the polling interval
+                frame_b64 = await webui_manager.bu_live_view.next_frame(timeout=0.1)
+                if frame_b64:
+                    html_content = f'<div style="display:flex; justify-content:center; align-items:center; height:100%;"><img src="data:image/jpeg;base64,{frame_b64}" style="max-width: 100%; max-height: 100%; object-fit:contain; border:1px solid #ccc;"></div>'
+                    yield with_new_messages({browser_view_comp: gr.update(value=html_content)})
+            else:
+                await asyncio.sleep(0.1)  # Polling interval
 
         # --- 7. Task Finalization ---
         webui_manager.bu_agent.state.paused = False
@@ -716,9 +762,13 @@ async def run_agent_task(
             if os.path.exists(history_file):
                 final_update[history_file_comp] = gr.File(value=history_file)
 
-            if gif_path and os.path.exists(gif_path):
-                logger.info(f"GIF found at: {gif_path}")
-                final_update[gif_comp] = gr.Image(value=gif_path)
+            # The recording is encoded as the run goes, so it is complete once the run returns
+            recording_path = webui_manager.bu_agent.recording_path
+            if recording_path:
+                logger.info(f"Recording ready at: {recording_path}")
+                is_video = recording_path.endswith(".webm")
+                final_update[gif_comp] = gr.update(value=None if is_video else recording_path, visible=not is_video)
+                final_update[video_comp] = gr.update(value=recording_path if is_video else None, visible=is_video)
 
         except asyncio.CancelledError:
             logger.info("Agent task was cancelled.")
@@ -749,6 +799,8 @@ async def run_agent_task(
 
         finally:
             webui_manager.bu_current_task = None  # Clear the task reference
+            if webui_manager.bu_live_view:
+                await webui_manager.bu_live_view.stop()
 
             # Close browser/context if requested
             if should_close_browser_on_finish:
@@ -781,6 +833,14 @@ async def run_agent_task(
             )
             yield final_update
 
+            # The Playwright script is generated in the background once the run ends; offer it when it is written
+            artifact_jobs = getattr(webui_manager.bu_agent, "artifact_jobs", []) if webui_manager.bu_agent else []
+            for job in artifact_jobs:
+                if job.kind == "playwright_script":
+                    generated_script = await job.wait()
+                    if generated_script:
+                        yield {script_file_comp: gr.File(value=generated_script)}
+
     except Exception as e:
         # Catch errors during setup (before agent run starts)
         logger.error(f"Error setting up agent task: {e}", exc_info=True)
@@ -800,11 +860,35 @@ async def run_agent_task(
         }
 
 
+async def _wait_for_run_slot(
+        webui_manager: WebuiManager, ticket: RunTicket, task: str
+) -> AsyncGenerator[Dict[gr.components.Component, Any], None]:
+    """Shows the queue position in the chat until the scheduler admits the run."""
+    chatbot_comp = webui_manager.get_component_by_id("browser_use_agent.chatbot")
+    run_button_comp = webui_manager.get_component_by_id("browser_use_agent.run_button")
+    stop_button_comp = webui_manager.get_component_by_id("browser_use_agent.stop_button")
+    user_input_comp = webui_manager.get_component_by_id("browser_use_agent.user_input")
+    async for position in ticket.wait():
+        # Shown but not stored: run_agent_task adds the task to the history once it starts
+        queued_chat = webui_manager.bu_chat_history + [
+            {"role": "user", "content": task},
+            {"role": "assistant", "content": f"⏳ *Waiting for a free agent slot (position {position} in the queue)...*"},
+        ]
+        yield {
+            chatbot_comp: gr.update(value=queued_chat),
+            user_input_comp: gr.update(interactive=False, placeholder="Task is queued..."),
+            run_button_comp: gr.update(value="⏳ Queued...", interactive=False),
+            stop_button_comp: gr.update(interactive=True),
+        }
+
+
 # --- Button Click Handlers --- (Need access to webui_manager)
 
 
 async def handle_submit(
-        webui_manager: WebuiManager, components: Dict[gr.components.Component, Any]
+        webui_manager: WebuiManager,
+        components: Dict[gr.components.Component, Any],
+        user_id: Optional[str] = None,
 ):
     """Handles clicks on the main 'Submit' button."""
     user_input_comp = webui_manager.get_component_by_id("browser_use_agent.user_input")
@@ -838,9 +922,29 @@ async def handle_submit(
     else:
         # Handle submission for a new task
         logger.info("Submit button clicked for new task.")
-        # Use async generator to stream updates from run_agent_task
-        async for update in run_agent_task(webui_manager, components):
-            yield update
+        # A run holds one agent slot and its browser until it finishes
+        ticket = get_run_scheduler().request(user_id, runs=1, browsers=1)
+        webui_manager.bu_run_ticket = ticket
+        try:
+            async for update in _wait_for_run_slot(webui_manager, ticket, user_input_value):
+                yield update
+            if not ticket.admitted:  # stopped while queued
+                yield {
+                    webui_manager.get_component_by_id("browser_use_agent.chatbot"): gr.update(
+                        value=webui_manager.bu_chat_history),
+                    user_input_comp: gr.update(interactive=True, placeholder="Enter your task..."),
+                    webui_manager.get_component_by_id("browser_use_agent.run_button"): gr.update(
+                        value="▶️ Submit Task", interactive=True),
+                    webui_manager.get_component_by_id("browser_use_agent.stop_button"): gr.update(
+                        value="⏹️ Stop", interactive=False),
+                }
+                return
+            # Use async generator to stream updates from run_agent_task
+            async for update in run_agent_task(webui_manager, components):
+                yield update
+        finally:
+            ticket.release()
+            webui_manager.bu_run_ticket = None
 
 
 async def handle_stop(webui_manager: WebuiManager):
@@ -848,8 +952,17 @@ async def handle_stop(webui_manager: WebuiManager):
     logger.info("Stop button clicked.")
     agent = webui_manager.bu_agent
     task = webui_manager.bu_current_task
+    ticket = webui_manager.bu_run_ticket
 
-    if agent and task and not task.done():
+    if ticket and not ticket.admitted:
+        # Still queued: leaving the queue ends the submit handler, which resets the UI
+        ticket.release()
+        return {
+            webui_manager.get_component_by_id(
+                "browser_use_agent.stop_button"
+            ): gr.update(interactive=False),
+        }
+    elif agent and task and not task.done():
         # Signal the agent to stop by setting its internal flag
         agent.state.stopped = True
         agent.state.paused = False  # Ensure not paused if stopped
@@ -917,7 +1030,9 @@ async def handle_clear(webui_manager: WebuiManager):
     """Handles clicks on the 'Clear' button."""
     logger.info("Clear button clicked.")
 
-    # Stop any running task first
+    # Stop any running or queued task first
+    if webui_manager.bu_run_ticket and not webui_manager.bu_run_ticket.admitted:
+        webui_manager.bu_run_ticket.release()
     task = webui_manager.bu_current_task
     if task and not task.done():
         logger.info("Clearing requires stopping the current task.")
@@ -956,8 +1071,12 @@ async def handle_clear(webui_manager: WebuiManager):
             "browser_use_agent.agent_history_file"
         ): gr.update(value=None),
         webui_manager.get_component_by_id("browser_use_agent.recording_gif"): gr.update(
-            value=None
+            value=None, visible=True
+        ),
+        webui_manager.get_component_by_id("browser_use_agent.recording_video"): gr.update(
+            value=None, visible=False
         ),
+        webui_manager.get_component_by_id("browser_use_agent.playwright_script_file"): gr.update(value=None),
         webui_manager.get_component_by_id("browser_use_agent.browser_view"): gr.update(
             value="<div style='display:flex; justify-content:center; align-items:center; height:100%;'>Browser Cleared</div>",
             visible=False,
@@ -1040,6 +1159,8 @@ def create_browser_use_agent_tab(webui_manager: WebuiManager):
                 gr.HTML("<div class='section-header'>Task Outputs</div>")
                 agent_history_file = gr.File(label="Agent History JSON", interactive=False)
                 recording_gif = gr.Image(label="Task Recording GIF", format="gif", interactive=False, type="filepath")
+                recording_video = gr.Video(label="Task Recording", interactive=False, visible=False)
+                playwright_script_file = gr.File(label="Playwright Script", interactive=False)
 
         # --- Right Column: Browser View ---
         browser_column = gr.Column(scale=1, elem_id="browser_column")
@@ -1064,8 +1185,9 @@ def create_browser_use_agent_tab(webui_manager: WebuiManager):
         dict(
             chatbot=chatbot, user_input=user_input, clear_button=clear_button, run_button=run_button,
             stop_button=stop_button, pause_resume_button=pause_resume_button, agent_history_file=agent_history_file,
-            recording_gif=recording_gif, browser_view=browser_view, vnc_view=vnc_view,
-            toggle_view_button=toggle_view_button, browser_view_md=browser_view_md,
+            recording_gif=recording_gif, recording_video=recording_video, playwright_script_file=playwright_script_file,
+            browser_view=browser_view, vnc_view=vnc_view, toggle_view_button=toggle_view_button,
+            browser_view_md=browser_view_md,
         )
     )
     webui_manager.add_components("browser_use_agent", tab_components)
@@ -2,15 +2,16 @@ import gradio as gr
 from gradio.components import Component
 from functools import partial
 
-from src.webui.webui_manager import WebuiManager
+from src.webui.webui_manager import WebuiManager, get_session_user
 from src.utils import config
 import logging
 import os
 from typing import Any, Dict, AsyncGenerator, Optional, Tuple, Union
 import asyncio
 import json
-from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent, render_plan_markdown
 from src.utils import llm_provider
+from src.utils.run_scheduler import get_run_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -54,14 +55,18 @@ def _read_file_safe(file_path: str) -> Optional[str]:
 
 # --- Deep Research Agent Specific Logic ---
 
-async def run_deep_research(webui_manager: WebuiManager, components: Dict[Component, Any]) -> AsyncGenerator[
-    Dict[Component, Any], None]:
+async def run_deep_research(webui_manager: WebuiManager, components: Dict[Component, Any],
+                            user_id: Optional[str] = None) -> AsyncGenerator[Dict[Component, Any], None]:
     """Handles initializing and running the DeepResearchAgent."""
 
     # --- Get Components ---
     research_task_comp = webui_manager.get_component_by_id("deep_research_agent.research_task")
     resume_task_id_comp = webui_manager.get_component_by_id("deep_research_agent.resume_task_id")
     parallel_num_comp = webui_manager.get_component_by_id("deep_research_agent.parallel_num")
+    concurrent_tasks_comp = webui_manager.get_component_by_id("deep_research_agent.concurrent_tasks")
+    task_scheduling_comp = webui_manager.get_component_by_id("deep_research_agent.task_scheduling")
+    context_budget_comp = webui_manager.get_component_by_id("deep_research_agent.context_token_budget")
+    synthesis_mode_comp = webui_manager.get_component_by_id("deep_research_agent.synthesis_mode")
     save_dir_comp = webui_manager.get_component_by_id(
         "deep_research_agent.max_query")  # Note: component ID seems misnamed in original code
     start_button_comp = webui_manager.get_component_by_id("deep_research_agent.start_button")
@@ -74,6 +79,10 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
     task_topic = components.get(research_task_comp, "").strip()
     task_id_to_resume = components.get(resume_task_id_comp, "").strip() or None
     max_parallel_agents = int(components.get(parallel_num_comp, 1))
+    max_concurrent_tasks = int(components.get(concurrent_tasks_comp, 1) or 1)
+    task_scheduling = components.get(task_scheduling_comp) or "category"
+    context_token_budget = int(components.get(context_budget_comp) or 32000)
+    synthesis_mode = components.get(synthesis_mode_comp) or "auto"
     base_save_dir = components.get(save_dir_comp, "./tmp/deep_research").strip()
     safe_root_dir = "./tmp/deep_research"
     normalized_base_save_dir = os.path.abspath(os.path.normpath(base_save_dir))
@@ -100,6 +109,10 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
         research_task_comp: gr.update(interactive=False),
         resume_task_id_comp: gr.update(interactive=False),
         parallel_num_comp: gr.update(interactive=False),
+        concurrent_tasks_comp: gr.update(interactive=False),
+        task_scheduling_comp: gr.update(interactive=False),
+        context_budget_comp: gr.update(interactive=False),
+        synthesis_mode_comp: gr.update(interactive=False),
         save_dir_comp: gr.update(interactive=False),
         markdown_display_comp: gr.update(value="Starting research..."),
         markdown_download_comp: gr.update(value=None, interactive=False)
@@ -107,12 +120,19 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
 
     agent_task = None
     running_task_id = None
-    plan_file_path = None
     report_file_path = None
-    last_plan_content = None
-    last_plan_mtime = 0
+    # The run holds one agent slot; each browser search inside it leases its own browser slot
+    run_ticket = get_run_scheduler().request(user_id, runs=1)
+    webui_manager.dr_run_ticket = run_ticket
 
     try:
+        async for position in run_ticket.wait():
+            yield {markdown_display_comp: gr.update(
+                value=f"⏳ *Waiting for a free agent slot (position {position} in the queue)...*")}
+        if not run_ticket.admitted:  # stopped while queued
+            yield {markdown_display_comp: gr.update(value="# Research Stopped\n\n*Cancelled while queued.*")}
+            return
+
         # --- 3. Get LLM and Browser Config from other tabs ---
         # Access settings values via components dict, getting IDs from webui_manager
         def get_setting(tab: str, key: str, default: Any = None):
@@ -146,88 +166,75 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             # Add other relevant fields if DeepResearchAgent accepts them
         }
 
-        # --- 4. Initialize or Get Agent ---
-        if not webui_manager.dr_agent:
-            webui_manager.dr_agent = DeepResearchAgent(
-                llm=llm,
-                browser_config=browser_config_dict,
-                mcp_server_config=mcp_config
-            )
-            logger.info("DeepResearchAgent initialized.")
+        # --- 4. Initialize Agent ---
+        # Agents share one compiled graph, so a fresh agent per run is cheap and picks up changed settings
+        webui_manager.dr_agent = DeepResearchAgent(
+            llm=llm,
+            browser_config=browser_config_dict,
+            mcp_server_config=mcp_config
+        )
+        logger.info("DeepResearchAgent initialized.")
 
         # --- 5. Start Agent Run ---
+        progress_queue: asyncio.Queue = asyncio.Queue()
         agent_run_coro = webui_manager.dr_agent.run(
             topic=task_topic,
             task_id=task_id_to_resume,
             save_dir=base_save_dir,
-            max_parallel_browsers=max_parallel_agents
+            max_parallel_browsers=max_parallel_agents,
+            max_concurrent_tasks=max_concurrent_tasks,
+            task_scheduling=task_scheduling,
+            context_token_budget=context_token_budget,
+            progress_queue=progress_queue,
+            user_id=user_id,
+            synthesis_mode=synthesis_mode,
         )
         agent_task = asyncio.create_task(agent_run_coro)
         webui_manager.dr_current_task = agent_task
 
-        # Wait briefly for the agent to start and potentially create the task ID/folder
-        await asyncio.sleep(1.0)
-
-        # Determine the actual task ID being used (agent sets this)
-        running_task_id = webui_manager.dr_agent.current_task_id
-        if not running_task_id:
-            # Agent might not have set it yet, try to get from result later? Risky.
-            # Or derive from resume_task_id if provided?
-            running_task_id = task_id_to_resume
-            if not running_task_id:
-                logger.warning("Could not determine running task ID immediately.")
-                # We can still monitor, but might miss initial plan if ID needed for path
-            else:
-                logger.info(f"Assuming task ID based on resume ID: {running_task_id}")
-        else:
-            logger.info(f"Agent started with Task ID: {running_task_id}")
-
-        webui_manager.dr_task_id = running_task_id  # Store for stop handler
+        # --- 6. Monitor Progress via agent events ---
+        # The markdown files are only durable output; the display follows the agent's progress events
+        plan_markdown = None
+        status_line = None
+        report_text = None  # the report as it streams in
+        while not agent_task.done() or not progress_queue.empty():
+            try:
+                event = await asyncio.wait_for(progress_queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
 
-        # --- 6. Monitor Progress via research_plan.md ---
-        if running_task_id:
-            task_specific_dir = os.path.join(base_save_dir, str(running_task_id))
-            plan_file_path = os.path.join(task_specific_dir, "research_plan.md")
-            report_file_path = os.path.join(task_specific_dir, "report.md")
-            logger.info(f"Monitoring plan file: {plan_file_path}")
-        else:
-            logger.warning("Cannot monitor plan file: Task ID unknown.")
-            plan_file_path = None
-        last_plan_content = None
-        while not agent_task.done():
             update_dict = {}
-            update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
-            agent_stopped = getattr(webui_manager.dr_agent, 'stopped', False)
-            if agent_stopped:
-                logger.info("Stop signal detected from agent state.")
-                break  # Exit monitoring loop
-
-            # Check and update research plan display
-            if plan_file_path:
-                try:
-                    current_mtime = os.path.getmtime(plan_file_path) if os.path.exists(plan_file_path) else 0
-                    if current_mtime > last_plan_mtime:
-                        logger.info(f"Detected change in {plan_file_path}")
-                        plan_content = _read_file_safe(plan_file_path)
-                        if last_plan_content is None or (
-                                plan_content is not None and plan_content != last_plan_content):
-                            update_dict[markdown_display_comp] = gr.update(value=plan_content)
-                            last_plan_content = plan_content
-                            last_plan_mtime = current_mtime
-                        elif plan_content is None:
-                            # File might have been deleted or became unreadable
-                            last_plan_mtime = 0  # Reset to force re-read attempt later
-                except Exception as e:
-                    logger.warning(f"Error checking/reading plan file {plan_file_path}: {e}")
-                    # Avoid continuous logging for the same error
-                    await asyncio.sleep(2.0)
-
-            # Yield updates if any
+            event_type = event["type"]
+            if event_type == "run_started":
+                running_task_id = event["task_id"]
+                webui_manager.dr_task_id = running_task_id  # Store for stop handler
+                report_file_path = os.path.join(event["output_dir"], "report.md")
+                logger.info(f"Agent started with Task ID: {running_task_id}")
+                update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
+            elif event_type in ("plan_created", "task_finished"):
+                plan_markdown = render_plan_markdown(event["plan"])
+                if event_type == "task_finished":
+                    status_line = f"*Finished ({event['status']}): {event['task_description']}*"
+            elif event_type == "task_started":
+                status_line = f"*Researching: {event['task_description']}*"
+            elif event_type == "search_finished":
+                status_line = f"*Searched {event['finished']}/{event['total']} queries ({event['status']}): {event['query']}*"
+            elif event_type == "result_added":
+                status_line = f"*Collected {event['total']} results so far.*"
+            elif event_type == "synthesis_started":
+                status_line = f"*Writing the report from {event['result_count']} results...*"
+            elif event_type == "report_chunk":
+                # Growing the value only by appending lets Gradio send just the new text
+                report_text = (report_text or "") + event["text"]
+                yield {markdown_display_comp: gr.update(value=report_text)}
+                continue
+
+            if plan_markdown and event_type != "run_started" and report_text is None:
+                update_dict[markdown_display_comp] = gr.update(
+                    value=plan_markdown + (f"\n{status_line}\n" if status_line else ""))
             if update_dict:
                 yield update_dict
 
-            await asyncio.sleep(1.0)  # Check file changes every second
-
         # --- 7. Task Finalization ---
         logger.info("Agent task processing finished. Awaiting final result...")
         final_result_dict = await agent_task  # Get result or raise exception
@@ -276,6 +283,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
         # --- 8. Final UI Reset ---
         webui_manager.dr_current_task = None  # Clear task reference
         webui_manager.dr_task_id = None  # Clear running task ID
+        run_ticket.release()
+        webui_manager.dr_run_ticket = None
 
         yield {
             start_button_comp: gr.update(value="▶️ Run", interactive=True),
@@ -283,6 +292,10 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             research_task_comp: gr.update(interactive=True),
             resume_task_id_comp: gr.update(value="", interactive=True),
             parallel_num_comp: gr.update(interactive=True),
+            concurrent_tasks_comp: gr.update(interactive=True),
+            task_scheduling_comp: gr.update(interactive=True),
+            context_budget_comp: gr.update(interactive=True),
+            synthesis_mode_comp: gr.update(interactive=True),
             save_dir_comp: gr.update(interactive=True),
             # Keep download button enabled if file exists
             markdown_download_comp: gr.update() if report_file_path and os.path.exists(report_file_path) else gr.update(
@@ -306,8 +319,12 @@ async def stop_deep_research(webui_manager: WebuiManager) -> Dict[Component, Any
     final_update = {
         stop_button_comp: gr.update(interactive=False, value="⏹️ Stopping...")
     }
+    run_ticket = webui_manager.dr_run_ticket
 
-    if agent and task and not task.done():
+    if run_ticket and not run_ticket.admitted:
+        # Still queued: leaving the queue ends run_deep_research, which resets the UI
+        run_ticket.release()
+    elif agent and task and not task.done():
         logger.info("Signalling DeepResearchAgent to stop.")
         try:
             # Assuming stop is synchronous or sets a flag quickly
@@ -397,6 +414,24 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
                                      interactive=True)
             max_query = gr.Textbox(label="Research Save Dir", value="./tmp/deep_research",
                                    interactive=True)
+        with gr.Row():
+            concurrent_tasks = gr.Number(label="Concurrent Research Tasks", value=1,
+                                         precision=0,
+                                         info="Plan tasks researched at the same time",
+                                         interactive=True)
+            task_scheduling = gr.Dropdown(label="Task Scheduling", choices=["category", "plan"], value="category",
+                                          info="'category' keeps concurrent tasks within one category, "
+                                               "'plan' lets them span categories",
+                                          interactive=True)
+            context_token_budget = gr.Number(label="Max Context Tokens", value=32000,
+                                             precision=0,
+                                             info="Older tool outputs are summarised to keep prompts under this size",
+                                             interactive=True)
+            synthesis_mode = gr.Dropdown(label="Report Synthesis", choices=["auto", "single", "map_reduce"],
+                                         value="auto",
+                                         info="'map_reduce' summarises each category before writing the report, "
+                                              "'auto' does so when the findings are large",
+                                         interactive=True)
     with gr.Row():
         stop_button = gr.Button("⏹️ Stop", variant="stop", scale=2)
         start_button = gr.Button("▶️ Run", variant="primary", scale=3)
@@ -407,6 +442,10 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
         dict(
             research_task=research_task,
             parallel_num=parallel_num,
+            concurrent_tasks=concurrent_tasks,
+            task_scheduling=task_scheduling,
+            context_token_budget=context_token_budget,
+            synthesis_mode=synthesis_mode,
             max_query=max_query,
             start_button=start_button,
             stop_button=stop_button,
@@ -435,8 +474,9 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
     all_managed_inputs = set(webui_manager.get_components())
 
     # --- Define Event Handler Wrappers ---
-    async def start_wrapper(comps: Dict[Component, Any]) -> AsyncGenerator[Dict[Component, Any], None]:
-        async for update in run_deep_research(webui_manager, comps):
+    async def start_wrapper(comps: Dict[Component, Any], request: gr.Request) -> AsyncGenerator[
+        Dict[Component, Any], None]:
+        async for update in run_deep_research(webui_manager, comps, user_id=get_session_user(request)):
             yield update
 
     async def stop_wrapper() -> AsyncGenerator[Dict[Component, Any], None]:
@@ -5,7 +5,7 @@ from gradio.components import Component
 from typing import Dict, Any, AsyncGenerator
 import os
 
-from src.webui.webui_manager import WebuiManager
+from src.webui.webui_manager import WebuiManager, get_session_user
 from src.webui.components.agent_settings_tab import create_agent_settings_tab
 from src.webui.components.browser_settings_tab import create_browser_settings_tab
 from src.webui.components.browser_use_agent_tab import (
@@ -39,13 +39,13 @@ def _connect_event_handlers(layout_manager: WebuiManager, session_state: gr.Stat
 
     # --- WRAPPER FUNCTIONS ---
     # These wrappers receive the session data and ensure it's ready for the real handlers.
-    async def submit_wrapper(session_data, *args):
+    async def submit_wrapper(session_data, request: gr.Request, *args):
         # KEY FIX: Ensure the session's data manager has the UI component references.
         session_data.id_to_component = layout_manager.id_to_component
         session_data.component_to_id = layout_manager.component_to_id
         
         components_dict = {comp: val for comp, val in zip(all_components, args)}
-        async for update in handle_submit(session_data, components_dict):
+        async for update in handle_submit(session_data, components_dict, user_id=get_session_user(request)):
             yield update
 
     async def stop_wrapper(session_data):
@@ -10,6 +10,8 @@ from typing import Optional, Dict, List
 import uuid
 import asyncio
 import time
+import weakref
+from collections import OrderedDict
 
 from gradio.components import Component
 from browser_use.browser.browser import Browser
@@ -17,12 +19,51 @@ from browser_use.browser.context import BrowserContext
 from browser_use.agent.service import Agent
 from src.browser.custom_browser import CustomBrowser
 from src.browser.custom_context import CustomBrowserContext
+from src.browser.live_view import LiveView
 from src.controller.custom_controller import CustomController
 from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+from src.utils.run_scheduler import RunTicket
+
+
+# Every live manager in this process (one per UI session); used to report worker load
+_LIVE_MANAGERS: "weakref.WeakSet[WebuiManager]" = weakref.WeakSet()
+
+
+def get_worker_stats() -> Dict[str, int]:
+    """Counts this process's sessions and agent runs in progress."""
+    managers = list(_LIVE_MANAGERS)
+    active_runs = 0
+    for manager in managers:
+        for task in (manager.bu_current_task, manager.dr_current_task):
+            if task is not None and not task.done():
+                active_runs += 1
+    return {"sessions": len(managers), "active_runs": active_runs}
+
+
+# Gradio session hash -> logged-in username, so agent runs can be scheduled per user
+_SESSION_USERS: "OrderedDict[str, str]" = OrderedDict()
+_SESSION_USERS_MAX = 10000
+
+
+def set_session_user(request: Optional[gr.Request], username: str) -> None:
+    if request is None or not request.session_hash:
+        return
+    _SESSION_USERS[request.session_hash] = username
+    _SESSION_USERS.move_to_end(request.session_hash)
+    while len(_SESSION_USERS) > _SESSION_USERS_MAX:
+        _SESSION_USERS.popitem(last=False)
+
+
+def get_session_user(request: Optional[gr.Request]) -> Optional[str]:
+    """Returns the username logged in on this browser session, falling back to the session itself."""
+    if request is None or not request.session_hash:
+        return None
+    return _SESSION_USERS.get(request.session_hash, f"session:{request.session_hash}")
 
 
 class WebuiManager:
     def __init__(self, settings_save_dir: str = "./tmp/webui_settings"):
+        _LIVE_MANAGERS.add(self)
         self.id_to_component: dict[str, Component] = {}
         self.component_to_id: dict[Component, str] = {}
 
@@ -47,6 +88,9 @@ class WebuiManager:
         self.bu_user_help_response: Optional[str] = None
         self.bu_current_task: Optional[asyncio.Task] = None
         self.bu_agent_task_id: Optional[str] = None
+        self.bu_screenshot_dir: Optional[str] = None
+        self.bu_live_view: Optional[LiveView] = None
+        self.bu_run_ticket: Optional[RunTicket] = None
 
     def init_deep_research_agent(self) -> None:
         """
@@ -56,6 +100,7 @@ class WebuiManager:
         self.dr_current_task = None
         self.dr_agent_task_id: Optional[str] = None
         self.dr_save_dir: Optional[str] = None
+        self.dr_run_ticket: Optional[RunTicket] = None
 
     def add_components(self, tab_name: str, components_dict: dict[str, "Component"]) -> None:
         """
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+WORKER_COOKIE = "navmind_worker"
+WORKER_HEALTH_PATH = "/worker/health"
+HEALTH_CHECK_INTERVAL = 2.0
+# Hop-by-hop headers are meaningful for a single connection only and must not be forwarded
+_HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+
+class Worker:
+    """One UI/agent worker process, started and restarted by a process manager, and its last reported load."""
+
+    def __init__(self, index: int, host: str, port: int):
+        self.index = index
+        self.url = f"http://{host}:{port}"
+        self.port = port
+        self.healthy = False
+        self.active_runs = 0
+        self.sessions = 0
+        self.assigned_since_check = 0  # new sessions routed here since the last health report
+
+    @property
+    def load(self) -> float:
+        # Agent runs dominate CPU and memory; sessions break ties between equally busy workers
+        return (self.active_runs + self.assigned_since_check) * 100 + self.sessions
+
+
+class WorkerRouter:
+    """
+    Front-end reverse proxy for N worker processes.
+
+    Gradio keeps each session's state (WebuiManager, browser, agent loop) inside the process that
+    served it, so a browser is pinned to one worker with a cookie. New browsers go to the healthy
+    worker with the fewest active agent runs, which spreads new runs across cores.
+    """
+
+    def __init__(self, workers: List[Worker]):
+        self.workers = workers
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10.0), follow_redirects=False)
+        self.app = Starlette(
+            routes=[Route("/{path:path}", self.proxy, methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"])],
+            lifespan=self._lifespan,
+        )
+
+    @asynccontextmanager
+    async def _lifespan(self, app: Starlette):
+        health_task = asyncio.create_task(self._health_loop())
+        try:
+            yield
+        finally:
+            health_task.cancel()
+            await self._client.aclose()
+
+    async def _check_worker(self, worker: Worker):
+        try:
+            response = await self._client.get(f"{worker.url}{WORKER_HEALTH_PATH}", timeout=2.0)
+            response.raise_for_status()
+            stats = response.json()
+            if not worker.healthy:
+                logger.info(f"Worker {worker.index} is healthy at {worker.url}")
+            worker.healthy = True
+            worker.active_runs = stats.get("active_runs", 0)
+            worker.sessions = stats.get("sessions", 0)
+        except Exception as e:
+            if worker.healthy:
+                logger.warning(f"Worker {worker.index} failed its health check: {e}")
+            worker.healthy = False
+        worker.assigned_since_check = 0
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*[self._check_worker(worker) for worker in self.workers])
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    def _pick_worker(self, request: Request) -> Optional[Worker]:
+        pinned = request.cookies.get(WORKER_COOKIE)
+        if pinned is not None and pinned.isdigit() and int(pinned) < len(self.workers):
+            worker = self.workers[int(pinned)]
+            if worker.healthy:
+                return worker
+        healthy = [worker for worker in self.workers if worker.healthy]
+        if not healthy:
+            return None
+        worker = min(healthy, key=lambda w: w.load)
+        worker.assigned_since_check += 1
+        return worker
+
+    async def proxy(self, request: Request):
+        worker = self._pick_worker(request)
+        if worker is None:
+            return PlainTextResponse("No healthy workers available, please retry shortly.", status_code=503)
+
+        # Workers trust x-forwarded-for for login rate limiting, so a client-supplied one is replaced
+        headers = [(k, v) for k, v in request.headers.raw
+                   if k.decode().lower() not in _HOP_BY_HOP_HEADERS and k.lower() != b"x-forwarded-for"]
+        client_host = request.client.host if request.client else ""
+        headers.append((b"x-forwarded-for", client_host.encode()))
+        upstream_request = self._client.build_request(
+            request.method,
+            f"{worker.url}{request.url.path}",
+            params=request.url.query,
+            headers=headers,
+            content=request.stream(),
+        )
+        try:
+            upstream = await self._client.send(upstream_request, stream=True)
+        except httpx.RequestError as e:
+            logger.warning(f"Worker {worker.index} request failed: {e}")
+            worker.healthy = False
+            return PlainTextResponse("Worker unavailable, please retry.", status_code=502)
+
+        response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_BY_HOP_HEADERS}
+        response = StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+        if request.cookies.get(WORKER_COOKIE) != str(worker.index):
+            response.set_cookie(WORKER_COOKIE, str(worker.index), httponly=True, samesite="lax")
+        return response
+
+
+def run_router(host: str, port: int, num_workers: int, worker_base_port: int):
+    """
+    Routes sessions on `host:port` to `num_workers` UI workers on consecutive local ports.
+    The workers are separate processes (`webui.py --worker`), kept running by supervisord or similar.
+    """
+    workers = [Worker(index, "127.0.0.1", worker_base_port + index) for index in range(num_workers)]
+    router = WorkerRouter(workers)
+    logger.info(f"Routing {host}:{port} to {num_workers} workers on ports {worker_base_port}-{worker_base_port + num_workers - 1}")
+    uvicorn.run(router.app, host=host, port=port)
@@ -394,7 +394,354 @@ async def test_deep_research_agent():
         print(e)
 
 
+async def test_browser_pool_lifecycle():
+    """Leases contexts from a BrowserPool: browsers are reused, cancelled launches don't leak slots, idle ones close."""
+    from browser_use.browser.browser import BrowserConfig
+
+    from src.browser.browser_pool import BrowserPool
+
+    pool = BrowserPool(BrowserConfig(headless=True), size=2, min_idle=1)
+    await pool.warm_up()
+    assert len(pool._idle) == 1
+
+    async def lease_browser():
+        async with pool.lease() as browser_context:
+            await asyncio.sleep(0.5)
+            return browser_context.browser
+
+    browsers = await asyncio.gather(lease_browser(), lease_browser())
+    assert browsers[0] is not browsers[1]
+    assert pool._total == 2
+    assert (await lease_browser()) in browsers  # reused, not relaunched
+
+    await pool.close_idle()
+    assert pool._total == 0 and not pool._idle
+
+    # A lease cancelled while its browser launches gives its slot back
+    lease_task = asyncio.create_task(lease_browser())
+    await asyncio.sleep(0.05)
+    lease_task.cancel()
+    await asyncio.gather(lease_task, return_exceptions=True)
+    await pool.close_idle()
+    assert pool._total == 0
+
+    await pool.close()
+    try:
+        await lease_browser()
+        assert False, "a closed pool must not lease"
+    except RuntimeError:
+        pass
+
+    # A browser on the user's own profile locks it, so it is never kept around between leases
+    own_profile = BrowserPool(BrowserConfig(extra_browser_args=["--user-data-dir=/tmp/profile"]), size=4, min_idle=1)
+    own_profile.resize(8)
+    assert (own_profile.size, own_profile.min_idle) == (1, 0)
+    print("Browser pool lifecycle OK")
+
+
+async def test_deep_research_agent_construction(iterations: int = 200):
+    """Benchmarks DeepResearchAgent construction: agents share one compiled graph instead of compiling their own."""
+    import time
+
+    from src.agent.deep_research import deep_research_agent
+
+    start = time.perf_counter()
+    for _ in range(20):
+        deep_research_agent._compile_graph()
+    compile_ms = (time.perf_counter() - start) / 20 * 1000
+
+    deep_research_agent.get_research_graph()  # the first agent in the process pays for one compilation
+    start = time.perf_counter()
+    agents = [deep_research_agent.DeepResearchAgent(llm=None, browser_config={}) for _ in range(iterations)]
+    construct_ms = (time.perf_counter() - start) / iterations * 1000
+
+    print(f"Graph compilation: {compile_ms:.3f} ms")
+    print(f"Agent construction with the shared graph: {construct_ms:.3f} ms ({iterations} agents)")
+    assert all(agent.graph is agents[0].graph for agent in agents)
+    assert construct_ms < compile_ms
+
+
+async def test_history_recorder(steps: int = 40):
+    """Records synthetic full-HD steps with HistoryRecorder: frames are encoded off the caller's thread and repeated steps are merged."""
+    import base64
+    import io
+    import tempfile
+    import time
+
+    from PIL import Image
+
+    from src.agent.browser_use.recorder import HistoryRecorder
+
+    def screenshot(seed: int) -> str:
+        image = Image.effect_noise((1920, 1080), 20 + seed).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=70)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    # Every other step leaves the page and the goal unchanged
+    pages = [screenshot(page) for page in range(steps // 2)]
+    screenshots = [pages[step // 2] for step in range(steps)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recorder = HistoryRecorder("Benchmark task", os.path.join(tmp_dir, "run.gif"),
+                                   slot_dir=os.path.join(tmp_dir, "slots"), queue_size=steps + 1)
+        start = time.perf_counter()
+        futures = [recorder.add_step(shot, f"Goal on page {step // 2}") for step, shot in enumerate(screenshots)]
+        # Same page, new goal: a new frame
+        futures.append(recorder.add_step(screenshots[-1], "A different goal"))
+        queued = time.perf_counter() - start
+        recording_path = recorder.close()
+        elapsed = time.perf_counter() - start
+        assert recorder.add_step(screenshots[0], "After close") is None
+        assert all(future.done() for future in futures), "close() records every queued step"
+        frames = [future.result() for future in futures]
+
+        recording = Image.open(recording_path)
+        print(f"Recorded {steps} steps in {elapsed:.2f}s ({elapsed / steps * 1000:.0f} ms/step), "
+              f"the caller waited {queued * 1000:.0f} ms")
+        assert queued < elapsed / 2, "add_step encoded the frames on the caller's thread"
+        print(f"Base64 screenshots a history would hold: {sum(map(len, screenshots)) / 1e6:.1f} MB")
+        print(f"Recording: {recording.n_frames} frames, {recording.size}, {os.path.getsize(recording_path) / 1e6:.1f} MB")
+        assert recording.n_frames == steps // 2 + 2  # the task frame, one frame per distinct page, the new goal
+        assert frames[0] == frames[1] and frames[1] != frames[2] and frames[-1] == frames[-2] + 1
+        recording.close()
+
+
+def test_search_results_log_round_trip():
+    """Appends deep research results to the JSON Lines log and reads them back, legacy JSON and truncated lines included."""
+    import tempfile
+
+    from src.agent.deep_research import deep_research_agent as dra
+
+    batches = [
+        [{"query": "first query", "result": {"summary": "Résumé"}, "status": "completed"}],
+        [{"query": "second query", "result": None, "error": "timeout"},
+         {"query": "third query", "result": {"summary": "ok"}}],
+    ]
+    with tempfile.TemporaryDirectory() as output_dir:
+        assert dra._load_search_results(output_dir) is None
+        # Task folders written before the log existed only have the compacted JSON file
+        dra._save_search_results_to_json(batches[0], output_dir)
+        assert dra._load_search_results(output_dir) == batches[0]
+
+        for batch in batches:
+            dra._append_search_results_to_log(batch, output_dir)
+        expected = [result for batch in batches for result in batch]
+        assert dra._load_search_results(output_dir) == expected
+
+        # A run killed mid-write leaves a partial last line, which is skipped
+        with open(os.path.join(output_dir, dra.SEARCH_INFO_LOG_FILENAME), "a", encoding="utf-8") as f:
+            f.write('{"query": "cut off", "res')
+        assert dra._load_search_results(output_dir) == expected
+
+        dra._reset_search_results_log(output_dir)
+        assert dra._load_search_results(output_dir) == []
+    print("Search results log round trip OK")
+
+
+def test_bound_message_history():
+    """Fits a long research message history into shrinking token budgets."""
+    import json
+
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+    from src.agent.deep_research.message_history import COMPACTED_PREFIX, bound_message_history, estimate_tokens
+
+    messages = [SystemMessage(content="You are a research assistant.")]
+    for i in range(6):
+        results = [{"query": f"query {i}", "status": "completed", "result": {"summary": "lorem ipsum " * 200}}]
+        messages += [
+            HumanMessage(content=f"Research task {i}"),
+            AIMessage(content="", tool_calls=[{"name": "parallel_browser_search", "args": {"queries": [f"query {i}"]},
+                                               "id": f"call_{i}"}]),
+            ToolMessage(content=json.dumps(results), tool_call_id=f"call_{i}", name="parallel_browser_search"),
+        ]
+    total = estimate_tokens(messages)
+    assert bound_message_history(messages, total, "search_info.jsonl") == messages
+
+    # A budget that compaction alone can meet keeps every exchange
+    compacted = bound_message_history(list(messages), total // 2, "search_info.jsonl")
+    assert len(compacted) == len(messages) and estimate_tokens(compacted) <= total // 2
+    assert compacted[-1] == messages[-1], "the current task's tool output must stay intact"
+    assert any(isinstance(m, ToolMessage) and m.content.startswith(COMPACTED_PREFIX) for m in compacted)
+
+    # A budget below that drops the oldest exchanges whole, keeping the system prompt and current task
+    bounded = bound_message_history(list(messages), estimate_tokens(messages[-3:]) + 60, "search_info.jsonl")
+    assert isinstance(bounded[0], SystemMessage) and bounded[-3:] == messages[-3:]
+    assert len(bounded) < len(messages) and isinstance(bounded[1], HumanMessage)
+    tool_call_ids = {call["id"] for m in bounded if isinstance(m, AIMessage) for call in m.tool_calls}
+    assert tool_call_ids == {m.tool_call_id for m in bounded if isinstance(m, ToolMessage)}
+    print(f"Bounded {len(messages)} messages to {len(compacted)} compacted and {len(bounded)} after dropping")
+
+
+async def test_result_cache():
+    """Stores, reuses, scopes and evicts cached deep research browser results."""
+    import tempfile
+
+    from src.agent.deep_research.result_cache import ResearchResultCache, model_cache_key
+
+    class FakeLLM:
+        model_name = "gpt-4o"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResearchResultCache(os.path.join(tmp_dir, "cache.db"), ttl=60, max_entries=2, similarity=0.6)
+        model = model_cache_key(FakeLLM())
+        await cache.put("What is the capital of France?", model, {"summary": "Paris"})
+        assert await cache.get("what is the capital of france", model) == {"summary": "Paris"}
+        assert await cache.get("capital of France", model) == {"summary": "Paris"}  # near duplicate
+        assert await cache.get("What is the capital of France?", "OtherLLM:model") is None
+
+        # Results found with someone's own browser profile are only reused with that profile
+        own_profile = model_cache_key(FakeLLM(), "alice:/home/alice/.config/chrome")
+        assert own_profile != model
+        assert await cache.get("What is the capital of France?", own_profile) is None
+
+        await cache.put("first other query", model, "one")
+        await cache.get("What is the capital of France?", model)  # now the most recently used
+        await cache.put("second other query", model, "two")
+        assert await cache.get("first other query", model) is None, "least recently used entry is evicted"
+        assert await cache.get("second other query", model) == "two"
+        assert await cache.get("What is the capital of France?", model) == {"summary": "Paris"}
+        cache.close()
+
+        expired = ResearchResultCache(os.path.join(tmp_dir, "cache.db"), ttl=0.01)
+        await asyncio.sleep(0.05)
+        assert await expired.get("second other query", model) is None
+        expired.close()
+    print("Result cache OK")
+
+
+def test_plan_store():
+    """Saves a research plan, updates tasks in place and resumes from the store and the legacy markdown."""
+    import tempfile
+
+    from src.agent.deep_research import deep_research_agent as dra
+    from src.agent.deep_research.plan_store import PlanStore, close_plan_store, get_plan_store
+
+    plan = [
+        {"category_name": "Background", "tasks": [
+            {"task_description": "History of the topic", "status": "pending", "queries": None, "result_summary": None},
+            {"task_description": "Key players", "status": "pending", "queries": None, "result_summary": None},
+        ]},
+        {"category_name": "Outlook", "tasks": [
+            {"task_description": "Open questions", "status": "pending", "queries": None, "result_summary": None},
+        ]},
+    ]
+    with tempfile.TemporaryDirectory() as output_dir:
+        store = PlanStore(output_dir)
+        assert not store.exists()
+        store.save_plan(plan)
+        assert store.exists() and store.load_plan() == plan
+
+        plan[0]["tasks"][0].update(status="completed", queries=["topic history"], result_summary="Found 3 sources")
+        plan[0]["tasks"][1].update(status="failed", queries=["key players"])
+        store.update_tasks([(0, 0, plan[0]["tasks"][0]), (0, 1, plan[0]["tasks"][1])])
+        assert store.load_plan() == plan
+
+        # Resuming continues at the failed task, which is retried
+        state = dra._load_previous_state("task", output_dir)
+        assert state["research_plan"] == plan
+        assert (state["current_category_index"], state["current_task_index_in_category"]) == (0, 1)
+        assert get_plan_store(output_dir) is get_plan_store(output_dir)  # one connection per run
+        close_plan_store(output_dir)
+        store.close()
+
+    # Runs from before the store existed are imported from research_plan.md
+    with tempfile.TemporaryDirectory() as output_dir:
+        dra._save_plan_to_md(plan, output_dir)
+        state = dra._load_previous_state("task", output_dir)
+        assert [task["status"] for category in state["research_plan"] for task in category["tasks"]] == [
+            "completed", "failed", "pending"]
+        assert get_plan_store(output_dir).exists()
+        close_plan_store(output_dir)
+    print("Plan store OK")
+
+
+async def test_concurrent_multi_act():
+    """Side-effect-free actions of a step run concurrently, yet results keep action order and stop at the first error."""
+    import time
+    from types import SimpleNamespace
+
+    from browser_use.agent.views import ActionResult
+    from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+    from mcp.types import CallToolResult, TextContent, Tool
+
+    from src.agent.browser_use.browser_use_agent import BrowserUseAgent
+    from src.controller.custom_controller import CustomController
+    from src.utils.mcp_client import annotate_mcp_tools
+
+    controller = CustomController()
+    finished = []
+
+    async def call_tool(name: str, arguments: dict):
+        await asyncio.sleep(arguments.get("delay", 0.0))
+        finished.append(arguments["value"])
+        return CallToolResult(content=[TextContent(type="text", text=f"found {arguments['value']}")])
+
+    @controller.registry.action("Fail")
+    async def fail(reason: str):
+        return ActionResult(error=reason)
+
+    # Listed as an MCP server would list them and converted by the MCP adapters, like the pooled client does
+    schema = {"type": "object", "properties": {"value": {"type": "string"}, "delay": {"type": "number"}},
+              "required": ["value"]}
+    mcp_tools = [
+        Tool(name="lookup", description="Look up", inputSchema=schema, annotations={"readOnlyHint": True}),
+        Tool(name="write", description="Write", inputSchema=schema, annotations={"readOnlyHint": False}),
+    ]
+    session = SimpleNamespace(call_tool=call_tool)
+    tools = [convert_mcp_tool_to_langchain_tool(session, mcp_tool) for mcp_tool in mcp_tools]
+    assert not any(tool.metadata for tool in tools)
+    annotate_mcp_tools(tools, mcp_tools)
+    controller.mcp_client = SimpleNamespace(server_name_to_tools={"test": tools})
+    controller.register_mcp_tools()
+    ActionModel_ = controller.registry.create_action_model()
+
+    def lookup_action(value, delay=0.0):
+        return ActionModel_(**{"mcp.test.lookup": {"value": value, "delay": delay}})
+
+    assert controller.can_run_concurrently(lookup_action("a"))
+    assert not controller.can_run_concurrently(ActionModel_(**{"mcp.test.write": {"value": "a"}})), \
+        "MCP tools without readOnlyHint run in order unless CONCURRENT_MCP_ACTIONS is set"
+    assert not controller.can_run_concurrently(ActionModel_(done={"text": "finished", "success": True}))
+
+    # A fake agent: only what multi_act touches
+    agent = BrowserUseAgent.__new__(BrowserUseAgent)
+    agent.controller = controller
+    agent.browser_context = SimpleNamespace(
+        get_selector_map=lambda: asyncio.sleep(0, result={}),
+        remove_highlights=lambda: asyncio.sleep(0),
+        config=SimpleNamespace(wait_between_actions=0),
+    )
+    agent.settings = SimpleNamespace(page_extraction_llm=None, available_file_paths=None)
+    agent.sensitive_data = None
+    agent.context = None
+    agent.state = SimpleNamespace(stopped=False, paused=False)
+    agent.register_external_agent_status_raise_error_callback = None
+
+    start = time.perf_counter()
+    results = await agent.multi_act([lookup_action("slow", 0.3), lookup_action("fast", 0.1), lookup_action("faster")])
+    assert time.perf_counter() - start < 0.5, "the lookups ran one after another"
+    assert finished == ["faster", "fast", "slow"]
+    assert [r.extracted_content for r in results] == ["found slow", "found fast", "found faster"]
+
+    controller._side_effect_free_actions.add("fail")  # so the error comes out of a concurrent batch
+    results = await agent.multi_act([
+        lookup_action("first", 0.1), ActionModel_(fail={"reason": "broken"}), lookup_action("after error"),
+        ActionModel_(done={"text": "never reached", "success": True}),
+    ])
+    assert [(r.extracted_content, r.error) for r in results] == [("found first", None), (None, "broken")]
+    print("Concurrent multi_act OK")
+
+
 if __name__ == "__main__":
     asyncio.run(test_browser_use_agent())
     # asyncio.run(test_browser_use_parallel())
     # asyncio.run(test_deep_research_agent())
+    # asyncio.run(test_browser_pool_lifecycle())
+    # asyncio.run(test_deep_research_agent_construction())
+    # asyncio.run(test_history_recorder())
+    # asyncio.run(test_concurrent_multi_act())
+    # test_plan_store()
+    # asyncio.run(test_result_cache())
+    # test_bound_message_history()
+    # test_search_results_log_round_trip()
@@ -126,6 +126,106 @@ async def test_controller_with_mcp():
     pdb.set_trace()
 
 
+async def test_action_dispatch_benchmark(iterations: int = 2000):
+    """Measures the per-action cost of CustomController.act as the number of registered MCP tools grows."""
+    from types import SimpleNamespace
+
+    from langchain_core.tools import BaseTool
+
+    from src.controller.custom_controller import CustomController
+
+    class EchoTool(BaseTool):
+        """Answers without LangChain's callback machinery, so the timings show dispatch cost only."""
+
+        def _run(self, **kwargs):
+            return str(kwargs)
+
+        async def ainvoke(self, input, config=None, **kwargs):
+            return str(input)
+
+    async def legacy_act(controller, action):
+        # act() before the dispatch table: dump every field, find MCP tools by prefix, then look them up again
+        for action_name, params in action.model_dump(exclude_unset=True).items():
+            if params is not None:
+                if action_name.startswith("mcp"):
+                    mcp_tool = controller.registry.registry.actions.get(action_name).function
+                    return await mcp_tool.ainvoke(params)
+                return await controller.registry.execute_action(action_name, params)
+
+    for tool_count in (0, 10, 50, 200):
+        tools = [
+            EchoTool(
+                name=f"tool_{i}",
+                description=f"Benchmark tool {i}",
+                args_schema={"type": "object", "properties": {"value": {"type": "integer"}}, "required": ["value"]},
+            )
+            for i in range(tool_count)
+        ]
+        controller = CustomController()
+        controller.mcp_client = SimpleNamespace(server_name_to_tools={"bench": tools})
+        controller.register_mcp_tools()
+        ActionModel_ = controller.registry.create_action_model()
+        actions = {"done": ActionModel_(done={"text": "finished", "success": True})}
+        if tools:
+            tool_action = f"mcp.bench.{tools[-1].name}"
+            actions["mcp"] = ActionModel_(**{tool_action: {"value": 1}})
+
+        for kind, action in actions.items():
+            result = await controller.act(action)
+            assert result.extracted_content is not None or result.is_done
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await controller.act(action)
+            act_us = (time.perf_counter() - start) / iterations * 1e6
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await legacy_act(controller, action)
+            legacy_us = (time.perf_counter() - start) / iterations * 1e6
+            print(f"{tool_count:>4} MCP tools, {kind:>4} action: dispatch table {act_us:7.1f} us/call, "
+                  f"previous act {legacy_us:7.1f} us/call")
+
+
+async def test_action_dispatch_matches_registry():
+    """CustomController.act gives the same results and errors as Registry.execute_action, also after re-registration."""
+    from browser_use.agent.views import ActionResult
+
+    from src.controller.custom_controller import CustomController
+
+    controller = CustomController()
+
+    @controller.registry.action("Echo a value")
+    async def echo(value: str):
+        return ActionResult(extracted_content=f"v1 {value}")
+
+    ActionModel_ = controller.registry.create_action_model()
+    for action_name, params in (("done", {"text": "finished", "success": True}), ("echo", {"value": "x"})):
+        expected = await controller.registry.execute_action(action_name, params)
+        assert await controller.act(ActionModel_(**{action_name: params})) == expected, action_name
+
+    # Actions that need a browser fail the same way when none is given
+    errors = []
+    for run in (lambda: controller.registry.execute_action("go_to_url", {"url": "https://example.com"}),
+                lambda: controller.act(ActionModel_(go_to_url={"url": "https://example.com"}))):
+        try:
+            await run()
+        except RuntimeError as e:
+            errors.append(str(e))
+    assert len(errors) == 2 and errors[0] == errors[1], errors
+
+    # Registering an action again replaces the handler the dispatch table built for it
+    @controller.registry.action("Echo a value")
+    async def echo(value: str):
+        return ActionResult(extracted_content=f"v2 {value}")
+
+    result = await controller.act(controller.registry.create_action_model()(echo={"value": "x"}))
+    assert result.extracted_content == "v2 x", result
+    print("Dispatch table matches Registry.execute_action")
+
+
 if __name__ == '__main__':
     # asyncio.run(test_mcp_client())
     asyncio.run(test_controller_with_mcp())
+    # asyncio.run(test_action_dispatch_benchmark())
+    # asyncio.run(test_action_dispatch_matches_registry())
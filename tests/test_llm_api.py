@@ -146,6 +146,18 @@ def test_qwen_model():
     test_llm(config, "How many 'r's are in the word 'strawberry'?")
 
 
+
+def test_deepseek_r1_ollama_think_stream():
+    """Streamed R1 output loses its <think> block even when the tags are cut across chunks."""
+    from src.utils.llm_provider import _ThinkTagSplitter
+
+    chunks = ["<thi", "nk>\nCount the r's <", "/thin", "k>\n\nThere are ", "3 r's <", "3"]
+    splitter = _ThinkTagSplitter()
+    pieces = [piece for chunk in chunks for piece in splitter.feed(chunk)] + splitter.flush()
+    assert "".join(text for text, is_reasoning in pieces if not is_reasoning) == "\n\nThere are 3 r's <3"
+    assert "".join(text for text, is_reasoning in pieces if is_reasoning) == "\nCount the r's "
+
+
 if __name__ == "__main__":
     # test_openai_model()
     # test_google_model()
@@ -154,6 +166,7 @@ if __name__ == "__main__":
     # test_ollama_model()
     # test_deepseek_r1_model()
     # test_deepseek_r1_ollama_model()
+    # test_deepseek_r1_ollama_think_stream()
     # test_mistral_model()
     # test_ibm_model()
     # test_qwen_model()
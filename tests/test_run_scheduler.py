@@ -0,0 +1,68 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def test_fair_share():
+    from src.utils.run_scheduler import RunScheduler
+
+    scheduler = RunScheduler(max_runs=2, max_browsers=4, user_max_runs=2, user_max_browsers=2,
+                             max_memory_percent=101, max_cpu_percent=101)
+    # alice takes both slots, then queues two more runs; bob and carol queue one each
+    alice = [scheduler.request("alice", runs=1) for _ in range(4)]
+    bob = scheduler.request("bob", runs=1)
+    carol = scheduler.request("carol", runs=1)
+    print("positions:", [t.position for t in alice[2:] + [bob, carol]])
+    assert [t.admitted for t in alice] == [True, True, False, False]
+    assert bob.position == 1 and carol.position == 2 and alice[2].position == 3
+
+    # freed slots go to the users holding the fewest resources first
+    alice[0].release()
+    assert bob.admitted and not alice[2].admitted
+    alice[1].release()
+    assert carol.admitted and alice[2].position == 1
+
+    # per-user browser quota, and leaving the queue
+    leases = [scheduler.request("dave", browsers=1) for _ in range(3)]
+    assert [t.admitted for t in leases] == [True, True, False]
+    leases[2].release()
+    print("stats:", scheduler.stats())
+    assert scheduler.stats()["queued"] == 2  # alice's last two runs
+
+
+async def test_budget_and_wait():
+    from src.utils.run_scheduler import RunScheduler
+
+    # a budget that is always exceeded still admits work while nothing of that kind is running
+    scheduler = RunScheduler(max_memory_percent=0)
+    first = scheduler.request("alice", runs=1)
+    second = scheduler.request("bob", runs=1)
+    assert first.admitted and not second.admitted
+
+    positions = []
+
+    async def wait_for_second():
+        async for position in second.wait(poll_interval=0.05):
+            positions.append(position)
+
+    waiter = asyncio.create_task(wait_for_second())
+    await asyncio.sleep(0.2)
+    first.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    print("reported positions:", positions)
+    assert positions == [1] and second.admitted
+
+    second.release()
+    async with scheduler.slot("carol", runs=1) as ticket:
+        assert ticket.admitted
+    assert scheduler.stats() == {"runs_in_use": 0, "browsers_in_use": 0, "queued": 0}
+
+
+if __name__ == '__main__':
+    asyncio.run(test_fair_share())
+    asyncio.run(test_budget_and_wait())
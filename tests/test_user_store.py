@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(".")
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def test_sqlite_user_store():
+    from src.utils.user_store import SQLiteUserStore
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteUserStore(os.path.join(tmp_dir, "users.db"))
+        # concurrent sign-ups of the same name: exactly one wins
+        created = await asyncio.gather(*[store.create_user("alice", f"pw{i}") for i in range(5)])
+        print("created:", created)
+        assert created.count(True) == 1
+
+        password = f"pw{created.index(True)}"
+        assert await store.authenticate("alice", password)
+        assert not await store.authenticate("alice", "wrong")
+        assert not await store.authenticate("bob", password)
+        store.close()
+
+
+async def test_json_migration():
+    import hashlib
+    from src.utils.user_store import SQLiteUserStore, migrate_json_users, is_legacy_hash
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "user_database.json")
+        with open(json_path, "w") as f:
+            json.dump({"carol": hashlib.sha256(b"secret").hexdigest()}, f)
+
+        store = SQLiteUserStore(os.path.join(tmp_dir, "users.db"))
+        print("migrated:", migrate_json_users(store, json_path))
+        assert os.path.exists(json_path)  # left in place; the store records the import
+        assert migrate_json_users(store, json_path) == 0  # one-shot
+
+        # legacy hash still works and is upgraded on login
+        assert await store.authenticate("carol", "secret")
+        assert not is_legacy_hash(store._get_password_hash("carol"))
+        assert await store.authenticate("carol", "secret")
+        store.close()
+
+
+async def test_sessions_and_rate_limit():
+    from src.utils.user_store import SQLiteUserStore, LoginRateLimiter
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "users.db")
+        store = SQLiteUserStore(db_path)
+        await store.create_user("dave", "pw")
+        token = await store.create_session("dave")
+        assert await store.resolve_session(token) == "dave"
+        assert await store.resolve_session("bogus") is None
+        store.close()
+
+        # a fresh process (empty cache) still resolves the session from the database
+        store = SQLiteUserStore(db_path)
+        assert await store.resolve_session(token) == "dave"
+        await store.delete_session(token)
+        assert await store.resolve_session(token) is None
+        store.close()
+
+    limiter = LoginRateLimiter(max_attempts=3, window=60)
+    for _ in range(3):
+        assert limiter.retry_after("dave|127.0.0.1") == 0
+        limiter.record_failure("dave|127.0.0.1")
+    print("retry after:", limiter.retry_after("dave|127.0.0.1"))
+    assert limiter.retry_after("dave|127.0.0.1") > 0
+    assert limiter.retry_after("erin|127.0.0.1") == 0
+
+    # tracked keys are capped, evicting the least recently failed one
+    limiter = LoginRateLimiter(max_attempts=3, window=60, max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        limiter.record_failure(key)
+    assert list(limiter._failures) == ["a", "c"]
+
+
+if __name__ == '__main__':
+    asyncio.run(test_sqlite_user_store())
+    asyncio.run(test_json_migration())
+    asyncio.run(test_sessions_and_rate_limit())
@@ -4,39 +4,48 @@ from dotenv import load_dotenv
 load_dotenv()
 import argparse
 import os
-import json
-import hashlib
+from contextlib import asynccontextmanager
 import gradio as gr
-from concurrent.futures import ThreadPoolExecutor
+from src.browser.browser_pool import close_browser_pools
+from src.utils.artifact_jobs import get_artifact_queue
+from src.utils.user_store import LoginRateLimiter, create_user_store
 from src.webui.interface import create_ui as create_main_app_ui, theme_map
+from src.webui.webui_manager import set_session_user
 
 # --- 1. User Management ---
-USER_DB_PATH = "user_database.json"
-
-def load_users():
-    if not os.path.exists(USER_DB_PATH):
-        return {}
-    with open(USER_DB_PATH, 'r') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-
-def save_users(users):
-    with open(USER_DB_PATH, 'w') as f:
-        json.dump(users, f, indent=4)
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# --- 2. ThreadPoolExecutor for parallel processing ---
-executor = ThreadPoolExecutor(max_workers=10)  # adjust for your CPU
-
-def run_in_thread(fn, *args, **kwargs):
-    future = executor.submit(fn, *args, **kwargs)
-    return future.result()
+# SQLite-backed by default; the legacy user_database.json is migrated on first start
+user_store = None
+
+def get_user_store():
+    global user_store
+    if user_store is None:
+        user_store = create_user_store()
+    return user_store
+
+# Failed logins per username and client address; checked before any password hashing.
+# Kept in memory, so each worker process enforces the limit on its own
+login_rate_limiter = LoginRateLimiter()
+
+# Set in worker mode, where every request arrives through the local router
+trust_forwarded_for = False
+
+def _rate_limit_key(username, request):
+    client_host = request.client.host if request and request.client else "unknown"
+    if trust_forwarded_for and request and request.headers.get("x-forwarded-for"):
+        client_host = request.headers["x-forwarded-for"]
+    return f"{(username or '').strip().lower()}|{client_host}"
+
+@asynccontextmanager
+async def app_lifespan(app):
+    """
+    Closes the pooled browsers when the server shuts down, on the event loop that launched them, and
+    stops the artifact worker processes.
+    """
+    yield
+    await close_browser_pools()
+    get_artifact_queue().shutdown()
 
-# --- 3. Full UI creation ---
+# --- 2. Full UI creation ---
 def create_ui(theme_name="Ocean"):
     css = """
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
@@ -92,6 +101,8 @@ def create_ui(theme_name="Ocean"):
 
     with gr.Blocks(theme=gr.themes.Base(), css=css, title="NavMind") as demo:
         is_authenticated = gr.State(value=False)
+        # Session token kept in the browser's local storage, so reloads and restarts skip the login
+        session_token = gr.BrowserState(None, storage_key="navmind_session")
 
         with gr.Column(elem_id="auth-container", visible=True) as auth_view:
             gr.Markdown("# Welcome to NavMind")
@@ -111,54 +122,106 @@ def create_ui(theme_name="Ocean"):
         with gr.Column(visible=False) as main_app_view:
             create_main_app_ui(theme_name=theme_name)
 
-        def attempt_auth(current_auth_state, username, password, is_signup=False):
+        async def attempt_auth(current_auth_state, username, password, is_signup, request):
             if current_auth_state:
-                return True, gr.update(visible=False), gr.update(visible=True), ""
-            users, status_message, auth_success = load_users(), "", False
-            if is_signup:
+                return True, gr.update(visible=False), gr.update(visible=True), "", gr.update()
+            store, status_message, auth_success = get_user_store(), "", False
+            limit_key = _rate_limit_key(username, request)
+            retry_after = login_rate_limiter.retry_after(limit_key)
+            if retry_after > 0:
+                status_message = f"<p style='color:red;'>Too many attempts. Try again in {int(retry_after) + 1} seconds.</p>"
+            elif is_signup:
                 if not username or not password:
                     status_message = "<p style='color:red;'>Username and password required.</p>"
-                elif username in users:
+                elif not await store.create_user(username, password):
+                    login_rate_limiter.record_failure(limit_key)
                     status_message = f"<p style='color:red;'>Username '{username}' exists.</p>"
                 else:
-                    users[username] = hash_password(password)
-                    save_users(users)
                     status_message, auth_success = "<p style='color:green;'>Sign-up successful! Welcome.</p>", True
             else:  # Login
-                if username in users and users[username] == hash_password(password):
+                if username and password and await store.authenticate(username, password):
                     status_message, auth_success = "<p style='color:green;'>Login successful! Welcome.</p>", True
                 else:
+                    login_rate_limiter.record_failure(limit_key)
                     status_message = "<p style='color:red;'>Invalid username or password.</p>"
             if auth_success:
-                return True, gr.update(visible=False), gr.update(visible=True), status_message
+                login_rate_limiter.reset(limit_key)
+                token = await store.create_session(username)
+                set_session_user(request, username)
+                return True, gr.update(visible=False), gr.update(visible=True), status_message, token
             else:
-                return False, gr.update(visible=True), gr.update(visible=False), status_message
+                return False, gr.update(visible=True), gr.update(visible=False), status_message, gr.update()
+
+        async def handle_login(state, u, p, request: gr.Request):
+            return await attempt_auth(state, u, p, False, request)
 
-        def handle_login(state, u, p):
-            return run_in_thread(attempt_auth, state, u, p, False)
+        async def handle_signup(state, u, p, request: gr.Request):
+            return await attempt_auth(state, u, p, True, request)
 
-        def handle_signup(state, u, p):
-            return run_in_thread(attempt_auth, state, u, p, True)
+        async def restore_session(token, request: gr.Request):
+            # One cached lookup instead of a password hash, which keeps mass reconnects after a deploy cheap
+            username = await get_user_store().resolve_session(token)
+            if username:
+                set_session_user(request, username)
+                return True, gr.update(visible=False), gr.update(visible=True)
+            return False, gr.update(visible=True), gr.update(visible=False)
 
-        login_btn.click(handle_login, [is_authenticated, login_user, login_pass], [is_authenticated, auth_view, main_app_view, login_status])
-        signup_btn.click(handle_signup, [is_authenticated, signup_user, signup_pass], [is_authenticated, auth_view, main_app_view, signup_status])
+        login_btn.click(handle_login, [is_authenticated, login_user, login_pass], [is_authenticated, auth_view, main_app_view, login_status, session_token])
+        signup_btn.click(handle_signup, [is_authenticated, signup_user, signup_pass], [is_authenticated, auth_view, main_app_view, signup_status, session_token])
+        demo.load(restore_session, [session_token], [is_authenticated, auth_view, main_app_view])
 
     return demo
 
-# --- 4. Main Launch Logic ---
+# --- 3. Main Launch Logic ---
+def serve_worker(demo, host, port):
+    """Serves one UI worker behind the router, with a health endpoint reporting its load."""
+    import uvicorn
+    from fastapi import FastAPI
+    from src.webui.webui_manager import get_worker_stats
+    from src.webui.worker_router import WORKER_HEALTH_PATH
+
+    app = FastAPI(lifespan=app_lifespan)
+
+    @app.get(WORKER_HEALTH_PATH)
+    def worker_health():
+        return get_worker_stats()
+
+    app = gr.mount_gradio_app(app, demo.queue(max_size=20), path="/")
+    uvicorn.run(app, host=host, port=port)
+
 def main():
+    global trust_forwarded_for
     parser = argparse.ArgumentParser(description="Gradio WebUI for Browser Agent")
     parser.add_argument("--ip", type=str, default="0.0.0.0", help="IP address to bind to.")
     parser.add_argument("--port", type=int, default=7788, help="Port to listen on.")
     parser.add_argument("--theme", type=str, default="Ocean", choices=theme_map.keys(), help="Theme to use for the UI.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEBUI_WORKERS", "1")),
+                        help="Number of UI/agent worker processes the router sends sessions to.")
+    parser.add_argument("--worker-base-port", type=int, default=int(os.getenv("WEBUI_WORKER_BASE_PORT", "7800")),
+                        help="Port of the first worker process; the others use the following ports.")
+    parser.add_argument("--router", action="store_true",
+                        help="Only route sessions to --workers worker processes started separately with --worker.")
+    parser.add_argument("--worker", action="store_true",
+                        help="Serve as one worker behind the router; bind it to a local address only.")
     args = parser.parse_args()
 
+    if args.router:
+        from src.webui.worker_router import run_router
+        run_router(args.ip, args.port, args.workers, args.worker_base_port)
+        return
+
     demo = create_ui(theme_name=args.theme)
-    
-    # Enable async queue (parallel requests handled automatically via ThreadPoolExecutor)
+
+    if args.worker:
+        trust_forwarded_for = True
+        serve_worker(demo, args.ip, args.port)
+        return
+
+    # Enable async queue; auth handlers offload hashing and store I/O to worker threads
     demo.queue(max_size=20).launch(
         server_name=args.ip,
-        server_port=args.port
+        server_port=args.port,
+        app_kwargs={"lifespan": app_lifespan},
     )
 
 if __name__ == '__main__':